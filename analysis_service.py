@@ -3,6 +3,7 @@
 实现项目成本归集、交叉验证、预订行为分析等业务逻辑
 """
 
+import logging
 import pandas as pd
 from typing import Any, Dict, List, Tuple
 from datetime import datetime
@@ -15,6 +16,9 @@ from logger_config import get_logger
 class TravelAnalyzer:
     """差旅数据分析器"""
     
+    # 分析逻辑版本，调整分析结果的计算方式或结构时递增，使缓存的分析结果失效
+    VERSION = 1
+    
     def __init__(
         self, 
         attendance_df: pd.DataFrame,
@@ -169,16 +173,32 @@ class TravelAnalyzer:
         project_stats = []
         valid_project_codes = [code for code in self.travel_df['项目代码'].unique() if code != "未知"]
         
+        # 一次分组得到各项目、各差旅类型的金额与订单数，代替逐项目筛选整张差旅表
+        project_groups = self.travel_df.groupby('项目代码', sort=False)
+        project_totals = project_groups['授信金额'].sum().reindex(valid_project_codes, fill_value=0)
+        project_sizes = project_groups.size().reindex(valid_project_codes, fill_value=0)
+        type_groups = self.travel_df.groupby(['项目代码', '差旅类型'], sort=False)['授信金额']
+        type_costs = type_groups.sum().unstack(fill_value=0).reindex(valid_project_codes, fill_value=0)
+        type_sizes = type_groups.size().unstack(fill_value=0).reindex(valid_project_codes, fill_value=0)
+        # 各项目首条记录的"项目"字段（保留空值，与逐项目取 iloc[0] 一致）
+        first_projects = (
+            self.travel_df.drop_duplicates('项目代码').set_index('项目代码')['项目']
+            if '项目' in self.travel_df.columns else None
+        )
+        debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+        
+        def _type_value(frame: pd.DataFrame, project_code, travel_type: str):
+            return frame.at[project_code, travel_type] if travel_type in frame.columns else 0
+        
         self.logger.info(f"\n🔍 开始逐项目分析（共 {len(valid_project_codes)} 个有效项目）:")
         self.logger.info("=" * 80)
         
         for idx, project_code in enumerate(valid_project_codes, 1):
-            project_data = self.travel_df[self.travel_df['项目代码'] == project_code]
-            
             # 获取项目名称（从"项目"字段提取）
             project_name = "未命名"
-            if '项目' in project_data.columns:
-                first_project = project_data['项目'].iloc[0] if not project_data.empty else ""
+            order_count = int(project_sizes.at[project_code])
+            if first_projects is not None:
+                first_project = first_projects.get(project_code, "") if order_count > 0 else ""
                 if pd.notna(first_project) and str(first_project) != "未知":
                     # 提取项目代码后面的名称部分
                     project_str = str(first_project).strip()
@@ -188,32 +208,33 @@ class TravelAnalyzer:
                         project_name = parts[1][:50]  # 限制长度
             
             # 计算各类成本
-            total_cost = project_data['授信金额'].sum()
-            flight_cost = project_data[project_data['差旅类型'] == '机票']['授信金额'].sum()
-            hotel_cost = project_data[project_data['差旅类型'] == '酒店']['授信金额'].sum()
-            train_cost = project_data[project_data['差旅类型'] == '火车票']['授信金额'].sum()
-            order_count = len(project_data)
+            total_cost = project_totals.at[project_code]
+            flight_cost = _type_value(type_costs, project_code, '机票')
+            hotel_cost = _type_value(type_costs, project_code, '酒店')
+            train_cost = _type_value(type_costs, project_code, '火车票')
             
             # 输出项目汇总信息
             self.logger.info(f"\n📁 项目 #{idx}: {project_code} - {project_name}")
             self.logger.info(f"   订单总数: {order_count}")
             self.logger.info(f"   总成本: ¥{total_cost:,.2f}")
-            self.logger.info(f"   ├─ 机票: ¥{flight_cost:,.2f} ({len(project_data[project_data['差旅类型'] == '机票'])}单)")
-            self.logger.info(f"   ├─ 酒店: ¥{hotel_cost:,.2f} ({len(project_data[project_data['差旅类型'] == '酒店'])}单)")
-            self.logger.info(f"   └─ 火车票: ¥{train_cost:,.2f} ({len(project_data[project_data['差旅类型'] == '火车票'])}单)")
+            self.logger.info(f"   ├─ 机票: ¥{flight_cost:,.2f} ({_type_value(type_sizes, project_code, '机票')}单)")
+            self.logger.info(f"   ├─ 酒店: ¥{hotel_cost:,.2f} ({_type_value(type_sizes, project_code, '酒店')}单)")
+            self.logger.info(f"   └─ 火车票: ¥{train_cost:,.2f} ({_type_value(type_sizes, project_code, '火车票')}单)")
             
-            # 输出每条记录的明细（前10条，避免日志过大）
-            self.logger.debug(f"   📝 明细记录（前10条）:")
-            for i, (_, row) in enumerate(project_data.head(10).iterrows(), 1):
-                name = row.get('差旅人员姓名', '未知')
-                travel_type = row.get('差旅类型', '未知')
-                amount = row.get('授信金额', 0)
-                date = row.get('消费日期', '未知')
-                date_str = date.strftime('%Y-%m-%d') if pd.notna(date) else '未知'
-                self.logger.debug(f"      {i}. {travel_type} | {name} | ¥{amount:,.2f} | {date_str}")
-            
-            if order_count > 10:
-                self.logger.debug(f"      ... 还有 {order_count - 10} 条记录未显示")
+            # 输出每条记录的明细（前10条，避免日志过大），仅在开启 DEBUG 时筛选明细
+            if debug_enabled:
+                project_data = self.travel_df[self.travel_df['项目代码'] == project_code]
+                self.logger.debug(f"   📝 明细记录（前10条）:")
+                for i, (_, row) in enumerate(project_data.head(10).iterrows(), 1):
+                    name = row.get('差旅人员姓名', '未知')
+                    travel_type = row.get('差旅类型', '未知')
+                    amount = row.get('授信金额', 0)
+                    date = row.get('消费日期', '未知')
+                    date_str = date.strftime('%Y-%m-%d') if pd.notna(date) else '未知'
+                    self.logger.debug(f"      {i}. {travel_type} | {name} | ¥{amount:,.2f} | {date_str}")
+                
+                if order_count > 10:
+                    self.logger.debug(f"      ... 还有 {order_count - 10} 条记录未显示")
             
             # 验证成本计算
             calculated_sum = flight_cost + hotel_cost + train_cost
@@ -308,28 +329,44 @@ class TravelAnalyzer:
         ].copy()
         self.logger.debug(f"上班考勤记录数: {len(work_records)}")
         
-        for _, record in work_records.iterrows():
-            date = record['日期']
-            name = record['姓名']
-            
-            # 查找同日差旅消费
-            same_day_travel = self.travel_df[
-                (self.travel_df['消费日期'] == date) & 
-                (self.travel_df['差旅人员姓名'] == name)
-            ]
-            
-            if not same_day_travel.empty:
-                for _, travel in same_day_travel.iterrows():
-                    anomalies.append({
-                        'Type': 'Conflict',
-                        '姓名': name,
-                        '日期': date.strftime('%Y-%m-%d') if pd.notna(date) else '',
-                        '考勤状态': record.get('当日状态判断', ''),
-                        '差旅类型': travel.get('差旅类型', ''),
-                        '差旅金额': float(travel.get('授信金额', 0)),
-                        '一级部门': record.get('一级部门', ''),
-                        '描述': '考勤显示上班但同日有异地差旅消费'
-                    })
+        # 按 (日期, 姓名) 一次性关联同日差旅消费，代替逐条考勤记录筛选差旅表；
+        # 空日期/姓名与任何记录都不相等，关联前先剔除（merge 会让空值互相匹配）
+        attendance_cols = [c for c in ['日期', '姓名', '当日状态判断', '一级部门'] if c in work_records.columns]
+        travel_cols = [c for c in ['消费日期', '差旅人员姓名', '差旅类型', '授信金额'] if c in self.travel_df.columns]
+        left = work_records[attendance_cols].dropna(subset=['日期', '姓名'])
+        left = left.assign(_attendance_pos=range(len(left)))
+        right = self.travel_df[travel_cols].dropna(subset=['消费日期', '差旅人员姓名'])
+        right = right.assign(_travel_pos=range(len(right)))
+        conflicts = left.merge(
+            right,
+            left_on=['日期', '姓名'],
+            right_on=['消费日期', '差旅人员姓名'],
+            how='inner'
+        )
+        # 保持逐行检测时的输出顺序：考勤记录顺序优先，其次为差旅记录顺序
+        conflicts = conflicts.sort_values(['_attendance_pos', '_travel_pos'], kind='stable')
+        
+        def _column(df: pd.DataFrame, column: str, default) -> List:
+            return df[column].tolist() if column in df.columns else [default] * len(df)
+        
+        for date, name, status, travel_type, amount, dept in zip(
+            conflicts['日期'].tolist(),
+            conflicts['姓名'].tolist(),
+            _column(conflicts, '当日状态判断', ''),
+            _column(conflicts, '差旅类型', ''),
+            _column(conflicts, '授信金额', 0),
+            _column(conflicts, '一级部门', '')
+        ):
+            anomalies.append({
+                'Type': 'Conflict',
+                '姓名': name,
+                '日期': date.strftime('%Y-%m-%d'),
+                '考勤状态': status,
+                '差旅类型': travel_type,
+                '差旅金额': float(amount),
+                '一级部门': dept,
+                '描述': '考勤显示上班但同日有异地差旅消费'
+            })
         
         # 类型2: 考勤显示出差，但无任何差旅消费
         # 注意：根据业务需求，此类异常已被标记为"可忽略"，不纳入异常统计
@@ -506,9 +543,12 @@ class TravelAnalyzer:
         
         # 计算部门工时
         if not self.attendance_df.empty and '一级部门' in self.attendance_df.columns:
-            dept_hours = self.attendance_df.groupby('一级部门')['工时'].sum().to_dict()
+            dept_groups = self.attendance_df.groupby('一级部门', observed=True)
+            dept_hours = dept_groups['工时'].sum().to_dict()
+            dept_employees = dept_groups['姓名'].nunique().to_dict()
         else:
             dept_hours = {}
+            dept_employees = {}
         
         # 合并所有部门
         all_depts = set(list(dept_cost.keys()) + list(dept_hours.keys()))
@@ -523,9 +563,7 @@ class TravelAnalyzer:
             # 饱和度 = 工时 / (人数 * 标准工时)
             # 简化计算：假设标准工时为 8小时/天 * 22天/月
             standard_hours = 176
-            employee_count = self.attendance_df[
-                self.attendance_df['一级部门'] == dept
-            ]['姓名'].nunique() if not self.attendance_df.empty else 1
+            employee_count = dept_employees.get(dept, 0) if not self.attendance_df.empty else 1
             
             saturation = (total_hours / (employee_count * standard_hours) * 100) if employee_count > 0 else 0
             
@@ -12,7 +12,7 @@ import uuid
 from datetime import datetime
 from pathlib import Path
 
-from app.services.excel_processor import ExcelProcessor
+from app.services.excel_processor import ExcelProcessor, purge_frame_cache
 from app.services.database_parser import DatabaseParser
 from app.services.upload_progress import progress_manager
 from app.services.auth_service import (
@@ -550,11 +550,13 @@ async def export_results(file_path: str):
     
     try:
         processor = ExcelProcessor(file_path)
-        processor.load_all_sheets(load_workbook_obj=True)
+        # 工作簿对象由 write_analysis_results 在回写时按需加载，避免分析期间常驻内存
+        processor.load_all_sheets(load_workbook_obj=False)
         
         # 执行分析
+        project_costs, _ = processor.aggregate_project_costs()
         results = {
-            'project_costs': processor.aggregate_project_costs(),
+            'project_costs': project_costs,
             'department_costs': processor.calculate_department_costs(),
             'anomalies': processor.cross_check_attendance_travel()
         }
@@ -583,7 +585,7 @@ async def get_sheets(file_path: str):
     
     try:
         processor = ExcelProcessor(file_path)
-        sheets = processor.load_all_sheets()
+        sheets = processor.load_all_sheets(required_only=False)
         
         return {
             "success": True,
@@ -611,6 +613,8 @@ async def delete_file(file_path: str):
     
     try:
         os.remove(file_path)
+        # 已删除文件的清洗结果缓存一并清理，避免数据残留
+        purge_frame_cache(file_path)
         # 同步删除记录
         records = [r for r in _load_upload_records() if r.get("file_path") != file_path]
         _save_upload_records(records)
@@ -642,9 +646,13 @@ async def clear_data(file_path: str):
         if target_path.exists():
             if target_path.is_file() or target_path.is_symlink():
                 target_path.unlink(missing_ok=True)
+                purge_frame_cache(str(target_path))
                 cleared_file = True
             elif target_path.is_dir():
+                removed_files = [str(path) for path in target_path.rglob("*") if path.is_file()]
                 shutil.rmtree(target_path)
+                for removed_file in removed_files:
+                    purge_frame_cache(removed_file)
                 cleared_file = True
 
         filtered_records = []
@@ -24,6 +24,40 @@ ENV_FILE_PATHS = (
 )
 
 
+def parse_allowed_origins(value):
+    """
+    解析 ALLOWED_ORIGINS 配置：
+    1) 逗号分隔字符串: a,b,c
+    2) JSON 数组字符串: ["a","b","c"]
+    为空或解析结果为空时回退到默认列表
+    """
+    if value is None:
+        return DEFAULT_ALLOWED_ORIGINS.copy()
+
+    if isinstance(value, str):
+        stripped = value.strip()
+        if not stripped:
+            return DEFAULT_ALLOWED_ORIGINS.copy()
+
+        if stripped.startswith("["):
+            try:
+                parsed = json.loads(stripped)
+            except json.JSONDecodeError:
+                parsed = None
+            if isinstance(parsed, list):
+                origins = [str(origin).strip() for origin in parsed if str(origin).strip()]
+                return origins or DEFAULT_ALLOWED_ORIGINS.copy()
+
+        origins = [origin.strip() for origin in stripped.split(",") if origin.strip()]
+        return origins or DEFAULT_ALLOWED_ORIGINS.copy()
+
+    if isinstance(value, (list, tuple, set)):
+        origins = [str(origin).strip() for origin in value if str(origin).strip()]
+        return origins or DEFAULT_ALLOWED_ORIGINS.copy()
+
+    return value
+
+
 class Settings(BaseSettings):
     """应用配置类"""
 
@@ -54,6 +88,9 @@ class Settings(BaseSettings):
     # 文件上传配置
     upload_dir: str = "./uploads"
     max_upload_size: int = 50  # MB
+    # 清洗结果缓存（uploads/cache/frames）的保留期限与总容量上限，超出时自动清理
+    frame_cache_max_age_days: int = 7
+    frame_cache_max_size_mb: int = 1024
 
     # 数据库配置
     # 优先读取完整连接串 DATABASE_URL，否则根据 DB_* 自动拼接
@@ -69,36 +106,8 @@ class Settings(BaseSettings):
     @field_validator("allowed_origins", mode="before")
     @classmethod
     def split_origins(cls, value):
-        """
-        支持通过环境变量 ALLOWED_ORIGINS 配置：
-        1) 逗号分隔字符串: a,b,c
-        2) JSON 数组字符串: ["a","b","c"]
-        """
-        if value is None:
-            return DEFAULT_ALLOWED_ORIGINS.copy()
-
-        if isinstance(value, str):
-            stripped = value.strip()
-            if not stripped:
-                return DEFAULT_ALLOWED_ORIGINS.copy()
-
-            if stripped.startswith("["):
-                try:
-                    parsed = json.loads(stripped)
-                except json.JSONDecodeError:
-                    parsed = None
-                if isinstance(parsed, list):
-                    origins = [str(origin).strip() for origin in parsed if str(origin).strip()]
-                    return origins or DEFAULT_ALLOWED_ORIGINS.copy()
-
-            origins = [origin.strip() for origin in stripped.split(",") if origin.strip()]
-            return origins or DEFAULT_ALLOWED_ORIGINS.copy()
-
-        if isinstance(value, (list, tuple, set)):
-            origins = [str(origin).strip() for origin in value if str(origin).strip()]
-            return origins or DEFAULT_ALLOWED_ORIGINS.copy()
-
-        return value
+        """支持 CSV 与 JSON 数组两种 ALLOWED_ORIGINS 写法，解析见 parse_allowed_origins"""
+        return parse_allowed_origins(value)
 
     @field_validator("db_type", mode="before")
     @classmethod
@@ -1,6 +1,7 @@
 """CRUD operations for database access."""
 import hashlib
 import json
+import re
 from datetime import datetime, time, timedelta
 from typing import List, Optional, Tuple
 import pandas as pd
@@ -14,6 +15,9 @@ from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 机票“超标类型”多标签拆分：分号、逗号、顿号、斜杠及空白均视为分隔符
+_OVER_TYPE_SPLIT_RE = re.compile(r'[;,，、/\s]+')
+
 
 def _month_ranges(months: List[str]) -> List[Tuple[datetime, datetime]]:
     """Convert YYYY-MM strings to (start, end) datetime ranges."""
@@ -278,7 +282,8 @@ def batch_insert_attendance(db: Session, upload_id: int, df: pd.DataFrame) -> in
         return None
 
     records = []
-    for _, row in df.iterrows():
+    # 逐行取 dict（原生标量），避免 iterrows 为每行构造 Series；可选列仍按 row.get 取默认值
+    for row in df.to_dict('records'):
         name = row['姓名']
         if pd.isna(name) or (isinstance(name, str) and name.strip() == ''):
             continue
@@ -381,7 +386,8 @@ def batch_insert_travel_expenses(
         return "超" in over_type
 
     records = []
-    for _, row in df.iterrows():
+    # 逐行取 dict（原生标量），避免 iterrows 为每行构造 Series；可选列仍按 row.get 取默认值
+    for row in df.to_dict('records'):
         name = row['姓名']
         if pd.isna(name) or (isinstance(name, str) and name.strip() == ''):
             continue
@@ -1771,7 +1777,6 @@ def get_flight_over_type_breakdown_by_month(db: Session, month: str) -> dict:
 
 def get_flight_over_type_breakdown(db: Session, months: List[str]) -> dict:
     """Get flight over type breakdown for the given months."""
-    import re
 
     ranges = _month_ranges(months)
     upload_ids = get_all_uploads_for_months(db, months)
@@ -1798,7 +1803,7 @@ def get_flight_over_type_breakdown(db: Session, months: List[str]) -> dict:
             raw = str(row.over_type)
             tokens = []
 
-            for part in re.split(r'[;,，、/\\s]+', raw):
+            for part in _OVER_TYPE_SPLIT_RE.split(raw):
                 cleaned = part.strip()
                 if cleaned and '超' in cleaned:
                     tokens.append(cleaned)
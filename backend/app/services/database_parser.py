@@ -43,8 +43,8 @@ class DatabaseParser:
             self.logger.info(f"Starting database parsing for {self.file_path}")
             sheets_data = self.processor.load_all_sheets()
 
-            # Get sheet names
-            sheet_names = list(sheets_data.keys())
+            # Get sheet names (all sheets in the workbook, including ones not parsed)
+            sheet_names = self.processor.sheet_names
 
             self._update_progress(50, "正在创建上传记录...")
             
@@ -124,6 +124,8 @@ class DatabaseParser:
                             mask = expense_df['一级部门'].isna()
                             if mask.any():
                                 self.logger.info(f"[{sheet_name}] 发现 {mask.sum()} 条记录部门信息为空，尝试从考勤表填充")
+                                # 清洗结果由 processor 缓存并被后续分析复用，回填前先拷贝，避免污染缓存
+                                expense_df = expense_df.copy()
                                 expense_df.loc[mask, '一级部门'] = expense_df.loc[mask, '姓名'].map(person_dept_map)
 
                         count = batch_insert_travel_expenses(
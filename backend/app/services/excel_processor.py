@@ -4,46 +4,292 @@ Excel 数据处理服务
 """
 import pandas as pd
 import numpy as np
-from openpyxl import load_workbook
+from openpyxl import Workbook, load_workbook
 from typing import Dict, List, Tuple, Any, Optional
 from datetime import datetime
 import re
 import os
 import time
-from collections import Counter
-
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from collections import Counter, OrderedDict
+from operator import itemgetter
+
+from app.config import settings
 from app.utils.logger import get_logger
 
+# 纯时间值（如 "22:17"、"08:05:30"），解析日期时需排除，避免被补成“今天”的日期
+_TIME_ONLY_RE = re.compile(r"^\s*\d{1,2}:\d{2}(:\d{2})?\s*$")
+_HHMM_RE = re.compile(r"^\d{1,2}:\d{2}(:\d{2})?$")
+# 项目字段 "05010013 市场-整星..."：开头数字为项目代码，其后为项目名称
+_PROJECT_CODE_RE = re.compile(r"^(\d+)\s+(.*)")
+# 机票“超标类型”多标签的常见分隔符：统一替换成空格后按空白拆分，无需正则
+_OVER_TYPE_SEPARATORS = str.maketrans({sep: ' ' for sep in ';,，、/'})
+# 项目字段拆分使用的字符串类型：安装了 pyarrow 时用 Arrow 承载，连续缓冲区上的 str 操作更快
+try:
+    import pyarrow  # noqa: F401
+    _STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    _STRING_DTYPE = pd.StringDtype()
+# Excel 读取引擎：安装了 python-calamine 时用其 Rust 解析器，否则沿用 pandas 默认引擎（openpyxl/xlrd）
+try:
+    import python_calamine
+    _EXCEL_ENGINE: Optional[str] = "calamine"
+except ImportError:
+    python_calamine = None
+    _EXCEL_ENGINE = None
+# 进程内清洗结果缓存（键同磁盘缓存文件名，含源文件修改时间），同一文件的后续请求免去读盘反序列化
+_FRAME_MEMO: "OrderedDict[str, Any]" = OrderedDict()
+_FRAME_MEMO_SIZE = 16
+_FRAME_MEMO_LOCK = threading.Lock()
+# 差旅明细中最常见的日期时间格式，命中时走 Cython 快速路径
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _detach_frames(value: Any) -> Any:
+    """
+    复制进程内缓存中的 DataFrame（含 Sheet 字典中的各 DataFrame），
+    使各请求拿到独立对象，调用方原地修改不会影响缓存和其他请求；
+    启用写时复制（pandas 3 默认）时浅拷贝即可隔离，否则做深拷贝
+    """
+    if isinstance(value, pd.DataFrame):
+        copy_on_write = pd.options.mode.copy_on_write is True or int(pd.__version__.split(".")[0]) >= 3
+        return value.copy(deep=not copy_on_write)
+    if isinstance(value, dict):
+        return {key: _detach_frames(item) for key, item in value.items()}
+    return value
+
+
+def _frame_cache_prefix(file_path: str) -> str:
+    """清洗结果缓存文件名前缀：源文件绝对路径的摘要，同一源文件的所有缓存共享此前缀"""
+    return hashlib.sha1(os.path.realpath(file_path).encode()).hexdigest()[:16]
+
+
+def purge_frame_cache(file_path: str, cache_dir: Optional[str] = None) -> int:
+    """
+    删除指定源文件的全部清洗结果缓存（磁盘文件及进程内缓存），返回删除的磁盘文件数；
+    源文件被删除时调用，避免已删除的考勤/差旅数据残留在缓存目录中
+    """
+    prefix = f"{_frame_cache_prefix(file_path)}-"
+    with _FRAME_MEMO_LOCK:
+        for key in [key for key in _FRAME_MEMO if key.startswith(prefix)]:
+            del _FRAME_MEMO[key]
+    frame_cache_dir = Path(cache_dir) if cache_dir else Path(settings.upload_dir) / "cache" / "frames"
+    removed = 0
+    if frame_cache_dir.is_dir():
+        for cache_path in frame_cache_dir.glob(f"{prefix}*"):
+            try:
+                cache_path.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def prune_frame_cache(cache_dir: Path) -> None:
+    """
+    按保留期限与总容量清理清洗结果缓存目录：先删除超期文件，
+    再按最近修改时间从旧到新删除，直到总大小不超过上限
+    """
+    max_age = settings.frame_cache_max_age_days * 86400
+    max_bytes = settings.frame_cache_max_size_mb * 1024 * 1024
+    now = time.time()
+    entries = []
+    expired = []
+    for cache_path in cache_dir.glob("*.pkl*"):
+        try:
+            stat = cache_path.stat()
+        except OSError:
+            continue
+        if now - stat.st_mtime > max_age:
+            expired.append(cache_path)
+        elif cache_path.suffix == ".pkl":
+            # 未超期的 .tmp 可能是其他进程正在写入的文件，不参与容量淘汰
+            entries.append((stat.st_mtime, stat.st_size, cache_path))
+    total = sum(size for _, size, _ in entries)
+    entries.sort(key=itemgetter(0))
+    for _, size, cache_path in entries:
+        if total <= max_bytes:
+            break
+        expired.append(cache_path)
+        total -= size
+    for cache_path in expired:
+        cache_path.unlink(missing_ok=True)
+        with _FRAME_MEMO_LOCK:
+            _FRAME_MEMO.pop(cache_path.name, None)
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    """
+    先按常见格式解析（启用转换缓存），未命中的值再按 mixed 逐个推断，
+    避免整列退化到 dateutil 逐值解析
+    """
+    parsed = pd.to_datetime(values, format=_DATETIME_FORMAT, errors="coerce", cache=True)
+    failed = parsed.isna() & values.notna()
+    if failed.any():
+        parsed.loc[failed] = pd.to_datetime(values[failed], format="mixed", errors="coerce", cache=True)
+    return parsed
+
 
 class ExcelProcessor:
     """Excel 处理器"""
+
+    # 下游分析实际使用的 Sheet，其余 Sheet 默认不解析
+    REQUIRED_SHEETS = ['状态明细', '机票', '酒店', '火车票']
+    # 各差旅 Sheet 的日期列候选（按优先级），取第一个存在的列作为消费日期
+    SHEET_DATE_COLS = {
+        '机票': ['起飞日期', '起飞日期.1', '起飞时间', '起飞时间.1'],
+        '酒店': ['入住日期', '入住时间'],
+        '火车票': ['出发日期', '出发日期.1', '出发时间']
+    }
     
-    def __init__(self, file_path: str):
+    # 考勤状态标记列：清洗时预先计算，统计查询直接对布尔列求和/筛选
+    STATUS_FLAG_COLS = {
+        '_is_work': '上班', '_is_weekend_work': '公休日上班', '_is_travel': '出差', '_is_leave': '请假',
+        # 清洗后缺失/空状态已统一为"未知"
+        '_is_unknown': '未知'
+    }
+    # 清洗结果结构版本，清洗逻辑新增/调整列时递增，使旧的磁盘缓存失效
+    FRAME_CACHE_VERSION = 4
+    # 差旅 Sheet 与部门成本字段的对应关系
+    TRAVEL_COST_KEYS = {'机票': 'flight_cost', '酒店': 'hotel_cost', '火车票': 'train_cost'}
+
+    def __init__(self, file_path: str, cache_dir: Optional[str] = None):
         self.file_path = file_path
         self.sheets_data: Dict[str, pd.DataFrame] = {}
+        self.sheet_names: List[str] = []
         self.workbook = None
         self.logger = get_logger("excel_processor")
         self._attendance_cache: Optional[pd.DataFrame] = None
         self._travel_cache: Dict[str, pd.DataFrame] = {}
         self._combined_travel_cache: Optional[pd.DataFrame] = None
+        self._person_dept_map_cache: Optional[Dict[str, Any]] = None
+        self._anomalies_cache: Optional[List[Dict[str, Any]]] = None
+        self._travel_cost_cache: Optional[pd.DataFrame] = None
+        self._over_standard_cache: Optional[Dict[str, Any]] = None
+        # 各差旅 Sheet 的项目代码/名称拆分结果，项目成本、项目详情、订单查询共用
+        self._project_parts_cache: Dict[str, pd.DataFrame] = {}
+        # 考勤数据按部门列预分组，部门筛选走分组索引而非全表布尔扫描
+        self._dept_groups: Dict[str, Any] = {}
+        # 清洗结果的磁盘缓存目录，跨请求/进程复用，避免同一文件重复解析
+        self.frame_cache_dir = Path(cache_dir) if cache_dir else Path(settings.upload_dir) / "cache" / "frames"
+
+    def _frame_cache_path(self, name: str) -> Optional[Path]:
+        """
+        清洗结果缓存文件路径，以文件路径+修改时间+大小为键，源文件变化后自动失效；
+        文件名以源路径摘要开头，删除源文件时可据此找到并清理其全部缓存
+        """
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        stamp = f"{stat.st_mtime_ns}:{stat.st_size}:v{self.FRAME_CACHE_VERSION}"
+        stamp_key = hashlib.sha1(stamp.encode()).hexdigest()[:16]
+        return self.frame_cache_dir / f"{_frame_cache_prefix(self.file_path)}-{stamp_key}-{name}.pkl"
+
+    def _load_cached_frame(self, name: str) -> Optional[Any]:
+        """读取磁盘缓存的解析/清洗结果，未命中或读取失败时返回 None"""
+        cache_path = self._frame_cache_path(name)
+        if cache_path is None:
+            return None
+        with _FRAME_MEMO_LOCK:
+            df = _FRAME_MEMO.get(cache_path.name)
+            if df is not None:
+                _FRAME_MEMO.move_to_end(cache_path.name)
+                return _detach_frames(df)
+        if not cache_path.exists():
+            return None
+        try:
+            df = pd.read_pickle(cache_path)
+            # 刷新修改时间，容量淘汰时按最近使用排序
+            os.utime(cache_path)
+            self.logger.info(f"[{name}] 命中清洗结果磁盘缓存: {cache_path.name}")
+            self._remember_frame(cache_path.name, df)
+            return _detach_frames(df)
+        except Exception as e:
+            self.logger.warning(f"[{name}] 读取清洗结果缓存失败，将重新解析: {e}")
+            return None
+
+    @staticmethod
+    def _remember_frame(key: str, df: Any) -> None:
+        """放入进程内缓存，超过容量时淘汰最久未使用的条目"""
+        with _FRAME_MEMO_LOCK:
+            _FRAME_MEMO[key] = df
+            _FRAME_MEMO.move_to_end(key)
+            while len(_FRAME_MEMO) > _FRAME_MEMO_SIZE:
+                _FRAME_MEMO.popitem(last=False)
+
+    def _store_cached_frame(self, name: str, df: Any) -> None:
+        """写入解析/清洗结果磁盘缓存（DataFrame 或 Sheet 字典），失败仅记录日志，不影响主流程"""
+        cache_path = self._frame_cache_path(name)
+        if cache_path is None:
+            return
+        # 调用方会继续使用并可能修改 df，进程内缓存保存独立副本
+        self._remember_frame(cache_path.name, _detach_frames(df))
+        temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            pd.to_pickle(df, temp_path)
+            temp_path.replace(cache_path)
+            prune_frame_cache(self.frame_cache_dir)
+        except Exception as e:
+            self.logger.warning(f"[{name}] 写入清洗结果缓存失败: {e}")
+            if temp_path.exists():
+                temp_path.unlink()
         
-    def load_all_sheets(self, load_workbook_obj: bool = False) -> Dict[str, pd.DataFrame]:
+    def load_all_sheets(self, load_workbook_obj: bool = False,
+                        required_only: bool = True) -> Dict[str, pd.DataFrame]:
         """
-        加载所有 Sheet 数据
+        加载 Sheet 数据
 
         Args:
             load_workbook_obj: 是否同时加载 openpyxl Workbook 对象（仅在需要回写时启用）
+            required_only: 仅解析 REQUIRED_SHEETS 中的 Sheet（默认），无关 Sheet 不读取；
+                全部 Sheet 名称仍记录在 self.sheet_names 中
         """
         try:
             start = time.perf_counter()
-            self.logger.info(f"开始读取 Excel 文件: {self.file_path}")
-            all_sheets = pd.read_excel(self.file_path, sheet_name=None)
+            self.logger.info(f"开始读取 Excel 文件: {self.file_path}（引擎: {_EXCEL_ENGINE or 'pandas 默认'}）")
+            # 同一文件（路径+修改时间+大小不变）再次加载时直接复用解析结果，不重新读取 Excel
+            sheets_cache_name = "sheets" if required_only else "sheets-all"
+            cached_sheets = self._load_cached_frame(sheets_cache_name)
+            if cached_sheets is not None:
+                self.sheet_names = list(cached_sheets['sheet_names'])
+                all_sheets = dict(cached_sheets['sheets'])
+            else:
+                with pd.ExcelFile(self.file_path, engine=_EXCEL_ENGINE) as excel_file:
+                    self.sheet_names = list(excel_file.sheet_names)
+                    if required_only:
+                        target_sheets = [name for name in self.sheet_names if name in self.REQUIRED_SHEETS]
+                    else:
+                        target_sheets = self.sheet_names
+                    # calamine 顺序解析已足够快；openpyxl 引擎下多个 Sheet 改为并发读取
+                    concurrent_read = _EXCEL_ENGINE is None and len(target_sheets) > 1
+                    if not concurrent_read:
+                        all_sheets = excel_file.parse(sheet_name=target_sheets) if target_sheets else {}
+                if concurrent_read:
+                    all_sheets = self._read_sheets_concurrently(target_sheets)
+                self._store_cached_frame(sheets_cache_name, {'sheet_names': self.sheet_names, 'sheets': all_sheets})
+
+            if required_only:
+                missing_sheets = [name for name in self.REQUIRED_SHEETS if name not in self.sheet_names]
+                if missing_sheets:
+                    self.logger.warning(f"Excel 缺少 Sheet: {', '.join(missing_sheets)}，相关分析将跳过")
             elapsed = time.perf_counter() - start
 
             self.sheets_data = all_sheets
             self._attendance_cache = None
             self._travel_cache = {}
             self._combined_travel_cache = None
+            self._person_dept_map_cache = None
+            self._anomalies_cache = None
+            self._travel_cost_cache = None
+            self._over_standard_cache = None
+            self._project_parts_cache = {}
+            self._dept_groups = {}
 
             sheet_names = ", ".join(all_sheets.keys())
             self.logger.info(f"Excel 读取完成（{sheet_names}），耗时 {elapsed:.2f}s")
@@ -70,11 +316,28 @@ class ExcelProcessor:
         except Exception as e:
             raise Exception(f"读取 Excel 文件失败: {str(e)}")
 
+    def _read_sheets_concurrently(self, sheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        每个 Sheet 在独立线程中用各自的 ExcelFile 读取（ExcelFile 不可跨线程共享），
+        解压等 I/O 可与解析重叠；结果保持 sheet_names 的顺序
+        """
+        def read_sheet(sheet_name: str) -> pd.DataFrame:
+            with pd.ExcelFile(self.file_path, engine=_EXCEL_ENGINE) as excel_file:
+                return excel_file.parse(sheet_name=sheet_name)
+
+        max_workers = min(len(sheet_names), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(read_sheet, sheet_names))
+        return dict(zip(sheet_names, frames))
+
     def get_sheet_names(self) -> List[str]:
         """
         仅获取 Sheet 名称，避免读取全部数据导致耗时
         """
         try:
+            if python_calamine is not None:
+                # calamine 只读取工作簿目录信息，不流式解析各 Sheet
+                return list(python_calamine.CalamineWorkbook.from_path(self.file_path).sheet_names)
             workbook = load_workbook(
                 self.file_path,
                 read_only=True,
@@ -98,34 +361,59 @@ class ExcelProcessor:
         if use_cache and self._attendance_cache is not None:
             return self._attendance_cache
 
+        if use_cache:
+            cached = self._load_cached_frame("状态明细")
+            if cached is not None:
+                self._attendance_cache = cached
+                return cached
+
         df = self.get_sheet("状态明细")
         if df is None:
             return pd.DataFrame()
         
-        # 标准化列名
-        df = df.copy()
+        # 浅拷贝即可：以下只做整列替换（不原地写入），原始 Sheet 数据不会被改动
+        df = df.copy(deep=False)
         
-        # 处理日期格式
-        if '日期' in df.columns:
+        # 处理日期格式（读取引擎已给出 datetime/数值列时跳过重复转换）
+        if '日期' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['日期']):
             df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
         
         # 处理工时数据
-        if '工时' in df.columns:
+        if '工时' in df.columns and not pd.api.types.is_numeric_dtype(df['工时']):
             df['工时'] = pd.to_numeric(df['工时'], errors='coerce')
         
         # 删除空行
         df = df.dropna(subset=['姓名'], how='all')
 
+        # 部门列基数低且重复多，转为 category，后续筛选/分组/关联走整数编码
+        for col in ('一级部门', '二级部门', '三级部门'):
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+
         # 规范化考勤状态，缺失/空值统一为“未知”
         if '当日状态判断' in df.columns:
             status_series = df['当日状态判断']
             status_clean = status_series.astype(str).str.strip()
             unknown_mask = status_series.isna() | status_clean.eq('') | status_clean.eq('nan')
-            df.loc[unknown_mask, '当日状态判断'] = '未知'
-            df['当日状态判断'] = df['当日状态判断'].astype(str).str.strip()
+            df['当日状态判断'] = status_clean.mask(unknown_mask, '未知')
+
+        # 姓名/考勤状态同样重复度高，转 category 后状态等值比较、按人分组都走整数编码
+        for col in ('姓名', '当日状态判断'):
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+
+        # 下游反复使用的判断（状态、有效工时、19:30后下班）预先算成布尔列
+        if '当日状态判断' in df.columns:
+            for flag_col, status in self.STATUS_FLAG_COLS.items():
+                df[flag_col] = df['当日状态判断'].eq(status).to_numpy(dtype=bool)
+        if '工时' in df.columns:
+            df['_has_hours'] = (df['工时'].notna() & df['工时'].ne(0)).to_numpy(dtype=bool)
+        if '最晚19:30之后' in df.columns:
+            df['_is_late_1930'] = df['最晚19:30之后'].eq('符合').to_numpy(dtype=bool)
 
         if use_cache:
             self._attendance_cache = df
+            self._store_cached_frame("状态明细", df)
         
         return df
     
@@ -136,6 +424,12 @@ class ExcelProcessor:
         if use_cache and sheet_name in self._travel_cache:
             return self._travel_cache[sheet_name]
 
+        if use_cache:
+            cached = self._load_cached_frame(sheet_name)
+            if cached is not None:
+                self._travel_cache[sheet_name] = cached
+                return cached
+
         df = self.get_sheet(sheet_name)
         if df is None:
             self.logger.warning(f"[{sheet_name}] Sheet 不存在")
@@ -144,16 +438,18 @@ class ExcelProcessor:
         self.logger.info(f"[{sheet_name}] 开始清洗数据 - 原始列名: {list(df.columns)}")
         self.logger.info(f"[{sheet_name}] 原始行数: {len(df)}")
 
-        df = df.copy()
+        # 浅拷贝：下方只做整列替换/新增（不原地写入），未改动的列与原始 Sheet 共享内存
+        df = df.copy(deep=False)
         # 标准化列名：去除首尾空格，避免不同月份 Excel 列名细微差异导致匹配失败
         df.columns = [str(c).strip() for c in df.columns]
-        original_df = df.copy()
         
         # 处理金额字段
         amount_col = '授信金额' if '授信金额' in df.columns else '金额'
         self.logger.info(f"[{sheet_name}] 金额列: {amount_col}")
         if amount_col in df.columns:
-            df[amount_col] = pd.to_numeric(df[amount_col], errors='coerce')
+            # 读取引擎已给出数值列时跳过 to_numeric 的逐值强转
+            if not pd.api.types.is_numeric_dtype(df[amount_col]):
+                df[amount_col] = pd.to_numeric(df[amount_col], errors='coerce')
             # 将 NaN 填充为 0，但保留所有记录
             df[amount_col] = df[amount_col].fillna(0)
             self.logger.info(f"[{sheet_name}] 金额列有效值数: {df[amount_col].notna().sum()}")
@@ -167,16 +463,11 @@ class ExcelProcessor:
             if series is None:
                 return pd.Series(dtype="datetime64[ns]")
 
-            # 已经是 datetime 类型
-            try:
-                if pd.api.types.is_datetime64_any_dtype(series):
-                    return pd.to_datetime(series, errors="coerce")
-            except Exception:
-                pass
+            # 已经是 datetime 类型：读取引擎已完成解析，直接复用
+            if pd.api.types.is_datetime64_any_dtype(series):
+                return series
 
             # 处理 datetime.time 或纯时间字符串
-            time_only_regex = re.compile(r"^\\s*\\d{1,2}:\\d{2}(:\\d{2})?\\s*$")
-
             def _is_time_obj(v: Any) -> bool:
                 try:
                     from datetime import time as dt_time
@@ -184,60 +475,62 @@ class ExcelProcessor:
                 except Exception:
                     return False
 
-            if series.dtype == object:
-                cleaned = series.copy()
+            # pandas 3 默认字符串列为 str dtype（有 pyarrow 时由 Arrow 承载），同样需要排除纯时间值
+            if series.dtype == object or pd.api.types.is_string_dtype(series):
+                cleaned = series.astype(object)
                 mask_time_obj = cleaned.map(_is_time_obj)
                 cleaned.loc[mask_time_obj] = None
 
                 str_series = cleaned.astype(str)
-                mask_time_str = str_series.str.match(time_only_regex, na=False)
+                mask_time_str = str_series.str.match(_TIME_ONLY_RE, na=False)
                 cleaned.loc[mask_time_str] = None
 
-                return pd.to_datetime(cleaned, errors="coerce")
+                return _to_datetime(cleaned)
 
             return pd.to_datetime(series, errors="coerce")
 
         found_date_cols: List[str] = []
         if sheet_name == '机票':
-            if '起飞时间' in original_df.columns:
-                df['起飞日期'] = _parse_datetime_avoiding_time_only(original_df['起飞时间'])
+            if '起飞时间' in df.columns:
+                df['起飞日期'] = _parse_datetime_avoiding_time_only(df['起飞时间'])
                 found_date_cols.append('起飞时间→起飞日期')
-            if '起飞时间.1' in original_df.columns:
-                df['起飞日期.1'] = _parse_datetime_avoiding_time_only(original_df['起飞时间.1'])
+            if '起飞时间.1' in df.columns:
+                df['起飞日期.1'] = _parse_datetime_avoiding_time_only(df['起飞时间.1'])
                 found_date_cols.append('起飞时间.1→起飞日期.1')
         elif sheet_name == '酒店':
             # 以“入住日期”为主；若存在“入住时间”（含日期时间），补充到“入住日期.1”
-            if '入住日期' in original_df.columns:
-                df['入住日期'] = _parse_datetime_avoiding_time_only(original_df['入住日期'])
+            if '入住日期' in df.columns:
+                df['入住日期'] = _parse_datetime_avoiding_time_only(df['入住日期'])
                 found_date_cols.append('入住日期')
-            if '入住时间' in original_df.columns:
-                dt_full = _parse_datetime_avoiding_time_only(original_df['入住时间'])
+            if '入住时间' in df.columns:
+                dt_full = _parse_datetime_avoiding_time_only(df['入住时间'])
                 if dt_full.notna().any():
                     df['入住日期.1'] = dt_full
                     found_date_cols.append('入住时间→入住日期.1')
         elif sheet_name == '火车票':
             # “出发日期”是关键日期字段。旧逻辑会把“出发时间”(HH:MM)写入“出发日期”，导致日期被解析成“今天”。
-            if '出发日期' in original_df.columns:
-                df['出发日期'] = _parse_datetime_avoiding_time_only(original_df['出发日期'])
+            if '出发日期' in df.columns:
+                df['出发日期'] = _parse_datetime_avoiding_time_only(df['出发日期'])
                 found_date_cols.append('出发日期')
-            elif '出发时间' in original_df.columns:
+            elif '出发时间' in df.columns:
                 # 兜底：某些模板可能只提供“出发时间”(包含日期时间)
-                df['出发日期'] = _parse_datetime_avoiding_time_only(original_df['出发时间'])
+                df['出发日期'] = _parse_datetime_avoiding_time_only(df['出发时间'])
                 found_date_cols.append('出发时间→出发日期')
 
             # 如果“出发时间”存在且是完整日期时间，写入“出发日期.1”；若仅是时间字符串，则与“出发日期”组合
-            if '出发时间' in original_df.columns:
-                dt_full = _parse_datetime_avoiding_time_only(original_df['出发时间'])
+            if '出发时间' in df.columns:
+                dt_full = _parse_datetime_avoiding_time_only(df['出发时间'])
                 if dt_full.notna().any():
                     df['出发日期.1'] = dt_full
                     found_date_cols.append('出发时间→出发日期.1')
                 elif '出发日期' in df.columns and df['出发日期'].notna().any():
-                    time_str = original_df['出发时间'].astype(str).str.strip()
-                    time_only_mask = time_str.str.match(r"^\\d{1,2}:\\d{2}(:\\d{2})?$", na=False)
+                    time_str = df['出发时间'].astype(str).str.strip()
+                    time_only_mask = time_str.str.match(_HHMM_RE, na=False)
                     if time_only_mask.any():
                         date_str = df['出发日期'].dt.strftime('%Y-%m-%d')
-                        combined = pd.to_datetime(date_str + ' ' + time_str, errors='coerce')
-                        df.loc[time_only_mask, '出发日期.1'] = combined.loc[time_only_mask]
+                        combined = _to_datetime(date_str + ' ' + time_str)
+                        base = df['出发日期.1'] if '出发日期.1' in df.columns else pd.Series(pd.NaT, index=df.index)
+                        df['出发日期.1'] = combined.where(time_only_mask, base)
                         found_date_cols.append('出发日期+出发时间→出发日期.1')
 
         self.logger.info(f"[{sheet_name}] 找到的日期列: {found_date_cols}")
@@ -257,6 +550,7 @@ class ExcelProcessor:
 
         if use_cache:
             self._travel_cache[sheet_name] = df
+            self._store_cached_frame(sheet_name, df)
         
         return df
 
@@ -267,42 +561,82 @@ class ExcelProcessor:
         if self._combined_travel_cache is not None:
             return self._combined_travel_cache
 
+        cached = self._load_cached_frame("combined_travel")
+        if cached is not None:
+            self._combined_travel_cache = cached
+            return cached
+
         frames: List[pd.DataFrame] = []
-        date_columns = {
-            '机票': ['起飞日期', '起飞日期.1', '起飞时间', '起飞时间.1'],
-            '酒店': ['入住日期', '入住时间'],
-            '火车票': ['出发日期', '出发时间']
-        }
 
-        for sheet_name, date_cols in date_columns.items():
+        for sheet_name, date_cols in self.SHEET_DATE_COLS.items():
             df = self.clean_travel_data(sheet_name)
             if df.empty:
                 continue
             
-            date_col = None
-            for col in date_cols:
-                if col in df.columns:
-                    date_col = col
-                    break
-            
+            date_col = next((col for col in date_cols if col in df.columns), None)
             if not date_col:
                 continue
 
-            temp = df[['姓名', date_col]].copy()
-            temp = temp[temp[date_col].notna()]
+            # 一次 .loc 完成行过滤与列选择，避免先拷贝再过滤产生两份中间副本
+            temp = df.loc[df[date_col].notna(), ['姓名', date_col]]
             if temp.empty:
                 continue
 
-            temp['消费日期'] = temp[date_col].dt.date
-            temp['差旅类型'] = sheet_name
-            frames.append(temp[['姓名', '消费日期', '差旅类型']])
+            # 保持 datetime64 并归一到零点，关联时走 int64 哈希而非 Python date 对象
+            frames.append(temp.assign(
+                消费日期=lambda d: d[date_col].dt.normalize(),
+                差旅类型=sheet_name
+            )[['姓名', '消费日期', '差旅类型']])
 
         combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
             columns=['姓名', '消费日期', '差旅类型']
         )
+        # 差旅类型只有三种取值，用分类类型存整数编码，分组/比较不再逐个比对字符串
+        combined['差旅类型'] = pd.Categorical(combined['差旅类型'], categories=list(self.SHEET_DATE_COLS))
         self._combined_travel_cache = combined
+        self._store_cached_frame("combined_travel", combined)
         return combined
 
+    def _get_person_dept_map(self) -> Dict[str, Any]:
+        """
+        获取 姓名 → 一级部门 映射（来自考勤数据，作为差旅表部门为空时的备用），
+        构建一次后缓存，供项目详情/订单查询复用
+        """
+        if self._person_dept_map_cache is not None:
+            return self._person_dept_map_cache
+
+        attendance_df = self.clean_attendance_data()
+        person_dept_map = {}
+        if not attendance_df.empty and '姓名' in attendance_df.columns and '一级部门' in attendance_df.columns:
+            person_dept_map = attendance_df[['姓名', '一级部门']].drop_duplicates().set_index('姓名')['一级部门'].to_dict()
+        self._person_dept_map_cache = person_dept_map
+        return person_dept_map
+
+    def _get_department_rows(self, dept_col: str, department_name: str) -> pd.DataFrame:
+        """
+        获取指定部门的考勤记录（按部门列分组一次后缓存，后续查询直接取组）
+        """
+        groups = self._dept_groups.get(dept_col)
+        if groups is None:
+            df = self.clean_attendance_data()
+            if df.empty or dept_col not in df.columns:
+                return df.iloc[0:0]
+            groups = df.groupby(dept_col, sort=False, observed=True)
+            self._dept_groups[dept_col] = groups
+        try:
+            return groups.get_group(department_name)
+        except KeyError:
+            return self.clean_attendance_data().iloc[0:0]
+
+    def _status_distribution(self, df: pd.DataFrame) -> Dict[str, int]:
+        """
+        考勤状态天数分布（状态列为 category，需剔除当前范围内未出现的状态）
+        """
+        if '当日状态判断' not in df.columns:
+            return {}
+        counts = df['当日状态判断'].value_counts()
+        return {status: int(count) for status, count in counts[counts > 0].items()}
+
     def _unknown_status_mask(self, df: pd.DataFrame) -> pd.Series:
         """
         标记考勤状态为未知/缺失的记录，用于疑似异常统计
@@ -311,6 +645,8 @@ class ExcelProcessor:
             return pd.Series(dtype=bool)
         if df.empty or '当日状态判断' not in df.columns:
             return pd.Series(False, index=df.index, dtype=bool)
+        if '_is_unknown' in df.columns:
+            return df['_is_unknown']
 
         status_series = df['当日状态判断']
         status_clean = status_series.astype(str).str.strip()
@@ -325,18 +661,43 @@ class ExcelProcessor:
             return "", ""
         
         # 尝试提取项目代码（通常是开头的数字）
-        match = re.match(r'(\d+)\s+(.*)', project_str.strip())
+        match = _PROJECT_CODE_RE.match(project_str.strip())
         if match:
             return match.group(1), match.group(2)
         
         return "", project_str
+
+    def _split_project_column(self, project: pd.Series) -> pd.DataFrame:
+        """
+        向量化拆分项目字段，规则与 extract_project_code 一致；
+        未能提取项目代码的记录归入"空项目"
+
+        项目取值重复度高，正则只在去重后的取值上执行一次，再按编码映射回各行
+        """
+        codes, uniques = pd.factorize(project, use_na_sentinel=False)
+        unique_parts = (
+            pd.Series(uniques, dtype=object).astype(_STRING_DTYPE)
+            .str.strip().str.extract(_PROJECT_CODE_RE, expand=True)
+        )
+        unique_parts.columns = ['project_code', 'project_name']
+        unique_parts = unique_parts.fillna({'project_code': '空项目', 'project_name': '未分配项目'})
+        return unique_parts.iloc[codes].set_axis(project.index)
     
-    def aggregate_project_costs(self, top_n: int = 20) -> List[Dict[str, Any]]:
+    def _get_project_parts(self, sheet_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """获取差旅 Sheet（清洗后数据）的项目拆分结果，按 Sheet 缓存"""
+        parts = self._project_parts_cache.get(sheet_name)
+        if parts is None:
+            parts = self._split_project_column(df['项目'])
+            self._project_parts_cache[sheet_name] = parts
+        return parts
+
+    def aggregate_project_costs(self, top_n: int = 20, include_details: bool = False) -> List[Dict[str, Any]]:
         """
         项目成本归集
         
         Args:
             top_n: 返回前N个项目，其余汇总到"其他"（默认20）
+            include_details: 是否为每个 Top-N 项目附带前10条明细（默认不附带，details 为空列表）
         """
         self.logger.info("=" * 80)
         self.logger.info("开始执行项目成本归集 - 详细模式（Backend服务）")
@@ -347,7 +708,7 @@ class ExcelProcessor:
         # 处理所有差旅相关的 Sheet
         travel_sheets = ['机票', '酒店', '火车票']
         
-        all_records = []
+        project_frames: List[pd.DataFrame] = []
         sheet_stats = {}
         
         for sheet_name in travel_sheets:
@@ -368,51 +729,42 @@ class ExcelProcessor:
                 continue
             
             amount_col = '授信金额' if '授信金额' in df.columns else '金额'
-            date_cols = ['出发日期', '出发日期.1', '出发时间', '起飞日期', '起飞日期.1', '起飞时间', '起飞时间.1', '入住日期', '入住时间']
-            date_col = next((col for col in date_cols if col in df.columns), None)
+            date_col = next((col for col in self.SHEET_DATE_COLS[sheet_name] if col in df.columns), None)
             
             self.logger.info(f"   - 原始记录数: {original_count}")
             self.logger.info(f"   - 清洗后记录数: {len(df)}")
             self.logger.info(f"   - 金额列: {amount_col}")
             
+            amounts = df[amount_col] if amount_col in df.columns else pd.Series(0, index=df.index)
+            project_parts = self._get_project_parts(sheet_name, df)
+
             # 统计信息
-            record_count = 0
-            empty_project_count = 0
-            sheet_total_amount = 0
-            
-            for idx, row in df.iterrows():
-                project_str = row.get('项目', '')
-                project_code, project_name = self.extract_project_code(project_str)
-                amount = row.get(amount_col, 0)
-                
-                # 空项目作为单独的项目类别处理
-                if not project_code:
-                    project_code = '空项目'
-                    project_name = '未分配项目'
-                    empty_project_count += 1
-                
-                all_records.append({
-                    'project_code': project_code,
-                    'project_name': project_name,
-                    'amount': amount,
-                    'type': sheet_name,
-                    'person': row.get('姓名', ''),
-                    'date': row.get(date_col, '') if date_col else ''
-                })
-                record_count += 1
-                sheet_total_amount += amount
-                
-                # 输出前3条记录的详细信息
-                if record_count <= 3:
-                    person = row.get('姓名', '未知')
-                    date_val = row.get(date_col, '') if date_col else ''
+            record_count = len(df)
+            empty_project_count = int(project_parts['project_code'].eq('空项目').sum())
+            sheet_total_amount = amounts.sum()
+
+            records = pd.DataFrame({
+                'project_code': project_parts['project_code'],
+                'project_name': project_parts['project_name'],
+                'amount': amounts,
+                'type': sheet_name,
+                'person': df['姓名'] if '姓名' in df.columns else '',
+                'date': df[date_col] if date_col else ''
+            })
+            project_frames.append(records)
+
+            # 输出前3条记录的详细信息（仅在 DEBUG 级别开启时格式化）
+            if self.logger.isEnabledFor(logging.DEBUG):
+                for i, rec in enumerate(records.head(3).itertuples(index=False), start=1):
+                    date_val = rec.date
                     # 安全的日期格式化
                     if pd.notna(date_val) and hasattr(date_val, 'strftime'):
                         date_str = date_val.strftime('%Y-%m-%d')
                     else:
                         date_str = str(date_val) if pd.notna(date_val) else '未知'
-                    self.logger.debug(f"      记录{record_count}: {project_code} | {person} | ¥{amount:,.2f} | {date_str}")
-            
+                    self.logger.debug("      记录%s: %s | %s | ¥%s | %s",
+                                      i, rec.project_code, rec.person, format(rec.amount, ',.2f'), date_str)
+
             sheet_stats[sheet_name] = {
                 'original_total': original_count,
                 'cleaned_total': len(df),
@@ -421,17 +773,21 @@ class ExcelProcessor:
                 'amount': sheet_total_amount
             }
             
-            # 统计金额分布 - 基于所有清洗后记录
-            zero_amount_count = (df[amount_col] == 0).sum() if amount_col in df.columns else 0
-            negative_amount_count = (df[amount_col] < 0).sum() if amount_col in df.columns else 0
-            positive_amount_count = (df[amount_col] > 0).sum() if amount_col in df.columns else 0
+            # 统计金额分布 - 基于所有清洗后记录，按符号一次扫描得到计数与分项合计
+            amount_arr = amounts.to_numpy(dtype=np.float64)
+            signs = np.sign(amount_arr)
+            positive_mask = signs > 0
+            negative_mask = signs < 0
+            zero_amount_count = int((signs == 0).sum())
+            negative_amount_count = int(negative_mask.sum())
+            positive_amount_count = int(positive_mask.sum())
             filtered_count = original_count - len(df)
             
             # 计算正数/负数金额总和（基于所有清洗后记录）
-            negative_amount_sum = df[df[amount_col] < 0][amount_col].sum() if amount_col in df.columns and negative_amount_count > 0 else 0
-            positive_amount_sum = df[df[amount_col] > 0][amount_col].sum() if amount_col in df.columns and positive_amount_count > 0 else 0
+            negative_amount_sum = amount_arr[negative_mask].sum()
+            positive_amount_sum = amount_arr[positive_mask].sum()
             # 所有记录的净总金额（用于日志显示，确保与正数+负数一致）
-            sheet_all_amount = df[amount_col].sum() if amount_col in df.columns else 0
+            sheet_all_amount = sheet_total_amount
             
             self.logger.info(f"   ✅ 处理完成:")
             self.logger.info(f"      - 总记录数: {record_count}")
@@ -470,12 +826,15 @@ class ExcelProcessor:
         self.logger.info(f"   - 💡 说明: 负数金额（退款/调整）已包含在净总金额计算中")
         
         # 按项目代码聚合
-        if all_records:
+        if project_frames:
             self.logger.info(f"\n🔄 开始聚合项目数据...")
-            df_projects = pd.DataFrame(all_records)
+            df_projects = pd.concat(project_frames, ignore_index=True)
+            # 低基数字符串列转为 category，groupby/比较走整数编码
+            for col in ('project_code', 'type', 'person'):
+                df_projects[col] = df_projects[col].astype('category')
             self.logger.debug(f"   - 待聚合记录数: {len(df_projects)}")
-            
-            grouped = df_projects.groupby(['project_code', 'project_name']).agg({
+
+            grouped = df_projects.groupby(['project_code', 'project_name'], sort=False, observed=True).agg({
                 'amount': 'sum',
                 'person': 'count'
             }).reset_index()
@@ -497,54 +856,72 @@ class ExcelProcessor:
 
             # 日志始终只显示前20个项目的详细信息（保持日志可读性）
             log_top_n = min(20, total_count)
+            # 逐项目日志量大，级别被过滤时整体跳过格式化
+            log_project_info = self.logger.isEnabledFor(logging.INFO)
+
+            # 项目 × 差旅类型 成本矩阵只计算一次，Top-N 与"其他"均直接查表
+            cost_matrix = (
+                df_projects.groupby(['project_code', 'type'], sort=False, observed=True)['amount'].sum()
+                .unstack(fill_value=0)
+            )
+            cost_matrix.index = cost_matrix.index.astype(str)
+            cost_matrix.columns = cost_matrix.columns.astype(str)
+            cost_matrix = cost_matrix.reindex(columns=travel_sheets, fill_value=0)
 
-            # 如果项目数量超过 top_n，将超出部分汇总到"其他"
+            # 如果项目数量超过 top_n，将超出部分汇总到"其他"，否则返回全部
+            head_n = min(top_n, total_count)
             if total_count > top_n:
                 self.logger.info(f"   - 展示前{top_n}个项目")
                 self.logger.info(f"   - 其余{total_count - top_n}个项目汇总到\"其他\"")
+            else:
+                self.logger.info(f"   - 项目总数不超过{top_n}，返回全部")
 
-                # 前 top_n 个项目（添加到结果）
-                for idx, row in grouped.head(top_n).iterrows():
-                    project_details = df_projects[
-                        df_projects['project_code'] == row['project_code']
-                    ].to_dict('records')
-
-                    # 计算分类成本
-                    project_df = df_projects[df_projects['project_code'] == row['project_code']]
-                    flight_cost = project_df[project_df['type'] == '机票']['amount'].sum()
-                    hotel_cost = project_df[project_df['type'] == '酒店']['amount'].sum()
-                    train_cost = project_df[project_df['type'] == '火车票']['amount'].sum()
-
-                    # 日志只输出前20个
-                    if idx < log_top_n:
-                        self.logger.info(f"\n   #{idx+1}. {row['project_code']} - {row['project_name']}")
-                        self.logger.info(f"      总成本: ¥{row['amount']:,.2f} | 订单数: {int(row['person'])}")
-                        self.logger.info(f"      ├─ 机票: ¥{flight_cost:,.2f}")
-                        self.logger.info(f"      ├─ 酒店: ¥{hotel_cost:,.2f}")
-                        self.logger.info(f"      └─ 火车票: ¥{train_cost:,.2f}")
-
-                    results.append({
-                        'project_code': row['project_code'],
-                        'project_name': row['project_name'],
-                        'total_cost': float(row['amount']),
-                        'flight_cost': float(flight_cost),
-                        'hotel_cost': float(hotel_cost),
-                        'train_cost': float(train_cost),
-                        'record_count': int(row['person']),
-                        'details': project_details[:10]
-                    })
-                
+            # 只在需要时为 Top-N 项目取前10条明细：先按代码筛行，再按组截取，不为其余项目物化分组
+            details_by_code = {}
+            if include_details:
+                top_rows = df_projects[df_projects['project_code'].isin(grouped['project_code'].head(head_n))]
+                details_by_code = {
+                    code: group.to_dict('records')
+                    for code, group in top_rows.groupby('project_code', sort=False, observed=True).head(10)
+                    .groupby('project_code', observed=True, sort=False)
+                }
+
+            # Top-N 行一次转为 dict 列表，避免 iterrows 逐行构造 Series
+            for idx, row in enumerate(grouped.head(head_n).to_dict('records')):
+                project_details = details_by_code.get(row['project_code'], [])
+
+                # 分类成本
+                flight_cost, hotel_cost, train_cost = cost_matrix.loc[str(row['project_code'])]
+
+                # 日志只输出前20个
+                if idx < log_top_n and log_project_info:
+                    self._log_project_cost(idx, row, flight_cost, hotel_cost, train_cost)
+
+                results.append({
+                    'project_code': row['project_code'],
+                    'project_name': row['project_name'],
+                    'total_cost': float(row['amount']),
+                    'flight_cost': float(flight_cost),
+                    'hotel_cost': float(hotel_cost),
+                    'train_cost': float(train_cost),
+                    'record_count': int(row['person']),
+                    'details': project_details
+                })
+
+            if total_count > top_n:
                 # 汇总"其他"项目
-                others_df = grouped.iloc[top_n:]
+                others_df = grouped.iloc[head_n:]
                 others_total_cost = float(others_df['amount'].sum())
                 others_record_count = int(others_df['person'].sum())
-                others_flight_cost = float(df_projects[df_projects['project_code'].isin(others_df['project_code']) & (df_projects['type'] == '机票')]['amount'].sum())
-                others_hotel_cost = float(df_projects[df_projects['project_code'].isin(others_df['project_code']) & (df_projects['type'] == '酒店')]['amount'].sum())
-                others_train_cost = float(df_projects[df_projects['project_code'].isin(others_df['project_code']) & (df_projects['type'] == '火车票')]['amount'].sum())
+                others_codes = others_df['project_code'].astype(str).unique()
+                others_flight_cost, others_hotel_cost, others_train_cost = (
+                    float(v) for v in cost_matrix.loc[others_codes].sum(axis=0)
+                )
                 
-                self.logger.info(f"\n   #{top_n+1}. 其他")
-                self.logger.info(f"      汇总项目数: {total_count - top_n}")
-                self.logger.info(f"      总成本: ¥{others_total_cost:,.2f} | 订单数: {others_record_count}")
+                if log_project_info:
+                    self.logger.info(f"\n   #{top_n+1}. 其他")
+                    self.logger.info(f"      汇总项目数: {total_count - top_n}")
+                    self.logger.info(f"      总成本: ¥{others_total_cost:,.2f} | 订单数: {others_record_count}")
                 
                 results.append({
                     'project_code': '其他',
@@ -556,52 +933,31 @@ class ExcelProcessor:
                     'record_count': others_record_count,
                     'details': []
                 })
-            else:
-                # 如果不超过 top_n，返回全部
-                self.logger.info(f"   - 项目总数不超过{top_n}，返回全部")
-                
-                for idx, row in grouped.iterrows():
-                    project_details = df_projects[
-                        df_projects['project_code'] == row['project_code']
-                    ].to_dict('records')
-                    
-                    # 计算分类成本
-                    project_df = df_projects[df_projects['project_code'] == row['project_code']]
-                    flight_cost = project_df[project_df['type'] == '机票']['amount'].sum()
-                    hotel_cost = project_df[project_df['type'] == '酒店']['amount'].sum()
-                    train_cost = project_df[project_df['type'] == '火车票']['amount'].sum()
-                    
-                    self.logger.info(f"\n   #{idx+1}. {row['project_code']} - {row['project_name']}")
-                    self.logger.info(f"      总成本: ¥{row['amount']:,.2f} | 订单数: {int(row['person'])}")
-                    self.logger.info(f"      ├─ 机票: ¥{flight_cost:,.2f}")
-                    self.logger.info(f"      ├─ 酒店: ¥{hotel_cost:,.2f}")
-                    self.logger.info(f"      └─ 火车票: ¥{train_cost:,.2f}")
-                    
-                    results.append({
-                        'project_code': row['project_code'],
-                        'project_name': row['project_name'],
-                        'total_cost': float(row['amount']),
-                        'flight_cost': float(flight_cost),
-                        'hotel_cost': float(hotel_cost),
-                        'train_cost': float(train_cost),
-                        'record_count': int(row['person']),
-                        'details': project_details[:10]
-                    })
             
-            # 最终汇总
-            self.logger.info(f"\n" + "=" * 80)
-            self.logger.info(f"✅ 项目成本归集完成")
-            self.logger.info(f"=" * 80)
-            self.logger.info(f"📊 最终统计:")
-            self.logger.info(f"   - 返回项目数: {len(results)}")
-            self.logger.info(f"   - 总成本: ¥{sum(r['total_cost'] for r in results):,.2f}")
-            self.logger.info(f"   - 总订单数: {sum(r['record_count'] for r in results)}")
-            self.logger.info("=" * 80 + "\n")
+            # 最终汇总（INFO 关闭时跳过结果求和与字符串格式化）
+            if log_project_info:
+                self.logger.info(f"\n" + "=" * 80)
+                self.logger.info(f"✅ 项目成本归集完成")
+                self.logger.info(f"=" * 80)
+                self.logger.info(f"📊 最终统计:")
+                self.logger.info(f"   - 返回项目数: {len(results)}")
+                self.logger.info(f"   - 总成本: ¥{sum(r['total_cost'] for r in results):,.2f}")
+                self.logger.info(f"   - 总订单数: {sum(r['record_count'] for r in results)}")
+                self.logger.info("=" * 80 + "\n")
         else:
             self.logger.warning("⚠️  没有找到任何项目记录")
 
         return results, total_count
     
+    def _log_project_cost(self, idx: int, row: Dict[str, Any], flight_cost: float,
+                          hotel_cost: float, train_cost: float) -> None:
+        """输出单个项目的成本明细日志（%-style 参数，格式化延迟到 handler）"""
+        self.logger.info("\n   #%s. %s - %s", idx + 1, row['project_code'], row['project_name'])
+        self.logger.info("      总成本: ¥%s | 订单数: %s", format(row['amount'], ',.2f'), int(row['person']))
+        self.logger.info("      ├─ 机票: ¥%s", format(flight_cost, ',.2f'))
+        self.logger.info("      ├─ 酒店: ¥%s", format(hotel_cost, ',.2f'))
+        self.logger.info("      └─ 火车票: ¥%s", format(train_cost, ',.2f'))
+
     def cross_check_attendance_travel(self) -> List[Dict[str, Any]]:
         """
         交叉验证：考勤数据 vs 差旅数据
@@ -610,6 +966,16 @@ class ExcelProcessor:
         - "上班" + 有差旅消费 = 异常（时间和地点冲突）
         - "公休日上班" + 有差旅消费 = 正常（周末加班出差）
         - "出差" + 有差旅消费 = 正常（出差状态）
+
+        结果按实例缓存，同一文件的多次调用（分析、入库、导出）只做一次关联
+        """
+        if self._anomalies_cache is None:
+            self._anomalies_cache = self._find_attendance_travel_anomalies()
+        return list(self._anomalies_cache)
+
+    def _find_attendance_travel_anomalies(self) -> List[Dict[str, Any]]:
+        """
+        关联考勤与差旅数据，找出"上班"当天存在差旅消费的记录
         """
         anomalies = []
 
@@ -620,33 +986,37 @@ class ExcelProcessor:
         if '日期' not in attendance_df.columns:
             return anomalies
 
-        # 仅保留有日期的数据，提前计算日期字段，避免后续重复转换
-        attendance_df = attendance_df.dropna(subset=['日期']).copy()
-        if attendance_df.empty:
-            return anomalies
-
-        attendance_df['日期'] = attendance_df['日期'].dt.date
-        attendance_df['当日状态判断'] = attendance_df['当日状态判断'].astype(str)
-        if '一级部门' in attendance_df.columns:
-            attendance_df['一级部门'] = attendance_df['一级部门'].fillna('未知部门')
-        else:
-            attendance_df['一级部门'] = '未知部门'
-
         # 只关注考勤状态精确为"上班"的记录（排除"公休日上班"、"出差"等）
         # 真正的异常是：在办公室上班，但同一天有差旅消费
-        work_attendance = attendance_df[
-            attendance_df['当日状态判断'] == '上班'
-        ]
+        # 先按状态（category 编码比较）和日期筛掉绝大多数行，派生列只在剩余的"上班"记录上生成
+        has_dept = '一级部门' in attendance_df.columns
+        columns = ['姓名', '日期', '当日状态判断'] + (['一级部门'] if has_dept else [])
+        work_mask = attendance_df['_is_work'] & attendance_df['日期'].notna()
+        work_attendance = attendance_df.loc[work_mask, columns]
         if work_attendance.empty:
             return anomalies
 
+        work_attendance = work_attendance.assign(
+            日期=work_attendance['日期'].dt.normalize(),
+            当日状态判断=work_attendance['当日状态判断'].astype(str),
+            一级部门=work_attendance['一级部门'].astype(object).fillna('未知部门') if has_dept else '未知部门'
+        )
+
         # 聚合所有差旅数据（姓名 + 消费日期 + 差旅类型），并缓存
         travel_df = self._get_combined_travel_df()
         if travel_df.empty:
             return anomalies
 
+        # 只对与"上班"记录同人同日的差旅行做按组拼接，避免对全部差旅记录逐组构造列表
+        work_keys = pd.MultiIndex.from_frame(work_attendance[['姓名', '日期']].astype({'姓名': object}))
+        travel_keys = pd.MultiIndex.from_frame(travel_df[['姓名', '消费日期']])
+        travel_df = travel_df[travel_keys.isin(work_keys)]
+        if travel_df.empty:
+            self.logger.info("交叉验证完成，发现 0 条异常记录（上班状态有差旅消费）")
+            return anomalies
+
         travel_grouped = (
-            travel_df.groupby(['姓名', '消费日期'])['差旅类型']
+            travel_df.groupby(['姓名', '消费日期'], sort=False)['差旅类型']
             .apply(list)
             .reset_index()
             .rename(columns={'消费日期': '日期'})
@@ -659,20 +1029,23 @@ class ExcelProcessor:
             how='inner'
         )
 
-        for _, row in merged.iterrows():
-            date_val = row.get('日期')
-            date_str = date_val.strftime('%Y-%m-%d') if hasattr(date_val, 'strftime') else str(date_val)
-            travel_list = row.get('差旅类型', []) or []
-            name = row.get('姓名', '')
-            anomalies.append({
-                'name': name,
+        if not merged.empty:
+            # 整列构造结果，避免逐行 iterrows
+            date_str = merged['日期'].dt.strftime('%Y-%m-%d')
+            travel_str = merged['差旅类型'].str.join(',')
+            anomalies = pd.DataFrame({
+                'name': merged['姓名'],
                 'date': date_str,
-                'department': row.get('一级部门', '未知部门'),
+                'department': merged['一级部门'],
                 'anomaly_type': 'A',
-                'attendance_status': row.get('当日状态判断', ''),
-                'travel_records': travel_list,
-                'description': f'{name} 在 {date_str} 考勤显示上班（在办公室），但有 {",".join(travel_list)} 消费记录（出差在外），存在时间和地点冲突'
-            })
+                'attendance_status': merged['当日状态判断'],
+                'travel_records': merged['差旅类型'],
+                'description': (
+                    merged['姓名'].astype(str) + ' 在 ' + date_str
+                    + ' 考勤显示上班（在办公室），但有 ' + travel_str
+                    + ' 消费记录（出差在外），存在时间和地点冲突'
+                ),
+            }).to_dict('records')
 
         self.logger.info(f"交叉验证完成，发现 {len(anomalies)} 条异常记录（上班状态有差旅消费）")
         return anomalies
@@ -704,10 +1077,10 @@ class ExcelProcessor:
         advance_distribution = {str(int(k)): int(v) for k, v in advance_distribution.items()}
         
         # 按提前天数分组的平均成本
-        cost_by_advance = valid_df.groupby('提前预定天数')[amount_col].mean().reset_index()
+        cost_by_advance = valid_df.groupby('提前预定天数', sort=False)[amount_col].mean()
         cost_by_advance_list = [
-            {'advance_days': int(row['提前预定天数']), 'avg_cost': float(row[amount_col])}
-            for _, row in cost_by_advance.iterrows()
+            {'advance_days': int(days), 'avg_cost': float(avg_cost)}
+            for days, avg_cost in zip(cost_by_advance.index.to_numpy(), cost_by_advance.to_numpy())
         ]
         
         return {
@@ -725,6 +1098,17 @@ class ExcelProcessor:
         - 机票：超标类型包含“超折扣”或“超时间”
         - 酒店：按“是否超标”为“是”
         - 火车票：按“是否超标”为“是”
+
+        结果按实例缓存，重复调用直接返回副本
+        """
+        if self._over_standard_cache is None:
+            self._over_standard_cache = self._summarize_over_standard_orders()
+        cached = self._over_standard_cache
+        return {**cached, 'flight_over_types': dict(cached['flight_over_types'])}
+
+    def _summarize_over_standard_orders(self) -> Dict[str, Any]:
+        """
+        逐 Sheet 统计超标订单数与机票超标类型分布
         """
         flight_df = self.clean_travel_data('机票')
         hotel_df = self.clean_travel_data('酒店')
@@ -733,51 +1117,42 @@ class ExcelProcessor:
         def _count_yes(df: pd.DataFrame, column: str) -> int:
             if df.empty or column not in df.columns:
                 return 0
-            return int(df[df[column].astype(str).str.contains('是', na=False)].shape[0])
+            # 直接对布尔掩码求和；字符串类型在安装 pyarrow 时走 Arrow 的子串匹配内核
+            return int(df[column].astype(_STRING_DTYPE).str.contains('是', regex=False, na=False).sum())
 
-        def _extract_over_types(value: str) -> List[str]:
+        def _count_over_types(type_series: pd.Series) -> Counter:
             """
-            提取机票的超标类型标签
+            统计机票的超标类型标签分布
             - 支持以空格、逗号、分号、斜杠等分隔的多标签格式
             - 若字符串中包含已知关键字（超折扣/超时间）但未分隔，也能捕获
             """
-            if not value or pd.isna(value):
-                return []
-
-            raw = str(value)
-            tokens = []
-
-            # 常见分隔符拆分
-            for part in re.split(r'[;,，、/\\s]+', raw):
-                cleaned = part.strip()
-                if cleaned and '超' in cleaned:
-                    tokens.append(cleaned)
-
-            # 兜底：处理未显式分隔但包含关键字的场景
-            for keyword in ['超折扣', '超时间']:
-                if keyword in raw and keyword not in tokens:
-                    tokens.append(keyword)
-
-            return tokens
+            counter: Counter[str] = Counter()
+            # 超标类型取值种类很少：对去重后的取值做一次标量扫描，再按出现次数加权
+            value_counts = type_series[type_series.ne('')].value_counts(sort=False)
+            for raw, count in value_counts.items():
+                tokens = [t for t in raw.translate(_OVER_TYPE_SEPARATORS).split() if '超' in t]
+                # 兜底：处理未显式分隔但包含关键字的场景（同一记录已有该标签则不重复计数）
+                for keyword in ('超折扣', '超时间'):
+                    if keyword in raw and keyword not in tokens:
+                        tokens.append(keyword)
+                for token in tokens:
+                    counter[token] += int(count)
+
+            return counter
 
         flight_over = 0
         flight_over_type_counter: Counter[str] = Counter()
         if not flight_df.empty:
             if '超标类型' in flight_df.columns:
-                # 统计数量
-                flight_over = int(
-                    flight_df[
-                        flight_df['超标类型']
-                        .astype(str)
-                        .str.contains('超折扣|超时间', na=False)
-                    ].shape[0]
-                )
+                over_types = flight_df['超标类型'].astype(str)
+                # 统计数量（两个字面关键字，无需正则）
+                flight_over = int((
+                    over_types.str.contains('超折扣', regex=False, na=False)
+                    | over_types.str.contains('超时间', regex=False, na=False)
+                ).sum())
 
                 # 统计类型分布
-                type_series = flight_df['超标类型'].dropna().astype(str)
-                for raw_type in type_series:
-                    for token in _extract_over_types(raw_type):
-                        flight_over_type_counter[token] += 1
+                flight_over_type_counter = _count_over_types(flight_df['超标类型'].dropna().astype(str))
 
                 # 如果有类型分布但未匹配到数量，用分布求和兜底
                 if flight_over == 0 and flight_over_type_counter:
@@ -833,51 +1208,33 @@ class ExcelProcessor:
         dept_attendance_stats = {}
         
         if not attendance_df.empty and '一级部门' in attendance_df.columns:
-            # 计算每个部门的平均工时和人数
-            for dept in attendance_df['一级部门'].unique():
-                if pd.isna(dept):
-                    continue
-                dept_data = attendance_df[attendance_df['一级部门'] == dept]
-                avg_hours = 0
-                holiday_avg_hours = 0
-                if '工时' in dept_data.columns and '当日状态判断' in dept_data.columns:
-                    # 工作日平均工时计算
-                    workday_data = dept_data[dept_data['当日状态判断'] == '上班']
-                    self.logger.info(f"  [{dept}] 工作日('上班')记录数: {len(workday_data)}")
-                    valid_hours = workday_data[workday_data['工时'] != 0]['工时'].dropna()
-                    self.logger.info(f"  [{dept}] 工作日有效工时记录(工时!=0且非NaN): {len(valid_hours)}")
-                    if not valid_hours.empty:
-                        avg_hours = float(valid_hours.mean())
-                        self.logger.info(f"  [{dept}] 工作日平均工时: {avg_hours:.2f}小时")
-                    if pd.isna(avg_hours):
-                        avg_hours = 0
-                        self.logger.info(f"  [{dept}] 工作日平均工时为NaN，设为0")
-
-                    # 节假日平均工时计算（公休日上班）
-                    holiday_data = dept_data[dept_data['当日状态判断'] == '公休日上班']
-                    self.logger.info(f"  [{dept}] 节假日('公休日上班')记录数: {len(holiday_data)}")
-                    if len(holiday_data) > 0:
-                        self.logger.info(f"  [{dept}] 节假日工时字段前5个值: {holiday_data['工时'].head(5).tolist()}")
-                        self.logger.info(f"  [{dept}] 节假日工时=0的记录数: {(holiday_data['工时'] == 0).sum()}")
-                        self.logger.info(f"  [{dept}] 节假日工时为NaN的记录数: {holiday_data['工时'].isna().sum()}")
-                    holiday_valid_hours = holiday_data[holiday_data['工时'] != 0]['工时'].dropna()
-                    self.logger.info(f"  [{dept}] 节假日有效工时记录(工时!=0且非NaN): {len(holiday_valid_hours)}")
-                    if not holiday_valid_hours.empty:
-                        holiday_avg_hours = float(holiday_valid_hours.mean())
-                        self.logger.info(f"  [{dept}] 节假日平均工时: {holiday_avg_hours:.2f}小时 (基于{len(holiday_valid_hours)}条记录)")
-                        self.logger.info(f"  [{dept}] 节假日工时样本: {holiday_valid_hours.head(5).tolist()}")
-                    else:
-                        holiday_avg_hours = 0
-                        self.logger.warning(f"  [{dept}] ⚠️  节假日平均工时为0 - 没有有效工时记录")
-                    if pd.isna(holiday_avg_hours):
-                        holiday_avg_hours = 0
-                        self.logger.warning(f"  [{dept}] ⚠️  节假日平均工时为NaN，设为0")
-                person_count = dept_data['姓名'].nunique() if '姓名' in dept_data.columns else 0
-                dept_attendance_stats[dept] = {
-                    'avg_hours': float(avg_hours),
-                    'holiday_avg_hours': float(holiday_avg_hours),
-                    'person_count': int(person_count)
-                }
+            # 计算每个部门的平均工时和人数：整表按部门分组一次，避免逐部门布尔筛选
+            dept_df = attendance_df[attendance_df['一级部门'].notna()]
+
+            if '姓名' in dept_df.columns:
+                person_counts = dept_df.groupby('一级部门', sort=False, observed=True)['姓名'].nunique()
+            else:
+                person_counts = pd.Series(dtype='int64')
+
+            workday_avg = pd.Series(dtype='float64')
+            holiday_avg = pd.Series(dtype='float64')
+            if '工时' in dept_df.columns and '当日状态判断' in dept_df.columns:
+                # 有效工时：工时!=0 且非 NaN
+                valid_hours = dept_df[dept_df['_has_hours']]
+                # 工作日（"上班"）与节假日（"公休日上班"）平均工时
+                workday_avg = valid_hours[valid_hours['_is_work']].groupby('一级部门', sort=False, observed=True)['工时'].mean()
+                holiday_avg = valid_hours[valid_hours['_is_weekend_work']].groupby('一级部门', sort=False, observed=True)['工时'].mean()
+
+            # 三个分组结果按部门对齐成一张表，缺失记 0，一次转成 {部门: 统计} 字典
+            departments = pd.Index(dept_df['一级部门'].unique())
+            stats_df = pd.DataFrame({
+                'avg_hours': workday_avg.reindex(departments),
+                'holiday_avg_hours': holiday_avg.reindex(departments),
+                'person_count': person_counts.reindex(departments),
+            }, index=departments).fillna(0).astype({'person_count': 'int64'})
+            dept_attendance_stats = stats_df.to_dict('index')
+            for dept, stats in dept_attendance_stats.items():
+                self.logger.debug(f"  [{dept}] 工作日平均工时: {stats['avg_hours']:.2f}小时, 节假日平均工时: {stats['holiday_avg_hours']:.2f}小时")
         
         # 始终从明细表计算部门成本（不使用"差旅汇总" sheet）
         travel_data = {
@@ -886,7 +1243,7 @@ class ExcelProcessor:
             '火车票': 'train_cost'
         }
         
-        dept_costs = {}
+        cost_columns = []
         
         for sheet_name, cost_key in travel_data.items():
             df = self.clean_travel_data(sheet_name)
@@ -894,46 +1251,50 @@ class ExcelProcessor:
                 continue
             
             # 尝试关联部门信息（优先使用差旅表中的部门，如果没有则从考勤表获取）
-            df = df.copy()
             if '一级部门' in df.columns:
                 # 差旅表已有部门信息，优先使用
                 pass
-            elif not attendance_df.empty and '姓名' in attendance_df.columns and '一级部门' in attendance_df.columns:
-                # 从考勤表获取部门信息
-                name_dept = attendance_df[['姓名', '一级部门']].drop_duplicates()
-                df = df.merge(name_dept, on='姓名', how='left')
+            elif '姓名' in df.columns:
+                # 从考勤表获取部门信息：复用缓存的 姓名→部门 映射做哈希查找，无需逐表去重合并
+                person_dept_map = self._get_person_dept_map()
+                if person_dept_map:
+                    df = df.assign(一级部门=df['姓名'].map(person_dept_map))
 
             if '一级部门' not in df.columns:
                 continue
 
             amount_col = '授信金额' if '授信金额' in df.columns else '金额'
+            amounts = df[amount_col] if amount_col in df.columns else pd.Series(0, index=df.index)
+
+            # 部门为空/空白的记录归入"未知部门"，按部门整列求和（保持首次出现顺序）
+            dept_series = df['一级部门']
+            dept_clean = dept_series.astype(str).str.strip()
+            dept_keys = dept_clean.where(dept_series.notna() & dept_clean.ne(''), '未知部门')
+            cost_columns.append(amounts.groupby(dept_keys, sort=False).sum().rename(cost_key))
+
+        if not cost_columns:
+            return []
+
+        # 各差旅类型的部门合计按列拼接（部门保持首次出现顺序），缺失类型记 0
+        cost_df = pd.concat(cost_columns, axis=1, sort=False)
+        cost_df = cost_df.reindex(columns=list(travel_data.values())).fillna(0)
+        cost_df['total_cost'] = cost_df.sum(axis=1)
+
+        empty_stats = {'avg_hours': 0, 'holiday_avg_hours': 0, 'person_count': 0}
+        results = []
+        for dept, row in zip(cost_df.index, cost_df.to_dict('records')):
+            stats = dept_attendance_stats.get(dept, empty_stats)
+            results.append({
+                'department': dept,
+                'total_cost': row['total_cost'],
+                'flight_cost': row['flight_cost'],
+                'hotel_cost': row['hotel_cost'],
+                'train_cost': row['train_cost'],
+                'avg_hours': stats['avg_hours'],
+                'holiday_avg_hours': stats['holiday_avg_hours'],
+                'person_count': stats['person_count']
+            })
 
-            for _, row in df.iterrows():
-                dept = row.get('一级部门')
-                # 处理部门为空的情况
-                if pd.isna(dept) or (isinstance(dept, str) and dept.strip() == ''):
-                    dept = '未知部门'
-                else:
-                    dept = str(dept).strip()
-                
-                if dept not in dept_costs:
-                    stats = dept_attendance_stats.get(dept, {'avg_hours': 0, 'holiday_avg_hours': 0, 'person_count': 0})
-                    dept_costs[dept] = {
-                        'department': dept,
-                        'total_cost': 0,
-                        'flight_cost': 0,
-                        'hotel_cost': 0,
-                        'train_cost': 0,
-                        'avg_hours': stats['avg_hours'],
-                        'holiday_avg_hours': stats['holiday_avg_hours'],
-                        'person_count': stats['person_count']
-                    }
-                
-                amount = row.get(amount_col, 0) or 0
-                dept_costs[dept][cost_key] += amount
-                dept_costs[dept]['total_cost'] += amount
-        
-        results = list(dept_costs.values())
         results = sorted(results, key=lambda x: x['total_cost'], reverse=True)
         
         # 应用 top_n 限制并添加"其他"
@@ -957,28 +1318,33 @@ class ExcelProcessor:
         # 前 top_n 条
         top_results = results[:top_n]
         
-        # 剩余的汇总到"其他"
-        others = results[top_n:]
+        # 剩余的汇总到"其他"：转为 DataFrame 后按列一次求和
+        others = pd.DataFrame(results[top_n:])
         total_count = len(results)
+
+        # 需要汇总的数值列一次性对齐（缺失列补 0）后做单次列向求和
+        sum_columns = ['total_cost', 'flight_cost', 'hotel_cost', 'train_cost', 'person_count', 'record_count']
+        column_sums = others.reindex(columns=sum_columns, fill_value=0).fillna(0).sum()
         
         others_summary = {
             name_key: '其他',
-            'total_cost': sum(item.get('total_cost', 0) for item in others),
-            'flight_cost': sum(item.get('flight_cost', 0) for item in others),
-            'hotel_cost': sum(item.get('hotel_cost', 0) for item in others),
-            'train_cost': sum(item.get('train_cost', 0) for item in others),
+            'total_cost': column_sums['total_cost'],
+            'flight_cost': column_sums['flight_cost'],
+            'hotel_cost': column_sums['hotel_cost'],
+            'train_cost': column_sums['train_cost'],
         }
         
         # 如果是部门数据，计算平均工时和总人数
         if name_key == 'department':
-            avg_hours_list = [item.get('avg_hours', 0) for item in others if item.get('avg_hours', 0) > 0]
-            others_summary['avg_hours'] = sum(avg_hours_list) / len(avg_hours_list) if avg_hours_list else 0
-            others_summary['person_count'] = sum(item.get('person_count', 0) for item in others)
+            avg_hours = others['avg_hours'] if 'avg_hours' in others.columns else pd.Series(dtype=float)
+            positive_hours = avg_hours[avg_hours > 0]
+            others_summary['avg_hours'] = float(positive_hours.mean()) if not positive_hours.empty else 0
+            others_summary['person_count'] = int(column_sums['person_count'])
         
         # 如果是项目数据
         if name_key == 'project_code':
             others_summary['project_name'] = f'其他项目（{total_count - top_n}个）'
-            others_summary['record_count'] = sum(item.get('record_count', 0) for item in others)
+            others_summary['record_count'] = int(column_sums['record_count'])
             others_summary['details'] = []
         
         top_results.append(others_summary)
@@ -996,30 +1362,28 @@ class ExcelProcessor:
         total_records = len(df)
         total_persons = df['姓名'].nunique() if '姓名' in df.columns else 0
 
-        status_distribution = {}
-        if '当日状态判断' in df.columns:
-            status_distribution = df['当日状态判断'].value_counts().to_dict()
+        status_distribution = self._status_distribution(df)
 
-        # 计算工作日平均工时
+        # 工时有效掩码只算一次（工时!=0 且非 NaN），工作日/节假日平均工时在同一数组上归约
         avg_work_hours = 0
-        if '工时' in df.columns and '当日状态判断' in df.columns:
-            workday_data = df[df['当日状态判断'] == '上班']
-            valid_hours = workday_data[workday_data['工时'] != 0]['工时'].dropna()
-            if not valid_hours.empty:
-                avg_work_hours = float(valid_hours.mean())
-                self.logger.info(f"全公司工作日平均工时: {avg_work_hours:.2f}小时 (基于{len(valid_hours)}条记录)")
-
-        # 计算节假日平均工时
         holiday_avg_work_hours = 0
         if '工时' in df.columns and '当日状态判断' in df.columns:
-            # 筛选节假日/公休日/公休日上班的记录
+            hours = df['工时'].to_numpy(dtype=np.float64, na_value=np.nan)
+            valid_mask = df['_has_hours'].to_numpy()
+            status = df['当日状态判断']
+
+            # 计算工作日平均工时
+            workday_mask = valid_mask & df['_is_work'].to_numpy()
+            if workday_mask.any():
+                avg_work_hours = float(hours[workday_mask].mean())
+                self.logger.info(f"全公司工作日平均工时: {avg_work_hours:.2f}小时 (基于{int(workday_mask.sum())}条记录)")
+
+            # 计算节假日平均工时（节假日/公休日/公休日上班）
             holiday_statuses = ['公休日', '公休日上班', '节假日']
-            holiday_df = df[df['当日状态判断'].isin(holiday_statuses)]
-            # 过滤掉工时为0的记录
-            holiday_valid_hours = holiday_df[holiday_df['工时'] != 0]['工时'].dropna()
-            if not holiday_valid_hours.empty:
-                holiday_avg_work_hours = float(holiday_valid_hours.mean())
-                self.logger.info(f"全公司节假日平均工时: {holiday_avg_work_hours:.2f}小时 (基于{len(holiday_valid_hours)}条记录)")
+            holiday_mask = valid_mask & status.isin(holiday_statuses).to_numpy(dtype=bool)
+            if holiday_mask.any():
+                holiday_avg_work_hours = float(hours[holiday_mask].mean())
+                self.logger.info(f"全公司节假日平均工时: {holiday_avg_work_hours:.2f}小时 (基于{int(holiday_mask.sum())}条记录)")
 
         return {
             'total_records': total_records,
@@ -1029,75 +1393,142 @@ class ExcelProcessor:
             'holiday_avg_work_hours': round(holiday_avg_work_hours, 2)
         }
     
-    def write_analysis_results(self, results: Dict[str, Any], output_path: Optional[str] = None) -> str:
+    def write_analysis_results(self, results: Dict[str, Any], output_path: Optional[str] = None,
+                               include_source: bool = True) -> str:
         """
         将分析结果回写到 Excel（新增 Sheet）
         使用 openpyxl 保留原格式
+
+        Args:
+            results: 分析结果
+            output_path: 输出路径，默认在原文件名后追加 _analyzed
+            include_source: 是否保留原工作簿的全部 Sheet；为 False 时只输出“分析结果”，
+                不再解析原工作簿
         """
         if output_path is None:
             base_name = os.path.splitext(self.file_path)[0]
             output_path = f"{base_name}_analyzed.xlsx"
         
-        if self.workbook is None:
-            self.workbook = load_workbook(self.file_path)
-        
-        # 创建分析结果 Sheet
         sheet_name = "分析结果"
-        if sheet_name in self.workbook.sheetnames:
-            del self.workbook[sheet_name]
-        
-        ws = self.workbook.create_sheet(sheet_name)
+        if include_source:
+            # 工作簿 DOM 仅在回写时加载（分析阶段不常驻内存），保存后立即释放
+            if self.workbook is None:
+                self.workbook = load_workbook(self.file_path, keep_links=False)
+            
+            # 创建分析结果 Sheet
+            if sheet_name in self.workbook.sheetnames:
+                del self.workbook[sheet_name]
+            ws = self.workbook.create_sheet(sheet_name)
+        else:
+            # 只需分析结果时直接新建工作簿，跳过对原文件的完整 XML 解析
+            self.workbook = Workbook()
+            ws = self.workbook.active
+            ws.title = sheet_name
         
         # 写入标题
         ws.append(["CostMatrix 数据分析报告"])
         ws.append([f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
         ws.append([])
         
+        # 各区块的行由 itemgetter 一次取出所需字段（C 层实现），直接以元组追加
         # 写入项目成本
         if 'project_costs' in results and results['project_costs']:
             ws.append(["项目成本归集"])
             ws.append(["项目代码", "项目名称", "总成本", "记录数"])
+            project_row = itemgetter('project_code', 'project_name', 'total_cost', 'record_count')
             for item in results['project_costs']:
-                ws.append([
-                    item['project_code'],
-                    item['project_name'],
-                    item['total_cost'],
-                    item['record_count']
-                ])
+                ws.append(project_row(item))
             ws.append([])
         
         # 写入部门成本
         if 'department_costs' in results and results['department_costs']:
             ws.append(["部门成本汇总"])
             ws.append(["部门", "总成本", "机票", "酒店", "火车票"])
+            department_row = itemgetter('department', 'total_cost', 'flight_cost', 'hotel_cost', 'train_cost')
             for item in results['department_costs']:
-                ws.append([
-                    item['department'],
-                    item['total_cost'],
-                    item['flight_cost'],
-                    item['hotel_cost'],
-                    item['train_cost']
-                ])
+                ws.append(department_row(item))
             ws.append([])
         
         # 写入异常记录
         if 'anomalies' in results and results['anomalies']:
             ws.append(["交叉验证异常"])
             ws.append(["姓名", "日期", "异常类型", "考勤状态", "说明"])
+            anomaly_row = itemgetter('name', 'date', 'anomaly_type', 'attendance_status', 'description')
             for item in results['anomalies']:
-                ws.append([
-                    item['name'],
-                    item['date'],
-                    item['anomaly_type'],
-                    item['attendance_status'],
-                    item['description']
-                ])
+                ws.append(anomaly_row(item))
         
         # 保存文件
         self.workbook.save(output_path)
+        self.workbook.close()
+        self.workbook = None
 
         return output_path
 
+    def _build_travel_detail_frame(self, df: pd.DataFrame, sheet_name: str,
+                                   person_dept_map: Dict[str, Any],
+                                   project_parts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        将差旅明细整列转换为项目明细记录（项目/人员/部门/日期/超标/提前预订天数），
+        供项目详情与项目订单查询共用
+        """
+        if project_parts is None:
+            project_parts = self._split_project_column(df['项目'])
+
+        amount_col = '授信金额' if '授信金额' in df.columns else '金额'
+        date_col = next((col for col in self.SHEET_DATE_COLS[sheet_name] if col in df.columns), None)
+
+        amounts = df[amount_col] if amount_col in df.columns else pd.Series(0, index=df.index)
+        person = df['姓名'] if '姓名' in df.columns else pd.Series('', index=df.index)
+
+        # 优先使用差旅表中的部门信息，为空时从考勤表中查找
+        department = person.map(person_dept_map).fillna('未知部门')
+        if '一级部门' in df.columns:
+            dept_series = df['一级部门']
+            dept_clean = dept_series.astype(str).str.strip()
+            department = dept_clean.where(dept_series.notna() & dept_clean.ne(''), department)
+
+        # 处理日期
+        if date_col is None:
+            date_str = pd.Series('', index=df.index)
+        elif pd.api.types.is_datetime64_any_dtype(df[date_col]):
+            date_str = df[date_col].dt.strftime('%Y-%m-%d').fillna('')
+        else:
+            date_str = df[date_col].map(
+                lambda v: '' if pd.isna(v) else (v.strftime('%Y-%m-%d') if hasattr(v, 'strftime') else str(v))
+            )
+
+        # 检查是否超标（需要正确判断字符串"是"或"否"）
+        if '是否超标' in df.columns:
+            is_over_standard = df['是否超标'].fillna('').astype(str).str.strip().eq('是')
+        else:
+            is_over_standard = pd.Series(False, index=df.index)
+        if '超标类型' in df.columns:
+            over_type = df['超标类型'].where(is_over_standard, '')
+        else:
+            over_type = pd.Series('', index=df.index)
+
+        # 计算提前预订天数
+        if '预订日期' in df.columns and '出发日期' in df.columns:
+            book_date = pd.to_datetime(df['预订日期'], errors='coerce')
+            dep_date = pd.to_datetime(df['出发日期'], errors='coerce')
+            days = (dep_date - book_date).dt.days.astype('Int64')
+            advance_days = days.astype(object).where(days.notna(), None)
+        else:
+            advance_days = pd.Series([None] * len(df), index=df.index, dtype=object)
+
+        return pd.DataFrame({
+            'project_code': project_parts['project_code'],
+            'project_name': project_parts['project_name'],
+            'person': person,
+            'department': department,
+            'type': sheet_name,
+            'amount': amounts,
+            'date': date_str,
+            'is_over_standard': is_over_standard.astype(bool),
+            'over_type': over_type,
+            'advance_days': advance_days
+        }, index=df.index)
+
     def get_all_project_details(self) -> List[Dict[str, Any]]:
         """
         获取所有项目的详细信息（包括人员、日期范围、超标等）
@@ -1109,164 +1540,75 @@ class ExcelProcessor:
         self.logger.info("开始获取所有项目详细信息")
         self.logger.info("=" * 80)
 
-        results = []
         travel_sheets = ['机票', '酒店', '火车票']
-        all_records = []
+        record_frames: List[pd.DataFrame] = []
 
-        # 收集所有差旅记录
+        # 获取考勤数据用于部门信息（作为备用）
+        person_dept_map = self._get_person_dept_map()
+
+        # 收集所有差旅记录（整列构造，不逐行生成 dict）
         for sheet_name in travel_sheets:
             df = self.clean_travel_data(sheet_name)
             if df.empty or '项目' not in df.columns:
                 continue
+            record_frames.append(self._build_travel_detail_frame(
+                df, sheet_name, person_dept_map, self._get_project_parts(sheet_name, df)
+            ))
 
-            amount_col = '授信金额' if '授信金额' in df.columns else '金额'
-            date_cols = ['出发日期', '出发日期.1', '出发时间', '起飞日期', '起飞日期.1', '起飞时间', '起飞时间.1', '入住日期', '入住时间']
-            date_col = next((col for col in date_cols if col in df.columns), None)
-
-            # 获取考勤数据用于部门信息（作为备用）
-            attendance_df = self.clean_attendance_data()
-            person_dept_map = {}
-            if not attendance_df.empty and '姓名' in attendance_df.columns and '一级部门' in attendance_df.columns:
-                person_dept_map = attendance_df[['姓名', '一级部门']].drop_duplicates().set_index('姓名')['一级部门'].to_dict()
-
-            for idx, row in df.iterrows():
-                project_str = row.get('项目', '')
-                project_code, project_name = self.extract_project_code(project_str)
-                amount = row.get(amount_col, 0)
-                person = row.get('姓名', '')
-                date_val = row.get(date_col, '')
-
-                # 优先使用差旅表中的部门信息，如果没有则从考勤表中查找
-                department = None
-                if '一级部门' in df.columns:
-                    department = row.get('一级部门')
-                    # 处理空值或NaN
-                    if pd.isna(department) or (isinstance(department, str) and department.strip() == ''):
-                        department = None
-                if not department:
-                    department = person_dept_map.get(person, '未知部门')
-                else:
-                    department = str(department).strip()
-
-                # 处理日期
-                if pd.notna(date_val):
-                    if hasattr(date_val, 'strftime'):
-                        date_str = date_val.strftime('%Y-%m-%d')
-                    else:
-                        date_str = str(date_val)
-                else:
-                    date_str = ''
-
-                # 检查是否超标（需要正确判断字符串"是"或"否"）
-                is_over_standard = False
-                over_type = ''
-                over_standard_val = row.get('是否超标', '')
-                if pd.notna(over_standard_val):
-                    is_over_standard = str(over_standard_val).strip() == '是'
-                    if is_over_standard and '超标类型' in df.columns:
-                        over_type = row.get('超标类型', '')
-
-                # 计算提前预订天数
-                advance_days = None
-                if '预订日期' in df.columns and '出发日期' in df.columns:
-                    book_date = row.get('预订日期')
-                    dep_date = row.get('出发日期')
-                    if pd.notna(book_date) and pd.notna(dep_date):
-                        try:
-                            if hasattr(book_date, 'to_pydatetime'):
-                                book_date = book_date.to_pydatetime()
-                            if hasattr(dep_date, 'to_pydatetime'):
-                                dep_date = dep_date.to_pydatetime()
-                            advance_days = (dep_date - book_date).days
-                        except:
-                            pass
-
-                # 空项目处理
-                if not project_code:
-                    project_code = '空项目'
-                    project_name = '未分配项目'
-
-                all_records.append({
-                    'project_code': project_code,
-                    'project_name': project_name,
-                    'person': person,
-                    'department': department,
-                    'type': sheet_name,
-                    'amount': amount,
-                    'date': date_str,
-                    'is_over_standard': bool(is_over_standard),
-                    'over_type': over_type,
-                    'advance_days': advance_days
-                })
-
-        if not all_records:
+        if not record_frames:
             self.logger.warning("没有找到任何差旅记录")
             return []
 
-        # 转换为 DataFrame
-        df_all = pd.DataFrame(all_records)
+        df_all = pd.concat(record_frames, ignore_index=True)
 
-        # 按项目分组统计
-        grouped = df_all.groupby(['project_code', 'project_name']).agg({
-            'amount': 'sum',
-            'person': lambda x: list(set(x)),  # 去重的人员列表
-            'department': lambda x: list(set(x)),  # 去重的部门列表
-            'date': ['min', 'max'],  # 最早和最晚日期
-            'type': 'count',  # 总订单数
-            'is_over_standard': 'sum'  # 超标订单数
-        }).reset_index()
-
-        # 展平列名
-        grouped.columns = ['project_code', 'project_name', 'total_cost', 'person_list',
-                          'department_list', 'date_start', 'date_end', 'record_count', 'over_standard_count']
-
-        # 计算各类型成本和订单数
-        for sheet_name in travel_sheets:
-            type_df = df_all[df_all['type'] == sheet_name]
-            type_grouped = type_df.groupby(['project_code', 'project_name']).agg({
-                'amount': 'sum',
-                'type': 'count'
-            }).reset_index()
-            type_grouped.columns = ['project_code', 'project_name', f'{sheet_name}_cost', f'{sheet_name}_count']
-            grouped = grouped.merge(type_grouped, on=['project_code', 'project_name'], how='left')
 
-        # 填充空值
+        # 各类型成本/订单数先展开为指标列，一次 groupby 完成全部聚合，无需逐类型再 merge
+        type_aggs = {}
         for sheet_name in travel_sheets:
-            grouped[f'{sheet_name}_cost'] = grouped[f'{sheet_name}_cost'].fillna(0)
-            grouped[f'{sheet_name}_count'] = grouped[f'{sheet_name}_count'].fillna(0)
+            is_type = df_all['type'].eq(sheet_name)
+            df_all[f'{sheet_name}_cost'] = df_all['amount'].where(is_type, 0.0)
+            df_all[f'{sheet_name}_count'] = is_type.astype(np.int32)
+            type_aggs[f'{sheet_name}_cost'] = (f'{sheet_name}_cost', 'sum')
+            type_aggs[f'{sheet_name}_count'] = (f'{sheet_name}_count', 'sum')
+
+        # 按项目分组统计
+        grouped = df_all.groupby(['project_code', 'project_name'], sort=False).agg(
+            total_cost=('amount', 'sum'),
+            person_list=('person', 'unique'),  # 去重的人员列表
+            department_list=('department', 'unique'),  # 去重的部门列表
+            date_start=('date', 'min'),  # 最早日期
+            date_end=('date', 'max'),  # 最晚日期
+            record_count=('type', 'count'),  # 总订单数
+            over_standard_count=('is_over_standard', 'sum'),  # 超标订单数
+            **type_aggs
+        ).reset_index()
+        # unique 返回数组，统一转为 list 供 JSON 序列化
+        grouped['person_list'] = grouped['person_list'].map(list)
+        grouped['department_list'] = grouped['department_list'].map(list)
 
         # 按成本降序排序
         grouped = grouped.sort_values('total_cost', ascending=False).reset_index(drop=True)
 
-        # 构建结果
-        for _, row in grouped.iterrows():
-            person_list = row['person_list'] if isinstance(row['person_list'], list) else []
-            department_list = row['department_list'] if isinstance(row['department_list'], list) else []
-
-            # 格式化日期
-            date_start = row['date_start'] if pd.notna(row['date_start']) else ''
-            date_end = row['date_end'] if pd.notna(row['date_end']) else ''
-
-            results.append({
-                'code': row['project_code'],
-                'name': row['project_name'],
-                'total_cost': float(row['total_cost']),
-                'flight_cost': float(row.get('机票_cost', 0)),
-                'hotel_cost': float(row.get('酒店_cost', 0)),
-                'train_cost': float(row.get('火车票_cost', 0)),
-                'record_count': int(row['record_count']),
-                'flight_count': int(row.get('机票_count', 0)),
-                'hotel_count': int(row.get('酒店_count', 0)),
-                'train_count': int(row.get('火车票_count', 0)),
-                'person_count': len(person_list),
-                'person_list': person_list,
-                'department_list': department_list,
-                'date_range': {
-                    'start': str(date_start),
-                    'end': str(date_end)
-                },
-                'over_standard_count': int(row['over_standard_count'])
-            })
+        # 构建结果：整列转换为最终字段后一次性 to_dict，无逐行 iterrows
+        date_start = grouped['date_start'].fillna('').astype(str)
+        date_end = grouped['date_end'].fillna('').astype(str)
+        results = pd.DataFrame({
+            'code': grouped['project_code'],
+            'name': grouped['project_name'],
+            'total_cost': grouped['total_cost'].astype(float),
+            'flight_cost': grouped['机票_cost'].astype(float),
+            'hotel_cost': grouped['酒店_cost'].astype(float),
+            'train_cost': grouped['火车票_cost'].astype(float),
+            'record_count': grouped['record_count'].astype(int),
+            'flight_count': grouped['机票_count'].astype(int),
+            'hotel_count': grouped['酒店_count'].astype(int),
+            'train_count': grouped['火车票_count'].astype(int),
+            'person_count': grouped['person_list'].map(len),
+            'person_list': grouped['person_list'],
+            'department_list': grouped['department_list'],
+            'date_range': [{'start': start, 'end': end} for start, end in zip(date_start, date_end)],
+            'over_standard_count': grouped['over_standard_count'].astype(int)
+        }).to_dict('records')
 
         self.logger.info(f"✅ 共获取 {len(results)} 个项目的详细信息")
         self.logger.info("=" * 80 + "\n")
@@ -1284,101 +1626,30 @@ class ExcelProcessor:
             该项目的所有订单记录列表
         """
         travel_sheets = ['机票', '酒店', '火车票']
+        type_mapping = {'机票': 'flight', '酒店': 'hotel', '火车票': 'train'}
         records = []
 
         # 获取考勤数据用于部门信息
-        attendance_df = self.clean_attendance_data()
-        person_dept_map = {}
-        if not attendance_df.empty and '姓名' in attendance_df.columns and '一级部门' in attendance_df.columns:
-            person_dept_map = attendance_df[['姓名', '一级部门']].drop_duplicates().set_index('姓名')['一级部门'].to_dict()
+        person_dept_map = self._get_person_dept_map()
 
         for sheet_name in travel_sheets:
             df = self.clean_travel_data(sheet_name)
             if df.empty or '项目' not in df.columns:
                 continue
 
-            amount_col = '授信金额' if '授信金额' in df.columns else '金额'
-            date_cols = ['出发日期', '出发日期.1', '出发时间', '起飞日期', '起飞日期.1', '起飞时间', '起飞时间.1', '入住日期', '入住时间']
-            date_col = next((col for col in date_cols if col in df.columns), None)
+            # 先按项目代码筛选，只对命中的记录构造明细字段
+            project_parts = self._get_project_parts(sheet_name, df)
+            mask = project_parts['project_code'].eq(project_code).to_numpy(dtype=bool)
+            if not mask.any():
+                continue
 
-            for idx, row in df.iterrows():
-                project_str = row.get('项目', '')
-                extracted_code, extracted_name = self.extract_project_code(project_str)
-
-                # 空项目处理
-                if not extracted_code:
-                    extracted_code = '空项目'
-                    extracted_name = '未分配项目'
-
-                # 匹配项目代码
-                if extracted_code != project_code:
-                    continue
-
-                amount = row.get(amount_col, 0)
-                person = row.get('姓名', '')
-                date_val = row.get(date_col, '')
-
-                # 优先使用差旅表中的部门信息，如果没有则从考勤表中查找
-                department = None
-                if '一级部门' in df.columns:
-                    department = row.get('一级部门')
-                    # 处理空值或NaN
-                    if pd.isna(department) or (isinstance(department, str) and department.strip() == ''):
-                        department = None
-                if not department:
-                    department = person_dept_map.get(person, '未知部门')
-                else:
-                    department = str(department).strip()
-
-                # 处理日期
-                if pd.notna(date_val):
-                    if hasattr(date_val, 'strftime'):
-                        date_str = date_val.strftime('%Y-%m-%d')
-                    else:
-                        date_str = str(date_val)
-                else:
-                    date_str = ''
-
-                # 检查是否超标（需要正确判断字符串"是"或"否"）
-                is_over_standard = False
-                over_type = ''
-                over_standard_val = row.get('是否超标', '')
-                if pd.notna(over_standard_val):
-                    is_over_standard = str(over_standard_val).strip() == '是'
-                    if is_over_standard and '超标类型' in df.columns:
-                        over_type = row.get('超标类型', '')
-
-                # 计算提前预订天数
-                advance_days = None
-                if '预订日期' in df.columns and '出发日期' in df.columns:
-                    book_date = row.get('预订日期')
-                    dep_date = row.get('出发日期')
-                    if pd.notna(book_date) and pd.notna(dep_date):
-                        try:
-                            if hasattr(book_date, 'to_pydatetime'):
-                                book_date = book_date.to_pydatetime()
-                            if hasattr(dep_date, 'to_pydatetime'):
-                                dep_date = dep_date.to_pydatetime()
-                            advance_days = (dep_date - book_date).days
-                        except:
-                            pass
-
-                # 转换类型名称
-                type_mapping = {'机票': 'flight', '酒店': 'hotel', '火车票': 'train'}
-
-                records.append({
-                    'id': f"{sheet_name}_{idx}",
-                    'project_code': extracted_code,
-                    'project_name': extracted_name,
-                    'person': person,
-                    'department': department,
-                    'type': type_mapping.get(sheet_name, 'other'),
-                    'amount': float(amount),
-                    'date': date_str,
-                    'is_over_standard': bool(is_over_standard),
-                    'over_type': over_type,
-                    'advance_days': advance_days
-                })
+            detail = self._build_travel_detail_frame(
+                df.loc[mask], sheet_name, person_dept_map, project_parts.loc[mask]
+            )
+            detail.insert(0, 'id', f"{sheet_name}_" + detail.index.astype(str))
+            detail['type'] = type_mapping.get(sheet_name, 'other')
+            detail['amount'] = detail['amount'].astype(float)
+            records.extend(detail.to_dict('records'))
 
         # 按日期排序
         records.sort(key=lambda x: x['date'], reverse=True)
@@ -1410,18 +1681,18 @@ class ExcelProcessor:
         if '一级部门' in df.columns:
             result['level1'] = sorted(df['一级部门'].dropna().unique().tolist())
 
-        # 获取二级部门（按一级部门分组）
+        # 获取二级部门（按一级部门分组，一次 groupby 代替逐部门筛选）
         if '一级部门' in df.columns and '二级部门' in df.columns:
+            l2_groups = df.dropna(subset=['一级部门', '二级部门']).groupby('一级部门', sort=False, observed=True)['二级部门'].unique()
             for l1 in result['level1']:
-                l2_list = df[df['一级部门'] == l1]['二级部门'].dropna().unique().tolist()
-                result['level2'][l1] = sorted(l2_list)
+                result['level2'][l1] = sorted(l2_groups.get(l1, []))
 
         # 获取三级部门（按二级部门分组）
         if '二级部门' in df.columns and '三级部门' in df.columns:
+            l3_groups = df.dropna(subset=['二级部门', '三级部门']).groupby('二级部门', sort=False, observed=True)['三级部门'].unique()
             for l1, l2_list in result['level2'].items():
                 for l2 in l2_list:
-                    l3_list = df[df['二级部门'] == l2]['三级部门'].dropna().unique().tolist()
-                    result['level3'][l2] = sorted(l3_list)
+                    result['level3'][l2] = sorted(l3_groups.get(l2, []))
 
         return result
 
@@ -1449,76 +1720,72 @@ class ExcelProcessor:
             self.logger.warning(f"get_department_list: 缺少部门列 '{dept_col}'（level={level}），可用列: {df.columns.tolist()}")
             return []
 
-        # 筛选部门
-        filtered_df = df.copy()
+        # 筛选部门（只读使用缓存数据，无需拷贝；上级部门直接取缓存的部门分组）
+        filtered_df = df
 
         if level == 2 and parent:
-            filtered_df = filtered_df[filtered_df['一级部门'] == parent]
+            filtered_df = self._get_department_rows('一级部门', parent)
         elif level == 3 and parent:
-            filtered_df = filtered_df[filtered_df['二级部门'] == parent]
+            filtered_df = self._get_department_rows('二级部门', parent)
 
         # 检查筛选后的数据
         if filtered_df.empty:
             self.logger.warning(f"get_department_list: 筛选后数据为空，level={level}, parent={parent}")
             return []
 
-        departments = filtered_df[dept_col].dropna().unique().tolist()
-        self.logger.info(f"get_department_list: 找到 {len(departments)} 个{dept_col}: {departments[:5]}...")
-
         # 获取差旅数据用于成本计算
         dept_costs = self._calculate_costs_by_department(filtered_df, dept_col)
 
-        results = []
-        for dept in departments:
-            dept_data = filtered_df[filtered_df[dept_col] == dept]
-
-            # 计算人数
-            person_count = dept_data['姓名'].nunique() if '姓名' in dept_data.columns else 0
-
-            avg_hours = 0
-            if '工时' in dept_data.columns and '当日状态判断' in dept_data.columns:
-                valid_hours = dept_data[(dept_data['当日状态判断'] == '上班') & (dept_data['工时'] != 0)]['工时'].dropna()
-                if not valid_hours.empty:
-                    avg_hours = float(valid_hours.mean())
-
-            holiday_avg_hours = 0
-            if '工时' in dept_data.columns and '当日状态判断' in dept_data.columns:
-                # 节假日平均工时计算（公休日上班）
-                holiday_data = dept_data[dept_data['当日状态判断'] == '公休日上班']
-                self.logger.info(f"[部门列表-{dept}] 节假日('公休日上班')记录数: {len(holiday_data)}")
-                if len(holiday_data) > 0:
-                    self.logger.info(f"[部门列表-{dept}] 节假日工时字段前5个值: {holiday_data['工时'].head(5).tolist()}")
-                    self.logger.info(f"[部门列表-{dept}] 节假日工时=0的记录数: {(holiday_data['工时'] == 0).sum()}")
-                    self.logger.info(f"[部门列表-{dept}] 节假日工时为NaN的记录数: {holiday_data['工时'].isna().sum()}")
-                holiday_valid_hours = holiday_data[holiday_data['工时'] != 0]['工时'].dropna()
-                self.logger.info(f"[部门列表-{dept}] 节假日有效工时记录(工时!=0且非NaN): {len(holiday_valid_hours)}")
-                if not holiday_valid_hours.empty:
-                    holiday_avg_hours = float(holiday_valid_hours.mean())
-                    self.logger.info(f"[部门列表-{dept}] 节假日平均工时: {holiday_avg_hours:.2f}小时 (基于{len(holiday_valid_hours)}条记录)")
-                    self.logger.info(f"[部门列表-{dept}] 节假日工时样本: {holiday_valid_hours.head(5).tolist()}")
-                else:
-                    self.logger.warning(f"[部门列表-{dept}] ⚠️  节假日平均工时为0 - 没有有效工时记录")
-
-            # 获取成本
-            cost_info = dept_costs.get(dept, {'total_cost': 0, 'flight_cost': 0, 'hotel_cost': 0, 'train_cost': 0})
+        # 各部门人数/工时一次分组聚合得出（已按成本降序），不再逐部门切片筛选
+        dept_stats = self._summarize_sub_departments(
+            filtered_df, dept_col, dept_costs, log_label=f"部门列表-{dept_col}"
+        )
+        self.logger.info(f"get_department_list: 找到 {len(dept_stats)} 个{dept_col}: {[item['name'] for item in dept_stats[:5]]}...")
 
-            results.append({
-                'name': dept,
+        results = [
+            {
+                'name': item['name'],
                 'level': level,
                 'parent': parent,
-                'person_count': int(person_count),
-                'total_cost': float(cost_info['total_cost']),
-                'avg_work_hours': round(avg_hours, 2),
-                'holiday_avg_work_hours': round(holiday_avg_hours, 2)
-            })
-
-        # 按成本降序排序
-        results.sort(key=lambda x: x['total_cost'], reverse=True)
+                'person_count': item['person_count'],
+                'total_cost': item['total_cost'],
+                'avg_work_hours': item['avg_work_hours'],
+                'holiday_avg_work_hours': item['holiday_avg_work_hours']
+            }
+            for item in dept_stats
+        ]
 
         self.logger.info(f"get_department_list: 返回 {len(results)} 个部门，前3个: {[(r['name'], r['total_cost'], r['person_count']) for r in results[:3]]}")
 
         return results
 
+    def _get_travel_cost_frame(self) -> pd.DataFrame:
+        """
+        汇总三类差旅的（姓名, 金额, 成本类型），各部门成本计算共用，按实例缓存
+        """
+        if self._travel_cost_cache is not None:
+            return self._travel_cost_cache
+
+        travel_frames: List[pd.DataFrame] = []
+        for sheet_name, cost_key in self.TRAVEL_COST_KEYS.items():
+            df = self.clean_travel_data(sheet_name)
+            if df.empty:
+                continue
+
+            amount_col = '授信金额' if '授信金额' in df.columns else '金额'
+            travel_frames.append(pd.DataFrame({
+                '姓名': df['姓名'] if '姓名' in df.columns else pd.Series(dtype=object, index=df.index),
+                'amount': df[amount_col].fillna(0) if amount_col in df.columns else 0,
+                'cost_key': cost_key
+            }))
+
+        if travel_frames:
+            travel = pd.concat(travel_frames, ignore_index=True)
+        else:
+            travel = pd.DataFrame(columns=['姓名', 'amount', 'cost_key'])
+        self._travel_cost_cache = travel
+        return travel
+
     def _calculate_costs_by_department(self, attendance_df: pd.DataFrame, dept_col: str) -> Dict[str, Dict[str, float]]:
         """
         计算各部门的差旅成本
@@ -1536,55 +1803,152 @@ class ExcelProcessor:
             self.logger.warning(f"_calculate_costs_by_department: attendance_df 为空")
             return dept_costs
 
-        # 获取姓名到部门的映射（保留所有映射，一个人可能属于多个部门）
-        name_dept_map = {}
-        for _, row in attendance_df[['姓名', dept_col]].drop_duplicates().iterrows():
-            name = row.get('姓名')
-            dept = row.get(dept_col)
-            if not name or pd.isna(name) or not dept or pd.isna(dept):
-                continue
-            if name not in name_dept_map:
-                name_dept_map[name] = []
-            if dept not in name_dept_map[name]:
-                name_dept_map[name].append(dept)
-
-        # 遍历差旅数据
-        travel_sheets = ['机票', '酒店', '火车票']
-        cost_keys = {'机票': 'flight_cost', '酒店': 'hotel_cost', '火车票': 'train_cost'}
+        # 姓名到部门的映射保留为 DataFrame（一个人可能属于多个部门）
+        name_to_depts = attendance_df[['姓名', dept_col]].dropna().drop_duplicates()
+        name_to_depts = name_to_depts[
+            name_to_depts['姓名'].astype(str).ne('') & name_to_depts[dept_col].astype(str).ne('')
+        ]
 
-        total_records = 0
+        travel = self._get_travel_cost_frame()
+        total_records = len(travel)
         matched_records = 0
 
-        for sheet_name in travel_sheets:
-            df = self.clean_travel_data(sheet_name)
-            if df.empty:
-                continue
+        if not travel.empty and not name_to_depts.empty:
+            matched_records = int(travel['姓名'].isin(name_to_depts['姓名']).sum())
 
-            amount_col = '授信金额' if '授信金额' in df.columns else '金额'
+            # 一个人可能属于多个部门，inner merge 后成本分配到所有关联部门
+            merged = travel.merge(name_to_depts, on='姓名', how='inner')
+            if not merged.empty:
+                sums = (
+                    merged.groupby([dept_col, 'cost_key'], sort=False, observed=True)['amount'].sum()
+                    .unstack(fill_value=0)
+                    .reindex(columns=list(self.TRAVEL_COST_KEYS.values()), fill_value=0)
+                )
+                sums.insert(0, 'total_cost', sums.sum(axis=1))
+                dept_costs = sums.to_dict(orient='index')
 
-            for _, row in df.iterrows():
-                total_records += 1
-                name = row.get('姓名', '')
-                if not name or pd.isna(name):
-                    continue
+        self.logger.info(f"_calculate_costs_by_department: 差旅记录 {total_records} 条，匹配 {matched_records} 条，部门数 {len(dept_costs)}")
+        return dept_costs
 
-                depts = name_dept_map.get(name, [])
-                if not depts:
-                    continue
+    def _travel_days_ranking(self, dept_df: pd.DataFrame, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        出差排行榜（按人统计"出差"天数），只取姓名列做计数，不复制整块部门数据
+        """
+        if '当日状态判断' not in dept_df.columns or '姓名' not in dept_df.columns:
+            return []
 
-                matched_records += 1
-                amount = row.get(amount_col, 0) or 0
-                cost_key = cost_keys[sheet_name]
+        # 姓名为 category，按对象值计数以保持并列名次按首次出现排序，且不带出未出现的人员
+        travel_names = dept_df['姓名'][dept_df['_is_travel']].to_numpy()
+        travel_counts = pd.Series(travel_names, dtype=object).value_counts(sort=False).nlargest(limit)
+        return [
+            {'name': name, 'value': int(count), 'detail': f'{count}天'}
+            for name, count in travel_counts.items()
+        ]
 
-                # 一个人可能属于多个部门，将成本分配到所有关联部门
-                for dept in depts:
-                    if dept not in dept_costs:
-                        dept_costs[dept] = {'total_cost': 0, 'flight_cost': 0, 'hotel_cost': 0, 'train_cost': 0}
-                    dept_costs[dept][cost_key] += amount
-                    dept_costs[dept]['total_cost'] += amount
+    def _avg_hours_ranking(self, dept_df: pd.DataFrame, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        平均工时排行榜（按人统计工作日平均工时，排除缺失及为0的工时）
+        """
+        if not {'工时', '姓名', '当日状态判断'}.issubset(dept_df.columns):
+            return []
 
-        self.logger.info(f"_calculate_costs_by_department: 差旅记录 {total_records} 条，匹配 {matched_records} 条，部门数 {len(dept_costs)}")
-        return dept_costs
+        hours = dept_df['工时']
+        mask = dept_df['_is_work'] & dept_df['_has_hours']
+        # 保留按姓名排序的分组：nlargest 遇到并列值时按分组顺序取，排名结果保持稳定
+        person_avg_hours = hours[mask].groupby(dept_df['姓名'][mask], observed=True).mean().nlargest(limit)
+        return [
+            {'name': name, 'value': float(round(avg_hours, 2)), 'detail': f'{avg_hours:.2f}小时'}
+            for name, avg_hours in person_avg_hours.items()
+        ]
+
+    def _summarize_sub_departments(
+        self,
+        parent_df: pd.DataFrame,
+        dept_col: str,
+        dept_costs: Dict[str, Dict[str, float]],
+        log_label: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按下级部门汇总考勤指标（一次分组聚合得到全部子部门，结果按成本降序）
+
+        Args:
+            parent_df: 上级部门的考勤记录
+            dept_col: 下级部门列名（二级部门/三级部门）
+            dept_costs: 下级部门成本，来自 _calculate_costs_by_department
+            log_label: 日志前缀，提供时对节假日工时缺失的部门输出告警
+        """
+        if dept_col not in parent_df.columns:
+            return []
+
+        sub_depts = parent_df[dept_col].dropna().unique().tolist()
+        if not sub_depts:
+            return []
+
+        # 各指标先转为逐行的标记/取值列，再按部门一次聚合
+        columns: Dict[str, pd.Series] = {'unknown': self._unknown_status_mask(parent_df)}
+        has_status = '当日状态判断' in parent_df.columns
+        if has_status:
+            columns['workday'] = parent_df['_is_work']
+            columns['weekend_work'] = parent_df['_is_weekend_work']
+            columns['travel'] = parent_df['_is_travel']
+            columns['leave'] = parent_df['_is_leave']
+            if '工时' in parent_df.columns:
+                hours = parent_df['工时']
+                columns['work_hours'] = hours.where(columns['workday'] & parent_df['_has_hours'])
+                columns['holiday_hours'] = hours.where(columns['weekend_work'] & parent_df['_has_hours'])
+        if '姓名' in parent_df.columns:
+            columns['person'] = parent_df['姓名']
+            if '最晚19:30之后' in parent_df.columns:
+                columns['late_person'] = parent_df['姓名'].where(parent_df['_is_late_1930'])
+
+        aggregations = {
+            'anomaly_days': ('unknown', 'sum'),
+            **{name: (name, 'sum') for name in ('workday', 'weekend_work', 'travel', 'leave') if name in columns},
+            **{name: (name, 'mean') for name in ('work_hours', 'holiday_hours') if name in columns},
+            **{name: (name, 'nunique') for name in ('person', 'late_person') if name in columns},
+        }
+        grouped = (
+            pd.DataFrame(columns)
+            .groupby(parent_df[dept_col], sort=False, observed=True)
+            .agg(**aggregations)
+        )
+        stats_by_dept = grouped.to_dict(orient='index')
+
+        def metric(stats: Dict[str, Any], name: str) -> float:
+            value = stats.get(name, 0)
+            return 0 if pd.isna(value) else value
+
+        results = []
+        for dept in sub_depts:
+            stats = stats_by_dept.get(dept, {})
+            avg_hours = float(metric(stats, 'work_hours'))
+            holiday_avg_hours = float(metric(stats, 'holiday_hours'))
+            weekend_work_days = int(metric(stats, 'weekend_work'))
+            if log_label and has_status and holiday_avg_hours == 0:
+                self.logger.warning(
+                    f"[{log_label}/{dept}] ⚠️  节假日平均工时为0 - 没有有效工时记录"
+                    f"（公休日上班记录数: {weekend_work_days}）"
+                )
+
+            cost_info = dept_costs.get(dept, {'total_cost': 0})
+            results.append({
+                'name': dept,
+                'person_count': int(metric(stats, 'person')),
+                'avg_work_hours': round(avg_hours, 2),
+                'holiday_avg_work_hours': round(holiday_avg_hours, 2),
+                'workday_attendance_days': int(metric(stats, 'workday')),
+                'weekend_work_days': weekend_work_days,
+                # 周末出勤次数同步公休日上班统计，保持与饼图数据一致
+                'weekend_attendance_count': weekend_work_days,
+                'travel_days': int(metric(stats, 'travel')),
+                'leave_days': int(metric(stats, 'leave')),
+                'anomaly_days': int(metric(stats, 'anomaly_days')),
+                'late_after_1930_count': int(metric(stats, 'late_person')),
+                'total_cost': float(cost_info.get('total_cost', 0))
+            })
+
+        results.sort(key=lambda x: x['total_cost'], reverse=True)
+        return results
 
     def get_department_detail_metrics(self, department_name: str, level: int = 3) -> Dict[str, Any]:
         """
@@ -1608,11 +1972,16 @@ class ExcelProcessor:
             return {}
 
         # 筛选该部门的数据
-        dept_df = df[df[dept_col] == department_name].copy()
+        dept_df = self._get_department_rows(dept_col, department_name)
 
         if dept_df.empty:
             return {}
 
+        # 各指标共用的列存在性判断只做一次
+        has_status = '当日状态判断' in dept_df.columns
+        has_name = '姓名' in dept_df.columns
+        has_hours = '工时' in dept_df.columns
+
         # 获取父部门
         parent_dept = None
         if level == 2 and '一级部门' in dept_df.columns:
@@ -1622,41 +1991,38 @@ class ExcelProcessor:
             parent_dept = dept_df['二级部门'].dropna().unique()
             parent_dept = parent_dept[0] if len(parent_dept) > 0 else None
 
-        # 1. 当月考勤天数分布
-        attendance_days_distribution = {}
-        if '当日状态判断' in dept_df.columns:
-            attendance_days_distribution = dept_df['当日状态判断'].value_counts().to_dict()
+        # 1. 当月考勤天数分布（状态列只统计一次，以下各项天数直接从分布中取）
+        attendance_days_distribution = self._status_distribution(dept_df)
 
         # 2. 公休日上班天数
-        weekend_work_days = 0
-        if '当日状态判断' in dept_df.columns:
-            weekend_work_days = int(dept_df[dept_df['当日状态判断'] == '公休日上班'].shape[0])
+        weekend_work_days = attendance_days_distribution.get('公休日上班', 0)
 
         # 3. 工作日出勤天数
-        workday_attendance_days = 0
-        if '当日状态判断' in dept_df.columns:
-            workday_attendance_days = int(dept_df[dept_df['当日状态判断'] == '上班'].shape[0])
+        workday_attendance_days = attendance_days_distribution.get('上班', 0)
 
         avg_work_hours = 0
         holiday_avg_work_hours = 0
-        if '工时' in dept_df.columns and '当日状态判断' in dept_df.columns:
+        if has_hours and has_status:
+            # 只按状态标记列取工时列，不复制整块部门数据
+            hours = dept_df['工时']
+
             # 工作日平均工时计算
-            workday_data = dept_df[dept_df['当日状态判断'] == '上班']
-            self.logger.info(f"[部门详情-{department_name}] 工作日('上班')记录数: {len(workday_data)}")
-            valid_hours = workday_data[workday_data['工时'] != 0]['工时'].dropna()
+            workday_hours = hours[dept_df['_is_work']]
+            self.logger.info(f"[部门详情-{department_name}] 工作日('上班')记录数: {len(workday_hours)}")
+            valid_hours = workday_hours[workday_hours != 0].dropna()
             self.logger.info(f"[部门详情-{department_name}] 工作日有效工时记录(工时!=0且非NaN): {len(valid_hours)}")
             if not valid_hours.empty:
                 avg_work_hours = float(valid_hours.mean())
                 self.logger.info(f"[部门详情-{department_name}] 工作日平均工时: {avg_work_hours:.2f}小时")
 
             # 节假日平均工时计算（公休日上班）
-            holiday_data = dept_df[dept_df['当日状态判断'] == '公休日上班']
-            self.logger.info(f"[部门详情-{department_name}] 节假日('公休日上班')记录数: {len(holiday_data)}")
-            if len(holiday_data) > 0:
-                self.logger.info(f"[部门详情-{department_name}] 节假日工时字段前5个值: {holiday_data['工时'].head(5).tolist()}")
-                self.logger.info(f"[部门详情-{department_name}] 节假日工时=0的记录数: {(holiday_data['工时'] == 0).sum()}")
-                self.logger.info(f"[部门详情-{department_name}] 节假日工时为NaN的记录数: {holiday_data['工时'].isna().sum()}")
-            holiday_valid_hours = holiday_data[holiday_data['工时'] != 0]['工时'].dropna()
+            holiday_hours = hours[dept_df['_is_weekend_work']]
+            self.logger.info(f"[部门详情-{department_name}] 节假日('公休日上班')记录数: {len(holiday_hours)}")
+            if len(holiday_hours) > 0:
+                self.logger.info(f"[部门详情-{department_name}] 节假日工时字段前5个值: {holiday_hours.head(5).tolist()}")
+                self.logger.info(f"[部门详情-{department_name}] 节假日工时=0的记录数: {(holiday_hours == 0).sum()}")
+                self.logger.info(f"[部门详情-{department_name}] 节假日工时为NaN的记录数: {holiday_hours.isna().sum()}")
+            holiday_valid_hours = holiday_hours[holiday_hours != 0].dropna()
             self.logger.info(f"[部门详情-{department_name}] 节假日有效工时记录(工时!=0且非NaN): {len(holiday_valid_hours)}")
             if not holiday_valid_hours.empty:
                 holiday_avg_work_hours = float(holiday_valid_hours.mean())
@@ -1667,14 +2033,10 @@ class ExcelProcessor:
                 self.logger.warning(f"[部门详情-{department_name}] ⚠️  节假日平均工时为0 - 没有有效工时记录")
 
         # 5. 出差天数
-        travel_days = 0
-        if '当日状态判断' in dept_df.columns:
-            travel_days = int(dept_df[dept_df['当日状态判断'] == '出差'].shape[0])
+        travel_days = attendance_days_distribution.get('出差', 0)
 
         # 6. 请假天数
-        leave_days = 0
-        if '当日状态判断' in dept_df.columns:
-            leave_days = int(dept_df[dept_df['当日状态判断'] == '请假'].shape[0])
+        leave_days = attendance_days_distribution.get('请假', 0)
 
         # 7. 未知天数（疑似异常）：来自考勤状态缺失/未知
         unknown_mask = self._unknown_status_mask(dept_df)
@@ -1682,62 +2044,44 @@ class ExcelProcessor:
 
         # 8. 晚上7:30后下班人数
         late_after_1930_count = 0
-        if '最晚19:30之后' in dept_df.columns:
-            late_after_1930_count = int(dept_df[dept_df['最晚19:30之后'] == '符合']['姓名'].nunique())
+        if has_name and '_is_late_1930' in dept_df.columns:
+            late_after_1930_count = int(dept_df.loc[dept_df['_is_late_1930'], '姓名'].nunique())
 
         # 9. 周末出勤次数（与考勤分布保持一致，仅统计"公休日上班"）
-        weekend_attendance_count = int(attendance_days_distribution.get('公休日上班', weekend_work_days))
+        weekend_attendance_count = weekend_work_days
 
         # 10. 出差排行榜（按出差天数）
-        travel_ranking = []
-        if '当日状态判断' in dept_df.columns:
-            travel_df = dept_df[dept_df['当日状态判断'] == '出差']
-            if not travel_df.empty and '姓名' in travel_df.columns:
-                travel_counts = travel_df['姓名'].value_counts().head(10)
-                travel_ranking = [
-                    {'name': name, 'value': int(count), 'detail': f'{count}天'}
-                    for name, count in travel_counts.items()
-                ]
+        travel_ranking = self._travel_days_ranking(dept_df)
 
         # 11. 异常排行榜（按异常次数）
         anomaly_ranking = []
-        if '姓名' in dept_df.columns and '当日状态判断' in dept_df.columns and unknown_mask.any():
-            unknown_counts = (
-                dept_df[unknown_mask]
-                .groupby('姓名')
-                .size()
-                .sort_values(ascending=False)
-            )
+        if has_name and has_status and unknown_mask.any():
+            # 只取姓名列计数，不切片整块部门数据
+            unknown_names = dept_df['姓名'][unknown_mask]
+            unknown_counts = unknown_names.groupby(unknown_names, observed=True).size().nlargest(10)
             anomaly_ranking = [
                 {'name': name, 'value': int(count), 'detail': f'{count}人天'}
-                for name, count in unknown_counts.head(10).items()
+                for name, count in unknown_counts.items()
             ]
 
         # 12. 最晚下班排行榜
         latest_checkout_ranking = []
-        if '最晚打卡时间' in dept_df.columns:
-            dept_df['punch_time'] = pd.to_datetime(dept_df['最晚打卡时间'], format='%H:%M:%S', errors='coerce')
-            valid_punch = dept_df[dept_df['punch_time'].notna()].sort_values('punch_time', ascending=False)
-            if not valid_punch.empty and '姓名' in valid_punch.columns:
-                for _, row in valid_punch.head(10).iterrows():
+        if has_name and '最晚打卡时间' in dept_df.columns:
+            # 打卡时间只作为排序键，不写回部门数据；按固定格式解析走向量化路径，
+            # 同时剔除非法时间（按字符串排序会把非法值排到最前）
+            punch_time = pd.to_datetime(dept_df['最晚打卡时间'], format='%H:%M:%S', errors='coerce')
+            punch_order = punch_time.nlargest(10).index
+            if len(punch_order) > 0:
+                top_punch = dept_df.loc[punch_order]
+                for name, punch in zip(top_punch['姓名'].to_numpy(), top_punch['最晚打卡时间'].to_numpy()):
                     latest_checkout_ranking.append({
-                        'name': row['姓名'],
+                        'name': name,
                         'value': 0,  # ECharts需要数值，这里仅用于排序
-                        'detail': row['最晚打卡时间']
+                        'detail': punch
                     })
 
         # 13. 最长工时排行榜（按平均工时排名，工作日）
-        longest_hours_ranking = []
-        if '工时' in dept_df.columns and '姓名' in dept_df.columns and '当日状态判断' in dept_df.columns:
-            workday_df = dept_df[dept_df['当日状态判断'] == '上班']
-            person_avg_hours = workday_df[workday_df['工时'].notna() & (workday_df['工时'] != 0)].groupby('姓名')['工时'].mean()
-            person_avg_hours = person_avg_hours.sort_values(ascending=False)
-            for name, avg_hours in person_avg_hours.head(10).items():
-                longest_hours_ranking.append({
-                    'name': name,
-                    'value': float(round(avg_hours, 2)),
-                    'detail': f'{avg_hours:.2f}小时'
-                })
+        longest_hours_ranking = self._avg_hours_ranking(dept_df)
 
         return {
             'department_name': department_name,
@@ -1779,132 +2123,27 @@ class ExcelProcessor:
             return {}
 
         # 筛选该一级部门的数据
-        level1_df = df[df['一级部门'] == level1_name].copy()
+        level1_df = self._get_department_rows('一级部门', level1_name)
 
         if level1_df.empty:
             return {}
 
         # 1. 累计差旅成本
-        total_travel_cost = 0
         dept_costs = self._calculate_costs_by_department(level1_df, '二级部门')
-        for cost_info in dept_costs.values():
-            total_travel_cost += cost_info['total_cost']
+        total_travel_cost = sum(cost_info['total_cost'] for cost_info in dept_costs.values())
 
         # 2. 考勤天数分布（整个一级部门）
-        attendance_days_distribution = {}
-        if '当日状态判断' in level1_df.columns:
-            attendance_days_distribution = level1_df['当日状态判断'].value_counts().to_dict()
+        attendance_days_distribution = self._status_distribution(level1_df)
 
         # 3. 出差排行榜（按人，在整个一级部门范围内）
-        travel_ranking = []
-        if '当日状态判断' in level1_df.columns:
-            travel_df = level1_df[level1_df['当日状态判断'] == '出差']
-            if not travel_df.empty and '姓名' in travel_df.columns:
-                travel_counts = travel_df['姓名'].value_counts().head(10)
-                travel_ranking = [
-                    {'name': name, 'value': int(count), 'detail': f'{count}天'}
-                    for name, count in travel_counts.items()
-                ]
-
-        avg_hours_ranking = []
-        if '工时' in level1_df.columns and '姓名' in level1_df.columns and '当日状态判断' in level1_df.columns:
-            workday_df = level1_df[level1_df['当日状态判断'] == '上班']
-            person_avg_hours = workday_df[workday_df['工时'].notna() & (workday_df['工时'] != 0)].groupby('姓名')['工时'].mean()
-            person_avg_hours = person_avg_hours.sort_values(ascending=False)
-            for name, avg_hours in person_avg_hours.head(10).items():
-                avg_hours_ranking.append({
-                    'name': name,
-                    'value': float(round(avg_hours, 2)),
-                    'detail': f'{avg_hours:.2f}小时'
-                })
+        travel_ranking = self._travel_days_ranking(level1_df)
 
-        # 5. 二级部门统计（包含所有指标）
-        level2_department_stats = []
-        if '二级部门' in level1_df.columns:
-            level2_list = level1_df['二级部门'].dropna().unique().tolist()
-
-            for l2_dept in level2_list:
-                l2_df = level1_df[level1_df['二级部门'] == l2_dept]
-
-                # 计算人数
-                person_count = l2_df['姓名'].nunique() if '姓名' in l2_df.columns else 0
-
-                # 计算平均工时
-                avg_hours = 0
-                holiday_avg_hours = 0
-                if '工时' in l2_df.columns and '当日状态判断' in l2_df.columns:
-                    valid_hours = l2_df[(l2_df['当日状态判断'] == '上班') & (l2_df['工时'] != 0)]['工时'].dropna()
-                    if not valid_hours.empty:
-                        avg_hours = float(valid_hours.mean())
-
-                    # 节假日平均工时计算（公休日上班）
-                    holiday_data = l2_df[l2_df['当日状态判断'] == '公休日上班']
-                    self.logger.info(f"[一级部门统计-{level1_name}/{l2_dept}] 节假日('公休日上班')记录数: {len(holiday_data)}")
-                    if len(holiday_data) > 0:
-                        self.logger.info(f"[一级部门统计-{level1_name}/{l2_dept}] 节假日工时字段前5个值: {holiday_data['工时'].head(5).tolist()}")
-                        self.logger.info(f"[一级部门统计-{level1_name}/{l2_dept}] 节假日工时=0的记录数: {(holiday_data['工时'] == 0).sum()}")
-                        self.logger.info(f"[一级部门统计-{level1_name}/{l2_dept}] 节假日工时为NaN的记录数: {holiday_data['工时'].isna().sum()}")
-                    holiday_valid_hours = holiday_data[holiday_data['工时'] != 0]['工时'].dropna()
-                    self.logger.info(f"[一级部门统计-{level1_name}/{l2_dept}] 节假日有效工时记录(工时!=0且非NaN): {len(holiday_valid_hours)}")
-                    if not holiday_valid_hours.empty:
-                        holiday_avg_hours = float(holiday_valid_hours.mean())
-                        self.logger.info(f"[一级部门统计-{level1_name}/{l2_dept}] 节假日平均工时: {holiday_avg_hours:.2f}小时 (基于{len(holiday_valid_hours)}条记录)")
-                        self.logger.info(f"[一级部门统计-{level1_name}/{l2_dept}] 节假日工时样本: {holiday_valid_hours.head(5).tolist()}")
-                    else:
-                        self.logger.warning(f"[一级部门统计-{level1_name}/{l2_dept}] ⚠️  节假日平均工时为0 - 没有有效工时记录")
-
-                # 工作日出勤天数
-                workday_attendance_days = 0
-                if '当日状态判断' in l2_df.columns:
-                    workday_attendance_days = int(l2_df[l2_df['当日状态判断'] == '上班'].shape[0])
-
-                # 公休日上班天数
-                weekend_work_days = 0
-                if '当日状态判断' in l2_df.columns:
-                    weekend_work_days = int(l2_df[l2_df['当日状态判断'] == '公休日上班'].shape[0])
-
-                # 周末出勤次数（同步公休日上班统计，保持与饼图数据一致）
-                weekend_attendance_count = weekend_work_days
-
-                # 出差天数
-                travel_days = 0
-                if '当日状态判断' in l2_df.columns:
-                    travel_days = int(l2_df[l2_df['当日状态判断'] == '出差'].shape[0])
-
-                # 请假天数
-                leave_days = 0
-                if '当日状态判断' in l2_df.columns:
-                    leave_days = int(l2_df[l2_df['当日状态判断'] == '请假'].shape[0])
-
-                # 未知天数（疑似异常）
-                unknown_mask = self._unknown_status_mask(l2_df)
-                anomaly_days = int(unknown_mask.sum())
-
-                # 晚上7:30后下班人数
-                late_after_1930_count = 0
-                if '最晚19:30之后' in l2_df.columns:
-                    late_after_1930_count = int(l2_df[l2_df['最晚19:30之后'] == '符合']['姓名'].nunique())
-
-                # 获取该二级部门的成本
-                cost_info = dept_costs.get(l2_dept, {'total_cost': 0})
-
-                level2_department_stats.append({
-                    'name': l2_dept,
-                    'person_count': person_count,
-                    'avg_work_hours': round(avg_hours, 2),
-                    'holiday_avg_work_hours': round(holiday_avg_hours, 2),
-                    'workday_attendance_days': workday_attendance_days,
-                    'weekend_work_days': weekend_work_days,
-                    'weekend_attendance_count': weekend_attendance_count,
-                    'travel_days': travel_days,
-                    'leave_days': leave_days,
-                    'anomaly_days': anomaly_days,
-                    'late_after_1930_count': late_after_1930_count,
-                    'total_cost': float(cost_info['total_cost'])
-                })
+        avg_hours_ranking = self._avg_hours_ranking(level1_df)
 
-            # 按成本降序排序
-            level2_department_stats.sort(key=lambda x: x['total_cost'], reverse=True)
+        # 5. 二级部门统计（包含所有指标）
+        level2_department_stats = self._summarize_sub_departments(
+            level1_df, '二级部门', dept_costs, log_label=f"一级部门统计-{level1_name}"
+        )
 
         return {
             'department_name': level1_name,
@@ -1934,7 +2173,7 @@ class ExcelProcessor:
         if df.empty:
             return {}
 
-        level2_df = df[df['二级部门'] == level2_name].copy()
+        level2_df = self._get_department_rows('二级部门', level2_name)
         if level2_df.empty:
             return {}
 
@@ -1954,100 +2193,19 @@ class ExcelProcessor:
             total_travel_cost = sum(info.get('total_cost', 0) for info in level3_costs.values())
 
         # 2. 考勤天数分布（整个二级部门）
-        attendance_days_distribution = {}
-        if '当日状态判断' in level2_df.columns:
-            attendance_days_distribution = level2_df['当日状态判断'].value_counts().to_dict()
+        attendance_days_distribution = self._status_distribution(level2_df)
 
         # 3. 出差排行榜（按人）
-        travel_ranking = []
-        if '当日状态判断' in level2_df.columns:
-            travel_df = level2_df[level2_df['当日状态判断'] == '出差']
-            if not travel_df.empty and '姓名' in travel_df.columns:
-                travel_counts = travel_df['姓名'].value_counts().head(10)
-                travel_ranking = [
-                    {'name': name, 'value': int(count), 'detail': f'{count}天'}
-                    for name, count in travel_counts.items()
-                ]
+        travel_ranking = self._travel_days_ranking(level2_df)
 
         # 4. 平均工时排行榜（工作日）
-        avg_hours_ranking = []
-        if '工时' in level2_df.columns and '姓名' in level2_df.columns and '当日状态判断' in level2_df.columns:
-            workday_df = level2_df[level2_df['当日状态判断'] == '上班']
-            person_avg_hours = workday_df[workday_df['工时'].notna() & (workday_df['工时'] != 0)].groupby('姓名')['工时'].mean()
-            person_avg_hours = person_avg_hours.sort_values(ascending=False)
-            for name, avg_hours in person_avg_hours.head(10).items():
-                avg_hours_ranking.append({
-                    'name': name,
-                    'value': float(round(avg_hours, 2)),
-                    'detail': f'{avg_hours:.2f}小时'
-                })
+        avg_hours_ranking = self._avg_hours_ranking(level2_df)
 
         # 5. 三级部门统计
         level3_department_stats = []
         if '三级部门' in level2_df.columns:
-            level3_list = level2_df['三级部门'].dropna().unique().tolist()
             level3_costs = self._calculate_costs_by_department(level2_df, '三级部门')
-
-            for l3_dept in level3_list:
-                l3_df = level2_df[level2_df['三级部门'] == l3_dept]
-
-                person_count = l3_df['姓名'].nunique() if '姓名' in l3_df.columns else 0
-
-                avg_hours = 0
-                holiday_avg_hours = 0
-                if '工时' in l3_df.columns and '当日状态判断' in l3_df.columns:
-                    valid_hours = l3_df[(l3_df['当日状态判断'] == '上班') & (l3_df['工时'] != 0)]['工时'].dropna()
-                    if not valid_hours.empty:
-                        avg_hours = float(valid_hours.mean())
-
-                    holiday_data = l3_df[l3_df['当日状态判断'] == '公休日上班']
-                    holiday_valid_hours = holiday_data[holiday_data['工时'] != 0]['工时'].dropna()
-                    if not holiday_valid_hours.empty:
-                        holiday_avg_hours = float(holiday_valid_hours.mean())
-
-                workday_attendance_days = 0
-                if '当日状态判断' in l3_df.columns:
-                    workday_attendance_days = int(l3_df[l3_df['当日状态判断'] == '上班'].shape[0])
-
-                weekend_work_days = 0
-                if '当日状态判断' in l3_df.columns:
-                    weekend_work_days = int(l3_df[l3_df['当日状态判断'] == '公休日上班'].shape[0])
-
-                weekend_attendance_count = weekend_work_days
-
-                travel_days = 0
-                if '当日状态判断' in l3_df.columns:
-                    travel_days = int(l3_df[l3_df['当日状态判断'] == '出差'].shape[0])
-
-                leave_days = 0
-                if '当日状态判断' in l3_df.columns:
-                    leave_days = int(l3_df[l3_df['当日状态判断'] == '请假'].shape[0])
-
-                unknown_mask = self._unknown_status_mask(l3_df)
-                anomaly_days = int(unknown_mask.sum())
-
-                late_after_1930_count = 0
-                if '最晚19:30之后' in l3_df.columns:
-                    late_after_1930_count = int(l3_df[l3_df['最晚19:30之后'] == '符合']['姓名'].nunique())
-
-                cost_info = level3_costs.get(l3_dept, {'total_cost': 0})
-
-                level3_department_stats.append({
-                    'name': l3_dept,
-                    'person_count': person_count,
-                    'avg_work_hours': round(avg_hours, 2),
-                    'holiday_avg_work_hours': round(holiday_avg_hours, 2),
-                    'workday_attendance_days': workday_attendance_days,
-                    'weekend_work_days': weekend_work_days,
-                    'weekend_attendance_count': weekend_attendance_count,
-                    'travel_days': travel_days,
-                    'leave_days': leave_days,
-                    'anomaly_days': anomaly_days,
-                    'late_after_1930_count': late_after_1930_count,
-                    'total_cost': float(cost_info.get('total_cost', 0))
-                })
-
-            level3_department_stats.sort(key=lambda x: x['total_cost'], reverse=True)
+            level3_department_stats = self._summarize_sub_departments(level2_df, '三级部门', level3_costs)
 
         return {
             'department_name': level2_name,
@@ -2065,41 +2223,16 @@ class ExcelProcessor:
         if not self.sheets_data:
             self.load_all_sheets()
 
-        months_set = set()
-
-        flight_df = self.clean_travel_data('机票')
-        if not flight_df.empty and '起飞日期' in flight_df.columns:
-            months = flight_df['起飞日期'].dt.strftime('%Y-%m').dropna().unique()
-            months_set.update(months)
-
-        hotel_df = self.clean_travel_data('酒店')
-        if not hotel_df.empty and '入住日期' in hotel_df.columns:
-            months = hotel_df['入住日期'].dt.strftime('%Y-%m').dropna().unique()
-            months_set.update(months)
-
-        train_df = self.clean_travel_data('火车票')
-        if not train_df.empty and '出发日期' in train_df.columns:
-            months = train_df['出发日期'].dt.strftime('%Y-%m').dropna().unique()
-            months_set.update(months)
-
-        return sorted(list(months_set))
-
-    def _save_cache(self, cache_path: str, data: Dict[str, Any]):
-        """Save analysis results to JSON cache file"""
-        import json
-        from pathlib import Path
+        # 先把日期折算为整数月序号（年*12+月-1）去重，只对去重后的少量月份格式化字符串
+        month_keys = []
+        for sheet_name, date_col in (('机票', '起飞日期'), ('酒店', '入住日期'), ('火车票', '出发日期')):
+            df = self.clean_travel_data(sheet_name)
+            if df.empty or date_col not in df.columns:
+                continue
+            dates = df[date_col].dropna()
+            month_keys.append((dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int64))
 
-        cache_file = Path(cache_path)
-        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        if not month_keys:
+            return []
 
-        temp_path = cache_file.with_suffix('.tmp')
-        try:
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            temp_path.replace(cache_file)
-            self.logger.info(f"Cache saved to: {cache_path}")
-        except Exception as e:
-            self.logger.error(f"Failed to save cache: {e}")
-            if temp_path.exists():
-                temp_path.unlink()
-            raise
+        return [f"{key // 12}-{key % 12 + 1:02d}" for key in np.unique(np.concatenate(month_keys))]
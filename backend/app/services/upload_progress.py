@@ -3,7 +3,7 @@ Upload progress manager
 Tracks upload progress for real-time updates
 """
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from threading import Lock
 from datetime import datetime
 
@@ -12,17 +12,35 @@ from app.utils.logger import get_logger
 logger = get_logger("upload_progress")
 
 
+def _format_ts(ts: float) -> str:
+    """Format an epoch timestamp as a local ISO-8601 string"""
+    return datetime.fromtimestamp(ts).isoformat()
+
+
 class UploadProgressManager:
     """Manages upload progress tracking"""
     
+    # Tasks are spread across independently locked shards so concurrent uploads
+    # with different task ids do not contend on a single mutex
+    SHARD_COUNT = 16
+
     def __init__(self):
-        self._progress: Dict[str, Dict[str, Any]] = {}
-        self._lock = Lock()
+        self._shards: List[Dict[str, Dict[str, Any]]] = [{} for _ in range(self.SHARD_COUNT)]
+        self._locks: List[Lock] = [Lock() for _ in range(self.SHARD_COUNT)]
+
+    def _shard(self, task_id: str) -> Tuple[Dict[str, Dict[str, Any]], Lock]:
+        """Return the (tasks, lock) shard that owns task_id"""
+        index = hash(task_id) % self.SHARD_COUNT
+        return self._shards[index], self._locks[index]
     
     def create_task(self, task_id: str, file_name: str) -> None:
         """Create a new upload progress tracking task"""
-        with self._lock:
-            self._progress[task_id] = {
+        now = time.time()
+        tasks, lock = self._shard(task_id)
+        with lock:
+            # Re-insert so each shard stays ordered by creation time (see cleanup_old_tasks)
+            tasks.pop(task_id, None)
+            tasks[task_id] = {
                 "task_id": task_id,
                 "file_name": file_name,
                 "status": "uploading",
@@ -30,8 +48,9 @@ class UploadProgressManager:
                 "current_step": "正在上传文件...",
                 "steps": [],
                 "error": None,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),
+                # Timestamps are stored as epoch floats and formatted on read
+                "created_at": now,
+                "updated_at": now,
             }
     
     def update_progress(
@@ -42,80 +61,106 @@ class UploadProgressManager:
         status: Optional[str] = None
     ) -> None:
         """Update progress for a task"""
-        with self._lock:
-            if task_id not in self._progress:
+        now = time.time()
+        tasks, lock = self._shard(task_id)
+        with lock:
+            task = tasks.get(task_id)
+            if task is None:
                 return
             
-            self._progress[task_id]["progress"] = progress
-            self._progress[task_id]["current_step"] = current_step
-            self._progress[task_id]["updated_at"] = datetime.now().isoformat()
+            task["progress"] = progress
+            task["current_step"] = current_step
+            task["updated_at"] = now
             
             if status:
-                self._progress[task_id]["status"] = status
+                task["status"] = status
     
     def add_step(self, task_id: str, step: str) -> None:
         """Add a completed step to the task"""
-        with self._lock:
-            if task_id not in self._progress:
+        now = time.time()
+        tasks, lock = self._shard(task_id)
+        with lock:
+            task = tasks.get(task_id)
+            if task is None:
                 return
             
-            self._progress[task_id]["steps"].append({
+            task["steps"].append({
                 "step": step,
-                "completed_at": datetime.now().isoformat()
+                "completed_at": now
             })
     
     def complete_task(self, task_id: str, result: Optional[Dict[str, Any]] = None) -> None:
         """Mark task as completed"""
-        with self._lock:
-            if task_id not in self._progress:
+        now = time.time()
+        tasks, lock = self._shard(task_id)
+        with lock:
+            task = tasks.get(task_id)
+            if task is None:
                 return
             
-            self._progress[task_id]["status"] = "completed"
-            self._progress[task_id]["progress"] = 100
-            self._progress[task_id]["current_step"] = "上传并解析完成"
-            self._progress[task_id]["updated_at"] = datetime.now().isoformat()
+            task["status"] = "completed"
+            task["progress"] = 100
+            task["current_step"] = "上传并解析完成"
+            task["updated_at"] = now
             
             if result:
-                self._progress[task_id]["result"] = result
+                task["result"] = result
     
     def fail_task(self, task_id: str, error: str) -> None:
         """Mark task as failed"""
-        with self._lock:
-            if task_id not in self._progress:
+        now = time.time()
+        tasks, lock = self._shard(task_id)
+        with lock:
+            task = tasks.get(task_id)
+            if task is None:
                 return
             
-            self._progress[task_id]["status"] = "failed"
-            self._progress[task_id]["error"] = error
-            self._progress[task_id]["current_step"] = f"上传失败: {error}"
-            self._progress[task_id]["updated_at"] = datetime.now().isoformat()
+            task["status"] = "failed"
+            task["error"] = error
+            task["current_step"] = f"上传失败: {error}"
+            task["updated_at"] = now
     
     def get_progress(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """Get progress for a task"""
-        with self._lock:
-            return self._progress.get(task_id)
+        """Get progress for a task (timestamps formatted as ISO strings)"""
+        tasks, lock = self._shard(task_id)
+        with lock:
+            task = tasks.get(task_id)
+            if task is None:
+                return None
+            snapshot = dict(task)
+            snapshot["steps"] = list(task["steps"])
+
+        snapshot["created_at"] = _format_ts(snapshot["created_at"])
+        snapshot["updated_at"] = _format_ts(snapshot["updated_at"])
+        snapshot["steps"] = [
+            {"step": step["step"], "completed_at": _format_ts(step["completed_at"])}
+            for step in snapshot["steps"]
+        ]
+        return snapshot
     
     def cleanup_task(self, task_id: str) -> None:
         """Remove a task from tracking"""
-        with self._lock:
-            if task_id in self._progress:
-                del self._progress[task_id]
+        tasks, lock = self._shard(task_id)
+        with lock:
+            tasks.pop(task_id, None)
     
     def cleanup_old_tasks(self, max_age_hours: int = 24) -> None:
         """Remove tasks older than max_age_hours"""
-        with self._lock:
-            now = datetime.now()
-            to_remove = []
-            
-            for task_id, task in self._progress.items():
-                created_at = datetime.fromisoformat(task["created_at"])
-                age_hours = (now - created_at).total_seconds() / 3600
-                
-                if age_hours > max_age_hours:
+        max_age_seconds = max_age_hours * 3600
+        now = time.time()
+        for tasks, lock in zip(self._shards, self._locks):
+            with lock:
+                # Shards are ordered by created_at, so expired tasks form a prefix:
+                # stop at the first task that is still fresh instead of scanning all
+                to_remove = []
+                for task_id, task in tasks.items():
+                    if now - task["created_at"] <= max_age_seconds:
+                        break
                     to_remove.append(task_id)
-            
-            for task_id in to_remove:
-                del self._progress[task_id]
-                logger.info(f"Cleaned up old task: {task_id}")
+                
+                for task_id in to_remove:
+                    del tasks[task_id]
+                    logger.info(f"Cleaned up old task: {task_id}")
 
 
 # Global instance
@@ -8,11 +8,15 @@ is provided so the application keeps running with useful logs.
 """
 
 import logging
+import os
 import sys
 from pathlib import Path
 from logging.handlers import RotatingFileHandler
 
 LOG_FORMAT = "%(asctime)s - [%(levelname)s] - [%(name)s:%(funcName)s:%(lineno)d] - %(message)s"
+# 控制台使用精简格式（不含函数名/行号）；设置 LOG_VERBOSE=1 时控制台也输出详细格式
+CONSOLE_LOG_FORMAT = "%(asctime)s - [%(levelname)s] - [%(name)s] - %(message)s"
+LOG_VERBOSE = os.getenv("LOG_VERBOSE", "").strip().lower() in ("1", "true", "yes")
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # Fallback日志目录放在 backend/logs 下
@@ -29,10 +33,11 @@ def _create_fallback_logger(name: str) -> logging.Logger:
 
     logger.setLevel(logging.INFO)
     formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    console_formatter = formatter if LOG_VERBOSE else logging.Formatter(CONSOLE_LOG_FORMAT, DATE_FORMAT)
 
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
 
     FALLBACK_LOG_DIR.mkdir(parents=True, exist_ok=True)
@@ -29,12 +29,10 @@ def migrate_database():
     backup_dir.mkdir(parents=True, exist_ok=True)
 
     if DB_PATH.exists():
-        backup_path = backup_dir / f"costmatrix_backup_{DB_PATH.stat().st_mtime}.db"
-        logger.info(f"备份数据库到: {backup_path}")
-        shutil.copy2(DB_PATH, backup_path)
-
-        logger.info(f"删除旧数据库: {DB_PATH}")
-        DB_PATH.unlink()
+        backup_path = backup_dir / f"costmatrix_backup_{DB_PATH.stat().st_mtime_ns}.db"
+        # 旧库备份后即删除，直接把文件移动到备份目录（同一文件系统内为重命名，不复制数据）
+        logger.info(f"备份数据库到: {backup_path}，并移除旧数据库: {DB_PATH}")
+        shutil.move(DB_PATH, backup_path)
 
     logger.info("初始化新数据库...")
     init_db()
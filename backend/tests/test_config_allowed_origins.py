@@ -3,11 +3,13 @@
 from pathlib import Path
 import sys
 
+import pytest
+
 BACKEND_DIR = Path(__file__).resolve().parents[1]
 if str(BACKEND_DIR) not in sys.path:
     sys.path.insert(0, str(BACKEND_DIR))
 
-from app.config import DEFAULT_ALLOWED_ORIGINS, Settings
+from app.config import DEFAULT_ALLOWED_ORIGINS, Settings, parse_allowed_origins
 
 
 def build_settings(monkeypatch, value):
@@ -19,24 +21,26 @@ def build_settings(monkeypatch, value):
     return Settings(_env_file=None)
 
 
-def test_allowed_origins_supports_csv(monkeypatch):
-    settings = build_settings(monkeypatch, "http://localhost:8180,http://localhost:5173")
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [
+        ("http://localhost:8180,http://localhost:5173", ["http://localhost:8180", "http://localhost:5173"]),
+        ('["http://localhost:8180","http://localhost:5173"]', ["http://localhost:8180", "http://localhost:5173"]),
+        ("   ", DEFAULT_ALLOWED_ORIGINS),
+        (None, DEFAULT_ALLOWED_ORIGINS),
+    ],
+    ids=["csv", "json_array", "blank_falls_back_to_default", "none_falls_back_to_default"],
+)
+def test_parse_allowed_origins(raw, expected):
+    assert parse_allowed_origins(raw) == expected
 
-    assert settings.allowed_origins == ["http://localhost:8180", "http://localhost:5173"]
 
-
-def test_allowed_origins_supports_json_array(monkeypatch):
-    settings = build_settings(monkeypatch, '["http://localhost:8180","http://localhost:5173"]')
+def test_allowed_origins_env_is_parsed_by_settings(monkeypatch):
+    settings = build_settings(monkeypatch, "http://localhost:8180,http://localhost:5173")
 
     assert settings.allowed_origins == ["http://localhost:8180", "http://localhost:5173"]
 
 
-def test_allowed_origins_empty_string_falls_back_to_default(monkeypatch):
-    settings = build_settings(monkeypatch, "   ")
-
-    assert settings.allowed_origins == DEFAULT_ALLOWED_ORIGINS
-
-
 def test_allowed_origins_not_set_falls_back_to_default(monkeypatch):
     settings = build_settings(monkeypatch, None)
 
@@ -0,0 +1,142 @@
+"""Regression tests for ExcelProcessor cleaning and aggregation."""
+
+from pathlib import Path
+import sys
+
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from app.db.crud import _OVER_TYPE_SPLIT_RE
+from app.services.excel_processor import ExcelProcessor
+
+
+def build_processor(tmp_path, sheets):
+    # The source file does not exist, so the on-disk frame cache is bypassed.
+    processor = ExcelProcessor(str(tmp_path / "missing.xlsx"), cache_dir=str(tmp_path / "frames"))
+    processor.sheets_data = sheets
+    return processor
+
+
+def test_train_time_only_values_are_combined_with_departure_date(tmp_path):
+    processor = build_processor(tmp_path, {
+        "火车票": pd.DataFrame({
+            "出发日期": ["2025-01-05", "2025-01-06"],
+            "出发时间": ["08:30", " 22:17 "],
+        }),
+    })
+
+    df = processor.clean_travel_data("火车票")
+
+    assert df["出发日期"].tolist() == [pd.Timestamp("2025-01-05"), pd.Timestamp("2025-01-06")]
+    assert df["出发日期.1"].tolist() == [pd.Timestamp("2025-01-05 08:30"), pd.Timestamp("2025-01-06 22:17")]
+
+
+def test_hotel_time_only_check_in_is_not_parsed_as_today(tmp_path):
+    processor = build_processor(tmp_path, {
+        "酒店": pd.DataFrame({
+            "入住日期": ["2025-02-01"],
+            "入住时间": ["22:17"],
+        }),
+    })
+
+    df = processor.clean_travel_data("酒店")
+
+    assert df["入住日期"].tolist() == [pd.Timestamp("2025-02-01")]
+    assert "入住日期.1" not in df.columns
+
+
+def test_over_standard_counts_split_space_separated_flight_tags(tmp_path):
+    processor = build_processor(tmp_path, {
+        "机票": pd.DataFrame({"超标类型": ["超折扣 超时间", "超折扣", "超时间/超折扣", None, ""]}),
+        "酒店": pd.DataFrame({"是否超标": ["是", "否", None]}),
+    })
+
+    result = processor.count_over_standard_orders()
+
+    assert result["flight"] == 3
+    assert result["hotel"] == 1
+    assert result["train"] == 0
+    assert result["total"] == 4
+    assert result["flight_over_types"] == {"超折扣": 3, "超时间": 2}
+
+
+def test_database_over_type_split_matches_in_memory_counts():
+    # get_flight_over_type_breakdown must split tags the same way as count_over_standard_orders
+    assert _OVER_TYPE_SPLIT_RE.split("超折扣 超时间") == ["超折扣", "超时间"]
+    assert _OVER_TYPE_SPLIT_RE.split("超折扣、超时间") == ["超折扣", "超时间"]
+    assert _OVER_TYPE_SPLIT_RE.split("超s折扣") == ["超s折扣"]
+
+
+def test_summarize_sub_departments_aggregates_each_department(tmp_path):
+    processor = build_processor(tmp_path, {
+        "状态明细": pd.DataFrame({
+            "姓名": ["A", "A", "B", "B", "C", "C", "C"],
+            "一级部门": ["L1"] * 7,
+            "二级部门": ["D1", "D1", "D1", "D1", "D2", "D2", "D2"],
+            "当日状态判断": ["上班", "公休日上班", "出差", None, "上班", "请假", "上班"],
+            "工时": [8.0, 4.0, None, 0.0, 10.0, 0.0, 0.0],
+            "最晚19:30之后": ["符合", "不符合", "", "不符合", "符合", "不符合", "符合"],
+        }),
+    })
+    attendance = processor.clean_attendance_data()
+    dept_costs = {"D1": {"total_cost": 100.0}, "D2": {"total_cost": 300.0}}
+
+    results = processor._summarize_sub_departments(attendance, "二级部门", dept_costs)
+
+    assert results == [
+        {
+            "name": "D2",
+            "person_count": 1,
+            "avg_work_hours": 10.0,
+            "holiday_avg_work_hours": 0.0,
+            "workday_attendance_days": 2,
+            "weekend_work_days": 0,
+            "weekend_attendance_count": 0,
+            "travel_days": 0,
+            "leave_days": 1,
+            "anomaly_days": 0,
+            "late_after_1930_count": 1,
+            "total_cost": 300.0,
+        },
+        {
+            "name": "D1",
+            "person_count": 2,
+            "avg_work_hours": 8.0,
+            "holiday_avg_work_hours": 4.0,
+            "workday_attendance_days": 1,
+            "weekend_work_days": 1,
+            "weekend_attendance_count": 1,
+            "travel_days": 1,
+            "leave_days": 0,
+            "anomaly_days": 1,
+            "late_after_1930_count": 1,
+            "total_cost": 100.0,
+        },
+    ]
+
+
+def test_summarize_sub_departments_without_department_column(tmp_path):
+    processor = build_processor(tmp_path, {
+        "状态明细": pd.DataFrame({"姓名": ["A"], "当日状态判断": ["上班"]}),
+    })
+
+    assert processor._summarize_sub_departments(processor.clean_attendance_data(), "二级部门", {}) == []
+
+
+def test_cached_frames_are_isolated_between_callers(tmp_path):
+    source = tmp_path / "book.xlsx"
+    source.write_bytes(b"placeholder")
+    cache_dir = str(tmp_path / "frames")
+    original = pd.DataFrame({"工时": [8.0, 9.0]})
+    ExcelProcessor(str(source), cache_dir=cache_dir)._store_cached_frame("状态明细", original)
+    original.loc[0, "工时"] = 99.0
+
+    processor = ExcelProcessor(str(source), cache_dir=cache_dir)
+    first = processor._load_cached_frame("状态明细")
+    first.loc[1, "工时"] = -1.0
+
+    assert first["工时"].tolist() == [8.0, -1.0]
+    assert processor._load_cached_frame("状态明细")["工时"].tolist() == [8.0, 9.0]
@@ -3,6 +3,8 @@
 存储项目全局配置参数
 """
 
+import os
+import tempfile
 from typing import Dict, List
 
 
@@ -29,6 +31,13 @@ class Config:
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
     ALLOWED_EXTENSIONS = [".xlsx"]
     
+    # 磁盘缓存配置（清洗结果、分析结果，按上传文件内容摘要命名）
+    # 目录默认位于系统临时目录，可通过环境变量 COSTMATRIX_CACHE_DIR 指定；超期或超出容量的文件自动清理
+    CACHE_DIR = os.environ.get("COSTMATRIX_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "costmatrix-cache")
+    CACHE_MAX_AGE_DAYS = int(os.environ.get("COSTMATRIX_CACHE_MAX_AGE_DAYS", "7"))
+    SHEETS_CACHE_MAX_SIZE_MB = int(os.environ.get("COSTMATRIX_SHEETS_CACHE_MAX_SIZE_MB", "1024"))
+    DASHBOARD_CACHE_MAX_ENTRIES = int(os.environ.get("COSTMATRIX_DASHBOARD_CACHE_MAX_ENTRIES", "500"))
+    
     # Excel Sheet 名称配置
     SHEET_NAMES = {
         "attendance": "状态明细",
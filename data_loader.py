@@ -3,31 +3,110 @@
 负责从 Excel 读取数据并进行预处理
 """
 
+import io
+import os
+import logging
 import pandas as pd
 import re
-from typing import Dict, Tuple
+import time
+from typing import Dict, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
+from config import config
 from logger_config import get_logger
 
+# Excel 读取引擎：安装了 python-calamine 时用其 Rust 解析器，否则沿用 pandas 默认引擎（openpyxl）
+try:
+    import python_calamine  # noqa: F401
+    _EXCEL_ENGINE: Optional[str] = "calamine"
+except ImportError:
+    _EXCEL_ENGINE = None
+# 清洗结果磁盘缓存目录（按上传文件内容摘要命名），位于源码目录之外，见 Config.CACHE_DIR
+SHEETS_CACHE_DIR = Path(config.CACHE_DIR) / "sheets"
+# 金额中需去除的货币符号、千分位逗号和空白
+_AMOUNT_RE = re.compile(r'[¥,\s]')
+# 项目字段开头的项目代码
+_PROJECT_RE = re.compile(r'^(\d+)')
+# 金额、项目列做字符串清洗时使用的类型：安装了 pyarrow 时用 Arrow 承载，
+# str.replace / str.extract 交由 pyarrow.compute 的 C++ 内核执行
+# （向量化清洗传入 _AMOUNT_RE.pattern 等模式字符串，传入已编译对象会退回逐值处理）
+try:
+    import pyarrow  # noqa: F401
+    _STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    _STRING_DTYPE = pd.StringDtype()
+
+
+def prune_cache_dir(cache_dir: Path, pattern: str, max_age_days: int,
+                    max_bytes: Optional[int] = None, max_entries: Optional[int] = None) -> None:
+    """
+    清理磁盘缓存目录：先删除超期文件，再按修改时间从旧到新删除，
+    直到总大小不超过 max_bytes、文件数不超过 max_entries
+    
+    Args:
+        cache_dir: 缓存目录
+        pattern: 缓存文件的 glob 模式
+        max_age_days: 保留天数
+        max_bytes: 总大小上限，None 表示不限制
+        max_entries: 文件数上限，None 表示不限制
+    """
+    now = time.time()
+    entries = []
+    for cache_path in cache_dir.glob(pattern):
+        try:
+            stat = cache_path.stat()
+        except OSError:
+            continue
+        if now - stat.st_mtime > max_age_days * 86400:
+            cache_path.unlink(missing_ok=True)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, cache_path))
+    entries.sort(key=lambda entry: entry[0])
+    total = sum(size for _, size, _ in entries)
+    count = len(entries)
+    for _, size, cache_path in entries:
+        if (max_bytes is None or total <= max_bytes) and (max_entries is None or count <= max_entries):
+            break
+        cache_path.unlink(missing_ok=True)
+        total -= size
+        count -= 1
+
 
 class DataLoader:
     """Excel 数据加载器"""
     
-    def __init__(self, file_path: str):
+    # 数据键 -> Sheet 名称
+    SHEET_NAMES = {
+        "attendance": "状态明细",
+        "flight": "机票",
+        "hotel": "酒店",
+        "train": "火车票",
+    }
+    # 清洗结果结构版本，清洗逻辑新增/调整列时递增，使旧的磁盘缓存失效
+    SHEETS_CACHE_VERSION = 1
+    
+    def __init__(self, file_path: Union[str, bytes], cache_key: Optional[str] = None):
         """
         初始化数据加载器
         
         Args:
-            file_path: Excel 文件路径
+            file_path: Excel 文件路径，或已读入内存的文件内容（bytes，无需落盘）
+            cache_key: 文件内容摘要；提供时清洗结果写入磁盘缓存，
+                同一内容再次上传时直接读取缓存，不再解析 Excel
         """
         self.file_path = file_path
+        self.cache_key = cache_key
         self.attendance_df = None
         self.flight_df = None
         self.hotel_df = None
         self.train_df = None
         self.logger = get_logger("data_loader")
         
-        self.logger.info(f"初始化数据加载器，文件路径: {file_path}")
+        if isinstance(file_path, (bytes, bytearray)):
+            self.logger.info(f"初始化数据加载器，内存文件大小: {len(file_path)} bytes")
+        else:
+            self.logger.info(f"初始化数据加载器，文件路径: {file_path}")
     
     def load_all_sheets(self) -> Dict[str, pd.DataFrame]:
         """
@@ -37,55 +116,117 @@ class DataLoader:
             包含所有 DataFrame 的字典
         """
         try:
-            self.logger.info("开始加载所有工作表")
+            cached_sheets = self._load_cached_sheets()
+            if cached_sheets is not None:
+                self.attendance_df = cached_sheets["attendance"]
+                self.flight_df = cached_sheets["flight"]
+                self.hotel_df = cached_sheets["hotel"]
+                self.train_df = cached_sheets["train"]
+                return cached_sheets
             
-            # 读取考勤数据
-            self.logger.debug("正在读取考勤数据（状态明细）")
-            self.attendance_df = pd.read_excel(
-                self.file_path, 
-                sheet_name="状态明细"
-            )
-            self.logger.info(f"考勤数据加载完成，行数: {len(self.attendance_df)}, 列数: {len(self.attendance_df.columns)}")
-            self._clean_attendance_data()
+            self.logger.info(f"开始加载所有工作表（引擎: {_EXCEL_ENGINE or 'pandas 默认'}）")
             
-            # 读取差旅数据
-            self.logger.debug("正在读取机票数据")
-            self.flight_df = pd.read_excel(
-                self.file_path, 
-                sheet_name="机票"
-            )
-            self.logger.info(f"机票数据加载完成，行数: {len(self.flight_df)}, 列数: {len(self.flight_df.columns)}")
-            self._clean_travel_data(self.flight_df, "出发日期")
+            sheet_names = list(self.SHEET_NAMES.values())
+            if _EXCEL_ENGINE is None:
+                # openpyxl 引擎下四个 Sheet 并发读取，每个线程各自打开 ExcelFile（ExcelFile 不可跨线程共享）
+                with ThreadPoolExecutor(max_workers=len(sheet_names)) as executor:
+                    frames = dict(zip(sheet_names, executor.map(self._read_sheet, sheet_names)))
+            else:
+                # calamine 顺序解析已足够快，只打开一次工作簿
+                with pd.ExcelFile(self._excel_source(), engine=_EXCEL_ENGINE) as excel_file:
+                    frames = excel_file.parse(sheet_name=sheet_names)
             
-            self.logger.debug("正在读取酒店数据")
-            self.hotel_df = pd.read_excel(
-                self.file_path, 
-                sheet_name="酒店"
-            )
-            self.logger.info(f"酒店数据加载完成，行数: {len(self.hotel_df)}, 列数: {len(self.hotel_df.columns)}")
-            self._clean_travel_data(self.hotel_df, "入住日期")
+            self.attendance_df = frames[self.SHEET_NAMES["attendance"]]
+            self.flight_df = frames[self.SHEET_NAMES["flight"]]
+            self.hotel_df = frames[self.SHEET_NAMES["hotel"]]
+            self.train_df = frames[self.SHEET_NAMES["train"]]
+            for sheet_name, df in frames.items():
+                self.logger.info(f"{sheet_name}数据加载完成，行数: {len(df)}, 列数: {len(df.columns)}")
             
-            self.logger.debug("正在读取火车票数据")
-            self.train_df = pd.read_excel(
-                self.file_path, 
-                sheet_name="火车票"
-            )
-            self.logger.info(f"火车票数据加载完成，行数: {len(self.train_df)}, 列数: {len(self.train_df.columns)}")
+            self._clean_attendance_data()
+            self._clean_travel_data(self.flight_df, "出发日期")
+            self._clean_travel_data(self.hotel_df, "入住日期")
             self._clean_travel_data(self.train_df, "出发日期")
             
             self.logger.info("所有工作表加载并清洗完成")
             
-            return {
+            sheets = {
                 "attendance": self.attendance_df,
                 "flight": self.flight_df,
                 "hotel": self.hotel_df,
                 "train": self.train_df
             }
+            self._store_cached_sheets(sheets)
+            return sheets
         
         except Exception as e:
             self.logger.error(f"数据加载失败: {str(e)}", exc_info=True)
             raise ValueError(f"数据加载失败: {str(e)}")
     
+    def _sheets_cache_path(self) -> Optional[Path]:
+        """清洗结果缓存文件路径，未提供 cache_key 时不缓存"""
+        if not self.cache_key:
+            return None
+        return SHEETS_CACHE_DIR / f"{self.cache_key}-v{self.SHEETS_CACHE_VERSION}.pkl"
+    
+    def _load_cached_sheets(self) -> Optional[Dict[str, pd.DataFrame]]:
+        """读取磁盘缓存的清洗结果，未命中或读取失败时返回 None"""
+        cache_path = self._sheets_cache_path()
+        if cache_path is None or not cache_path.exists():
+            return None
+        try:
+            sheets = pd.read_pickle(cache_path)
+            # 刷新修改时间，容量淘汰时按最近使用排序
+            os.utime(cache_path)
+            self.logger.info(f"命中清洗结果磁盘缓存: {cache_path.name}")
+            return sheets
+        except Exception as e:
+            self.logger.warning(f"读取清洗结果缓存失败，将重新解析: {e}")
+            return None
+    
+    def _store_cached_sheets(self, sheets: Dict[str, pd.DataFrame]) -> None:
+        """写入清洗结果磁盘缓存，失败仅记录日志，不影响主流程"""
+        cache_path = self._sheets_cache_path()
+        if cache_path is None:
+            return
+        temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            pd.to_pickle(sheets, temp_path)
+            temp_path.replace(cache_path)
+            prune_cache_dir(
+                SHEETS_CACHE_DIR, "*.pkl", config.CACHE_MAX_AGE_DAYS,
+                max_bytes=config.SHEETS_CACHE_MAX_SIZE_MB * 1024 * 1024
+            )
+        except Exception as e:
+            self.logger.warning(f"写入清洗结果缓存失败: {e}")
+            if temp_path.exists():
+                temp_path.unlink()
+    
+    def _read_sheet(self, sheet_name: str) -> pd.DataFrame:
+        """
+        读取单个 Sheet
+        
+        Args:
+            sheet_name: Sheet 名称
+            
+        Returns:
+            Sheet 原始数据
+        """
+        self.logger.debug("正在读取%s数据", sheet_name)
+        with pd.ExcelFile(self._excel_source(), engine=_EXCEL_ENGINE) as excel_file:
+            return excel_file.parse(sheet_name=sheet_name)
+    
+    def _excel_source(self):
+        """
+        返回可交给 pd.ExcelFile 的数据源
+        
+        内存文件每次包装为新的 BytesIO，并发读取时各线程的读取位置互不干扰
+        """
+        if isinstance(self.file_path, (bytes, bytearray)):
+            return io.BytesIO(self.file_path)
+        return self.file_path
+    
     def _clean_attendance_data(self):
         """清洗考勤数据"""
         if self.attendance_df is None:
@@ -95,10 +236,7 @@ class DataLoader:
         self.logger.debug("开始清洗考勤数据")
         
         # 转换日期格式
-        self.attendance_df['日期'] = pd.to_datetime(
-            self.attendance_df['日期'], 
-            errors='coerce'
-        )
+        self.attendance_df['日期'] = self._to_datetime(self.attendance_df['日期'])
         invalid_dates = self.attendance_df['日期'].isna().sum()
         if invalid_dates > 0:
             self.logger.warning(f"发现 {invalid_dates} 条无效日期记录")
@@ -114,9 +252,11 @@ class DataLoader:
                 self.logger.warning(f"发现 {invalid_hours} 条无效或空工时记录")
         
         # 填充空值
-        self.attendance_df['姓名'] = self.attendance_df['姓名'].fillna('未知')
-        self.attendance_df['一级部门'] = self.attendance_df['一级部门'].fillna('未知')
-        self.attendance_df['当日状态判断'] = self.attendance_df['当日状态判断'].fillna('未知')
+        self.attendance_df.fillna({'姓名': '未知', '一级部门': '未知', '当日状态判断': '未知'}, inplace=True)
+        
+        # 姓名、部门、状态重复度高，转为 category 以减少内存并加速分组
+        for col in ('姓名', '一级部门', '当日状态判断'):
+            self.attendance_df[col] = self.attendance_df[col].astype('category')
         
         self.logger.info("考勤数据清洗完成")
     
@@ -136,6 +276,8 @@ class DataLoader:
         self.logger.info(f"开始清洗差旅数据（日期列: {date_column}）- 详细模式")
         self.logger.info(f"=" * 60)
         self.logger.info(f"原始数据行数: {len(df)}")
+        # 示例值、分布等仅用于排查的明细日志，只在 DEBUG 级别生效时才计算
+        debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
         
         # 清洗授信金额
         if '授信金额' in df.columns:
@@ -147,12 +289,13 @@ class DataLoader:
             self.logger.info(f"   - 空值数量: {null_count}")
             
             # 显示前5个原始值示例
-            self.logger.debug(f"   - 原始值示例（前5条）:")
-            for i, val in enumerate(original_values.head(5), 1):
-                self.logger.debug(f"      {i}. {repr(val)} (类型: {type(val).__name__})")
+            if debug_enabled:
+                self.logger.debug("   - 原始值示例（前5条）:")
+                for i, val in enumerate(original_values.head(5), 1):
+                    self.logger.debug("      %d. %r (类型: %s)", i, val, type(val).__name__)
             
-            # 执行清洗
-            df['授信金额'] = df['授信金额'].apply(self._clean_amount)
+            # 执行清洗（向量化）
+            df['授信金额'] = self._clean_amount_series(df['授信金额'])
             
             # 统计清洗结果
             zero_count = (df['授信金额'] == 0).sum()
@@ -169,16 +312,17 @@ class DataLoader:
                 self.logger.warning(f"   ⚠️  发现 {zero_count} 条金额为0的记录（可能是空值或转换失败）")
             
             # 显示清洗后的示例
-            self.logger.debug(f"   - 清洗后值示例（前5条）:")
-            for i, val in enumerate(df['授信金额'].head(5), 1):
-                self.logger.debug(f"      {i}. ¥{val:,.2f}")
+            if debug_enabled:
+                self.logger.debug("   - 清洗后值示例（前5条）:")
+                for i, val in enumerate(df['授信金额'].head(5), 1):
+                    self.logger.debug("      %d. ¥%s", i, f"{val:,.2f}")
         else:
             self.logger.warning(f"   ⚠️  未找到'授信金额'列")
         
         # 转换日期
         if date_column in df.columns:
             self.logger.info(f"📅 处理日期字段: {date_column}")
-            df[date_column] = pd.to_datetime(df[date_column], errors='coerce')
+            df[date_column] = self._to_datetime(df[date_column])
             invalid_dates = df[date_column].isna().sum()
             if invalid_dates > 0:
                 self.logger.warning(f"   发现 {invalid_dates} 条无效日期记录")
@@ -190,12 +334,13 @@ class DataLoader:
             self.logger.info(f"🏷️  开始提取项目代码...")
             
             # 显示原始项目字段示例
-            self.logger.debug(f"   - 原始'项目'字段示例（前5条）:")
-            for i, val in enumerate(df['项目'].head(5), 1):
-                self.logger.debug(f"      {i}. {repr(val)}")
+            if debug_enabled:
+                self.logger.debug("   - 原始'项目'字段示例（前5条）:")
+                for i, val in enumerate(df['项目'].head(5), 1):
+                    self.logger.debug("      %d. %r", i, val)
             
-            # 执行提取
-            df['项目代码'] = df['项目'].apply(self._extract_project_code)
+            # 执行提取（向量化）
+            df['项目代码'] = self._extract_project_code_series(df['项目'])
             
             # 统计提取结果
             unique_projects = df['项目代码'].nunique()
@@ -219,23 +364,21 @@ class DataLoader:
                     for i, val in enumerate(unknown_samples, 1):
                         self.logger.warning(f"      {i}. {repr(val)}")
             
-            # 显示提取的项目代码示例
-            project_code_counts = df['项目代码'].value_counts()
-            self.logger.debug(f"   - 项目代码分布（Top 5）:")
-            for project_code, count in project_code_counts.head(5).items():
-                project_amount = df[df['项目代码'] == project_code]['授信金额'].sum() if '授信金额' in df.columns else 0
-                self.logger.debug(f"      {project_code}: {count}单, ¥{project_amount:,.2f}")
+            # 显示提取的项目代码示例（需逐个项目筛选汇总，仅在 DEBUG 级别计算）
+            if debug_enabled:
+                project_code_counts = df['项目代码'].value_counts()
+                self.logger.debug("   - 项目代码分布（Top 5）:")
+                for project_code, count in project_code_counts.head(5).items():
+                    project_amount = df[df['项目代码'] == project_code]['授信金额'].sum() if '授信金额' in df.columns else 0
+                    self.logger.debug("      %s: %d单, ¥%s", project_code, count, f"{project_amount:,.2f}")
         else:
             self.logger.warning(f"   ⚠️  未找到'项目'列")
         
         # 填充基础字段
-        self.logger.debug(f"🔄 填充空值字段...")
-        if '预订人姓名' in df.columns:
-            df['预订人姓名'] = df['预订人姓名'].fillna('未知')
-        if '差旅人员姓名' in df.columns:
-            df['差旅人员姓名'] = df['差旅人员姓名'].fillna('未知')
-        if '一级部门' in df.columns:
-            df['一级部门'] = df['一级部门'].fillna('未知')
+        self.logger.debug("🔄 填充空值字段...")
+        fill_columns = [col for col in ('预订人姓名', '差旅人员姓名', '一级部门') if col in df.columns]
+        if fill_columns:
+            df.fillna(dict.fromkeys(fill_columns, '未知'), inplace=True)
         
         # 确保提前预定天数为数值
         if '提前预定天数' in df.columns:
@@ -243,77 +386,63 @@ class DataLoader:
                 df['提前预定天数'], 
                 errors='coerce'
             ).fillna(0)
-            avg_advance_days = df['提前预定天数'].mean()
-            self.logger.debug(f"   平均提前预订天数: {avg_advance_days:.2f} 天")
+            if debug_enabled:
+                self.logger.debug("   平均提前预订天数: %.2f 天", df['提前预定天数'].mean())
         
         self.logger.info(f"✅ 差旅数据清洗完成（日期列: {date_column}）")
         self.logger.info(f"=" * 60 + "\n")
     
     @staticmethod
-    def _clean_amount(amount_str) -> float:
+    def _to_datetime(values: pd.Series) -> pd.Series:
         """
-        清洗金额字段，去除货币符号和逗号
+        转换日期列，无法解析的值记为 NaT
+        
+        Excel 中的日期单元格读入时已是 datetime64，直接返回；
+        文本日期大量重复，开启 cache 后每个唯一值只解析一次
+        """
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+        return pd.to_datetime(values, errors='coerce', cache=True)
+    
+    def _clean_amount_series(self, amounts: pd.Series) -> pd.Series:
+        """
+        向量化清洗金额列，去除货币符号、逗号和空白后转为浮点数
         
         Args:
-            amount_str: 原始金额字符串
+            amounts: 原始金额列
             
         Returns:
-            清洗后的浮点数
+            清洗后的浮点数列，空值和转换失败记为 0.0
         """
-        logger = get_logger("data_loader")
-        
-        if pd.isna(amount_str):
-            logger.debug(f"金额清洗: NaN 或 None -> 0.0")
-            return 0.0
-        
-        # 记录原始值
-        original = amount_str
+        # 已是数值列时无需经过字符串处理
+        if pd.api.types.is_numeric_dtype(amounts) and not pd.api.types.is_bool_dtype(amounts):
+            return amounts.astype(float).fillna(0.0)
         
-        # 转为字符串
-        amount_str = str(amount_str)
-        
-        # 去除 ¥ 符号、逗号、空格
-        cleaned = re.sub(r'[¥,\s]', '', amount_str)
+        cleaned = pd.to_numeric(
+            amounts.astype(_STRING_DTYPE).str.replace(_AMOUNT_RE.pattern, '', regex=True),
+            errors='coerce'
+        )
+        failed = cleaned.isna() & amounts.notna()
+        failed_count = failed.sum()
+        if failed_count > 0:
+            samples = [repr(val) for val in amounts[failed].head(5)]
+            self.logger.warning(f"⚠️  {failed_count} 条金额转换失败，已记为 0.0，示例: {', '.join(samples)}")
         
-        try:
-            result = float(cleaned)
-            if result == 0.0:
-                logger.debug(f"金额清洗: {repr(original)} -> {result}")
-            return result
-        except ValueError:
-            logger.warning(f"⚠️  金额转换失败: {repr(original)} -> 清洗后: {repr(cleaned)} -> 返回 0.0")
-            return 0.0
+        return cleaned.fillna(0.0)
     
     @staticmethod
-    def _extract_project_code(project_str) -> str:
+    def _extract_project_code_series(projects: pd.Series) -> pd.Series:
         """
-        从项目字段提取项目代码
-        格式: "05010013 市场-整星..." -> "05010013"
+        向量化提取项目代码，取去除首尾空白后开头的连续数字
         
         Args:
-            project_str: 原始项目字符串
+            projects: 原始项目列
             
         Returns:
-            项目代码
+            项目代码列，空值或不以数字开头时为 '未知'
         """
-        logger = get_logger("data_loader")
-        
-        if pd.isna(project_str):
-            logger.debug(f"项目代码提取: NaN 或 None -> '未知'")
-            return "未知"
-        
-        original = project_str
-        project_str = str(project_str).strip()
-        
-        # 提取空格前的数字
-        match = re.match(r'^(\d+)', project_str)
-        if match:
-            code = match.group(1)
-            logger.debug(f"项目代码提取成功: {repr(original)} -> {code}")
-            return code
-        
-        logger.warning(f"⚠️  项目代码提取失败: {repr(original)} -> '未知' (不符合格式: 以数字开头)")
-        return "未知"
+        codes = projects.astype(_STRING_DTYPE).str.strip().str.extract(_PROJECT_RE.pattern, expand=False)
+        return codes.fillna('未知').astype(object)
     
     def get_merged_travel_data(self) -> pd.DataFrame:
         """
@@ -324,29 +453,19 @@ class DataLoader:
         """
         travel_dfs = []
         
-        # 机票数据
-        if self.flight_df is not None and not self.flight_df.empty:
-            flight_copy = self.flight_df.copy()
-            flight_copy['差旅类型'] = '机票'
-            if '出发日期' in flight_copy.columns:
-                flight_copy['消费日期'] = flight_copy['出发日期']
-            travel_dfs.append(flight_copy)
-        
-        # 酒店数据
-        if self.hotel_df is not None and not self.hotel_df.empty:
-            hotel_copy = self.hotel_df.copy()
-            hotel_copy['差旅类型'] = '酒店'
-            if '入住日期' in hotel_copy.columns:
-                hotel_copy['消费日期'] = hotel_copy['入住日期']
-            travel_dfs.append(hotel_copy)
-        
-        # 火车票数据
-        if self.train_df is not None and not self.train_df.empty:
-            train_copy = self.train_df.copy()
-            train_copy['差旅类型'] = '火车票'
-            if '出发日期' in train_copy.columns:
-                train_copy['消费日期'] = train_copy['出发日期']
-            travel_dfs.append(train_copy)
+        for df, travel_type, date_column in (
+            (self.flight_df, '机票', '出发日期'),
+            (self.hotel_df, '酒店', '入住日期'),
+            (self.train_df, '火车票', '出发日期'),
+        ):
+            if df is None or df.empty:
+                continue
+            # 浅拷贝后只新增列，原有列数据不复制，最终由 concat 统一拷贝一次
+            travel_copy = df.copy(deep=False)
+            travel_copy['差旅类型'] = travel_type
+            # 日期列直接改名为消费日期（仅修改列标签），合并结果中不再保留原日期列
+            travel_copy.rename(columns={date_column: '消费日期'}, inplace=True)
+            travel_dfs.append(travel_copy)
         
         if not travel_dfs:
             return pd.DataFrame()
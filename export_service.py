@@ -5,10 +5,10 @@ Excel 导出服务模块
 """
 
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils.dataframe import dataframe_to_rows
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 from io import BytesIO
 import os
 from logger_config import get_logger
@@ -17,24 +17,30 @@ from logger_config import get_logger
 class ExcelExporter:
     """Excel 导出服务"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: Union[str, bytes]):
         """
         初始化导出服务
         
         Args:
-            file_path: 原始 Excel 文件路径
+            file_path: 原始 Excel 文件路径，或已读入内存的文件内容（bytes）
         """
         self.file_path = file_path
         self.workbook = None
         self.logger = get_logger("export_service")
         
-        self.logger.info(f"初始化Excel导出服务，文件路径: {file_path}")
+        if isinstance(file_path, (bytes, bytearray)):
+            self.logger.info(f"初始化Excel导出服务，内存文件大小: {len(file_path)} bytes")
+        else:
+            self.logger.info(f"初始化Excel导出服务，文件路径: {file_path}")
     
     def load_workbook(self):
         """加载原始 Excel 工作簿"""
         try:
             self.logger.debug("开始加载Excel工作簿")
-            self.workbook = openpyxl.load_workbook(self.file_path)
+            source = self.file_path
+            if isinstance(source, (bytes, bytearray)):
+                source = BytesIO(source)
+            self.workbook = openpyxl.load_workbook(source)
             sheet_count = len(self.workbook.sheetnames)
             self.logger.info(f"Excel工作簿加载成功，共 {sheet_count} 个工作表")
             self.logger.debug(f"工作表列表: {', '.join(self.workbook.sheetnames)}")
@@ -42,6 +48,37 @@ class ExcelExporter:
             self.logger.error(f"无法加载 Excel 文件: {str(e)}", exc_info=True)
             raise ValueError(f"无法加载 Excel 文件: {str(e)}")
     
+    def _register_style(
+        self,
+        name: str,
+        font: Font,
+        alignment: Alignment,
+        border: Border,
+        fill: Optional[PatternFill] = None
+    ) -> str:
+        """
+        在工作簿中登记一个命名样式
+        
+        逐个单元格赋值 font/fill 等属性时，每次都要在样式表中哈希查找样式对象；
+        同一表格的样式只登记一次，写入时按名称引用即可
+        
+        Returns:
+            可赋给单元格 style 的样式名称
+        """
+        # 再次导出已导出过的文件时，工作簿中已有同名样式，直接复用
+        if name not in self.workbook.named_styles:
+            style = NamedStyle(name=name, font=font, alignment=alignment, border=border)
+            if fill is not None:
+                style.fill = fill
+            self.workbook.add_named_style(style)
+        return name
+    
+    @staticmethod
+    def _write_row(ws, row_idx: int, row_data: List, style: str):
+        """写入一行数据，所有单元格使用同一命名样式"""
+        for col_idx, value in enumerate(row_data, start=1):
+            ws.cell(row=row_idx, column=col_idx, value=value).style = style
+    
     def add_dashboard_sheet(self, dashboard_data: Dict):
         """
         添加 Dashboard_Data Sheet
@@ -80,6 +117,15 @@ class ExcelExporter:
             bottom=Side(style='thin')
         )
         
+        content_style = self._register_style('CostMatrix Dashboard Content', content_font, content_alignment, thin_border)
+        header_style = self._register_style(
+            'CostMatrix Dashboard Header',
+            Font(name='微软雅黑', size=11, bold=True),
+            title_alignment,
+            thin_border,
+            PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
+        )
+        
         row_idx = 1
         
         # 1. KPI 汇总
@@ -100,11 +146,7 @@ class ExcelExporter:
         ]
         
         for row_data in kpi_data:
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = content_font
-                cell.alignment = content_alignment
-                cell.border = thin_border
+            self._write_row(ws, row_idx, row_data, content_style)
             row_idx += 1
         
         row_idx += 2
@@ -120,12 +162,7 @@ class ExcelExporter:
         
         # 表头
         project_headers = ['项目代码', '总成本', '机票成本', '酒店成本', '火车票成本', '订单数量']
-        for col_idx, header in enumerate(project_headers, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header)
-            cell.font = Font(name='微软雅黑', size=11, bold=True)
-            cell.fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
-            cell.alignment = title_alignment
-            cell.border = thin_border
+        self._write_row(ws, row_idx, project_headers, header_style)
         row_idx += 1
         
         # 数据行
@@ -139,11 +176,7 @@ class ExcelExporter:
                 project.get('火车票成本', 0),
                 project.get('订单数量', 0)
             ]
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = content_font
-                cell.alignment = content_alignment
-                cell.border = thin_border
+            self._write_row(ws, row_idx, row_data, content_style)
             row_idx += 1
         
         row_idx += 2
@@ -159,12 +192,7 @@ class ExcelExporter:
         
         # 表头
         dept_headers = ['一级部门', '总成本', '总工时', '人员数量', '饱和度(%)', '']
-        for col_idx, header in enumerate(dept_headers, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header)
-            cell.font = Font(name='微软雅黑', size=11, bold=True)
-            cell.fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
-            cell.alignment = title_alignment
-            cell.border = thin_border
+        self._write_row(ws, row_idx, dept_headers, header_style)
         row_idx += 1
         
         # 数据行
@@ -178,11 +206,7 @@ class ExcelExporter:
                 dept.get('饱和度', 0),
                 ''
             ]
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = content_font
-                cell.alignment = content_alignment
-                cell.border = thin_border
+            self._write_row(ws, row_idx, row_data, content_style)
             row_idx += 1
         
         # 调整列宽
@@ -238,14 +262,25 @@ class ExcelExporter:
             bottom=Side(style='thin')
         )
         
+        header_style = self._register_style(
+            'CostMatrix Anomaly Header', header_font, header_alignment, thin_border, header_fill
+        )
+        content_style = self._register_style('CostMatrix Anomaly Content', content_font, content_alignment, thin_border)
+        # 异常类型列按类型设置背景色
+        type_styles = {
+            'Conflict': self._register_style(
+                'CostMatrix Anomaly Conflict', content_font, content_alignment, thin_border,
+                PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
+            ),
+            'NoExpense': self._register_style(
+                'CostMatrix Anomaly NoExpense', content_font, content_alignment, thin_border,
+                PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
+            ),
+        }
+        
         # 表头
         headers = ['异常类型', '姓名', '日期', '考勤状态', '差旅类型', '差旅金额', '一级部门', '描述']
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
+        self._write_row(ws, 1, headers, header_style)
         
         # 数据行
         for row_idx, anomaly in enumerate(anomalies, start=2):
@@ -259,19 +294,11 @@ class ExcelExporter:
                 anomaly.get('一级部门', ''),
                 anomaly.get('描述', '')
             ]
+            self._write_row(ws, row_idx, row_data, content_style)
             
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = content_font
-                cell.alignment = content_alignment
-                cell.border = thin_border
-                
-                # 根据异常类型设置背景色
-                if col_idx == 1:
-                    if anomaly.get('Type') == 'Conflict':
-                        cell.fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-                    elif anomaly.get('Type') == 'NoExpense':
-                        cell.fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
+            type_style = type_styles.get(anomaly.get('Type'))
+            if type_style is not None:
+                ws.cell(row=row_idx, column=1).style = type_style
         
         # 调整列宽
         ws.column_dimensions['A'].width = 12
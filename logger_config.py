@@ -5,9 +5,11 @@
 
 import logging
 import sys
+import atexit
+import queue
 from pathlib import Path
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import os
 
 
@@ -19,6 +21,29 @@ LOG_DIR.mkdir(exist_ok=True)
 LOG_FORMAT = "%(asctime)s - [%(levelname)s] - [%(name)s:%(funcName)s:%(lineno)d] - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# 日志记录器名称 -> 日志文件名，未列出的记录器写入 app.log
+LOG_FILES = {
+    "main": "main.log",
+    "data_loader": "data_loader.log",
+    "analysis_service": "analysis_service.log",
+    "export_service": "export_service.log",
+    "ppt_export_service": "ppt_export_service.log",
+    "excel_processor": "excel_processor.log",
+}
+
+# 日志的后台输出线程，进程退出时统一停止并刷出剩余日志
+_queue_listeners = []
+
+
+def _stop_queue_listeners():
+    """停止所有后台日志线程"""
+    for listener in _queue_listeners:
+        listener.stop()
+    _queue_listeners.clear()
+
+
+atexit.register(_stop_queue_listeners)
+
 
 def setup_logger(
     name: str,
@@ -54,7 +79,7 @@ def setup_logger(
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # 2. 文件处理器（输出到文件，支持自动轮转）
     if log_file:
@@ -67,7 +92,17 @@ def setup_logger(
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # 请求线程只把日志放入队列，由后台线程完成终端输出、磁盘写入和轮转检查
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setLevel(logging.DEBUG)
+    logger.addHandler(queue_handler)
+    
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _queue_listeners.append(listener)
     
     return logger
 
@@ -87,20 +122,7 @@ def get_logger(name: str) -> logging.Logger:
         return logging.getLogger(name)
     
     # 根据模块名称选择日志文件
-    if name == "main":
-        return setup_logger(name, "main.log")
-    elif name == "data_loader":
-        return setup_logger(name, "data_loader.log")
-    elif name == "analysis_service":
-        return setup_logger(name, "analysis_service.log")
-    elif name == "export_service":
-        return setup_logger(name, "export_service.log")
-    elif name == "ppt_export_service":
-        return setup_logger(name, "ppt_export_service.log")
-    elif name == "excel_processor":
-        return setup_logger(name, "excel_processor.log")
-    else:
-        return setup_logger(name, "app.log")
+    return setup_logger(name, LOG_FILES.get(name, "app.log"))
 
 
 # 创建通用应用日志记录器
@@ -3,36 +3,284 @@ FastAPI 主入口
 提供差旅分析 API 服务
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Header
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import tempfile
+import io
 import os
-from typing import Dict
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Tuple, Union
 import traceback
 import time
 import uuid
 from datetime import datetime
+from pathlib import Path
 
-from data_loader import DataLoader
+from config import config
+from data_loader import DataLoader, prune_cache_dir
 from analysis_service import TravelAnalyzer
 from export_service import ExcelExporter
 from logger_config import get_logger, RequestLogger, log_exception, log_performance
 
+# JSON 解析与序列化：安装了 orjson 时用其 C 实现（原生支持 numpy 标量），否则回退标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # 初始化日志系统
 logger = get_logger("main")
 request_logger = RequestLogger(logger)
 
+# 上传文件分块读取（写入临时文件或内存）的大小
+UPLOAD_CHUNK_SIZE = 1 << 20
+# 导出文件按该大小分块发送
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+# 不超过该大小的上传文件直接读入内存处理，不写临时文件
+MEMORY_UPLOAD_MAX_BYTES = 16 * 1024 * 1024
+# 不超过该大小的上传文件写入内存文件系统 /dev/shm（若可用），省去磁盘读写
+SHM_UPLOAD_MAX_BYTES = 64 * 1024 * 1024
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+# 分析结果缓存：上传文件内容摘要 + 分析逻辑版本 -> Dashboard 数据
+# 同一文件先分析再导出时，导出请求可跳过数据加载与分析；同时落盘，服务重启后仍可复用
+_ANALYSIS_CACHE: "OrderedDict[str, Dict]" = OrderedDict()
+_ANALYSIS_CACHE_SIZE = 32
+_ANALYSIS_CACHE_LOCK = threading.Lock()
+DASHBOARD_CACHE_DIR = Path(config.CACHE_DIR) / "dashboard"
+
+
+def _copy_upload(source: BinaryIO, target: BinaryIO) -> str:
+    """
+    将上传文件分块写入目标文件，并计算内容摘要
+    
+    Args:
+        source: 上传文件对象
+        target: 目标文件对象
+        
+    Returns:
+        文件内容的 blake2b 摘要（十六进制）
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    while True:
+        chunk = source.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        target.write(chunk)
+    return digest.hexdigest()
+
+
+def _read_upload(source: BinaryIO) -> Tuple[bytes, str]:
+    """
+    将上传文件分块读入内存，并计算内容摘要
+    
+    Args:
+        source: 上传文件对象
+        
+    Returns:
+        (文件内容, 内容摘要)
+    """
+    buffer = io.BytesIO()
+    file_digest = _copy_upload(source, buffer)
+    return buffer.getvalue(), file_digest
+
+
+def _fits_in_memory(file: UploadFile) -> bool:
+    """上传文件大小已知且不超过 MEMORY_UPLOAD_MAX_BYTES 时可直接在内存中处理"""
+    size = getattr(file, 'size', None)
+    return size is not None and size <= MEMORY_UPLOAD_MAX_BYTES
+
+
+def _upload_temp_dir(file: UploadFile) -> Optional[str]:
+    """
+    选择上传文件的临时目录：大小已知且较小时使用 /dev/shm，否则使用系统默认临时目录
+    
+    Args:
+        file: 上传文件
+        
+    Returns:
+        临时目录路径，None 表示系统默认目录
+    """
+    size = getattr(file, 'size', None)
+    if SHM_DIR and size is not None and size <= SHM_UPLOAD_MAX_BYTES:
+        return SHM_DIR
+    return None
+
+
+def _receive_upload(file: UploadFile) -> Tuple[Union[bytes, str], str]:
+    """
+    接收上传文件：大小已知且较小时读入内存，否则分块写入临时文件，避免大文件整体驻留内存
+    
+    Args:
+        file: 上传文件
+        
+    Returns:
+        (文件内容或临时文件路径, 内容摘要)；返回临时文件路径时由调用方负责删除
+    """
+    if _fits_in_memory(file):
+        return _read_upload(file.file)
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx', dir=_upload_temp_dir(file)) as temp_file:
+        try:
+            file_digest = _copy_upload(file.file, temp_file)
+        except Exception:
+            temp_file.close()
+            os.unlink(temp_file.name)
+            raise
+    return temp_file.name, file_digest
+
+
+def _remove_spooled_upload(request_id: str, source: Union[bytes, str, None]) -> None:
+    """删除 _receive_upload 写入的临时文件（内存中的上传内容无需处理）"""
+    if isinstance(source, str) and os.path.exists(source):
+        try:
+            os.unlink(source)
+            logger.debug("[%s] 临时文件已清理: %s", request_id, source)
+        except Exception as e:
+            logger.error(f"[{request_id}] 清理临时文件失败: {str(e)}")
+
+
+def _describe_upload(source: Union[bytes, str]) -> str:
+    """上传文件的日志描述：内存中的给出大小，落盘的给出临时文件路径"""
+    if isinstance(source, str):
+        return f"已保存到: {source}"
+    return f"已读入内存，大小: {len(source)} bytes"
+
+
+async def _iter_buffer(buffer: io.BytesIO) -> AsyncIterator[bytes]:
+    """
+    按 DOWNLOAD_CHUNK_SIZE 分块输出内存中的导出文件
+    
+    直接把 BytesIO 交给 StreamingResponse 会按换行符逐"行"迭代二进制内容，
+    每个碎片都要经过一次线程池调度和一次发送
+    """
+    view = buffer.getbuffer()
+    try:
+        for start in range(0, len(view), DOWNLOAD_CHUNK_SIZE):
+            yield bytes(view[start:start + DOWNLOAD_CHUNK_SIZE])
+    finally:
+        view.release()
+
+
+def _is_no_cache(header_value: Optional[str]) -> bool:
+    """请求头 X-No-Cache 为 1/true 时跳过分析结果与清洗结果缓存"""
+    return (header_value or "").strip().lower() in ("1", "true", "yes")
+
+
+def _json_default(obj: Any) -> Any:
+    """标准 JSON 不能直接序列化的类型：日期（如 pandas Timestamp）转为 ISO 字符串，numpy 标量转为 Python 数值"""
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _dump_json(content: Any) -> bytes:
+    """序列化为 JSON 字节串，安装了 orjson 时优先使用"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_json_default
+    ).encode("utf-8")
+
+
+def _load_json(raw: bytes) -> Any:
+    """解析 JSON 字节串，安装了 orjson 时优先使用"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _analysis_cache_key(file_digest: str) -> str:
+    """分析结果缓存键：文件内容摘要 + 分析逻辑版本，分析逻辑变更后旧结果自动失效"""
+    return f"{file_digest}-v{TravelAnalyzer.VERSION}"
+
+
+def _get_cached_analysis(file_digest: str) -> Optional[Dict]:
+    """按文件内容摘要获取分析结果，先查进程内缓存，再查磁盘缓存"""
+    cache_key = _analysis_cache_key(file_digest)
+    with _ANALYSIS_CACHE_LOCK:
+        dashboard_data = _ANALYSIS_CACHE.get(cache_key)
+        if dashboard_data is not None:
+            _ANALYSIS_CACHE.move_to_end(cache_key)
+            return dashboard_data
+    
+    cache_path = DASHBOARD_CACHE_DIR / f"{cache_key}.json"
+    if not cache_path.exists():
+        return None
+    try:
+        dashboard_data = _load_json(cache_path.read_bytes())
+        # 刷新修改时间，按数量淘汰时保留最近使用的结果
+        os.utime(cache_path)
+    except Exception as e:
+        logger.warning(f"读取分析结果缓存失败，将重新分析: {e}")
+        return None
+    _remember_analysis(cache_key, dashboard_data)
+    return dashboard_data
+
+
+def _remember_analysis(cache_key: str, dashboard_data: Dict) -> None:
+    """放入进程内缓存，超出容量时淘汰最久未使用的条目"""
+    with _ANALYSIS_CACHE_LOCK:
+        _ANALYSIS_CACHE[cache_key] = dashboard_data
+        _ANALYSIS_CACHE.move_to_end(cache_key)
+        while len(_ANALYSIS_CACHE) > _ANALYSIS_CACHE_SIZE:
+            _ANALYSIS_CACHE.popitem(last=False)
+
+
+def _store_cached_analysis(file_digest: str, dashboard_data: Dict) -> None:
+    """缓存分析结果（进程内 + 磁盘），写盘失败仅记录日志，不影响主流程"""
+    cache_key = _analysis_cache_key(file_digest)
+    _remember_analysis(cache_key, dashboard_data)
+    cache_path = DASHBOARD_CACHE_DIR / f"{cache_key}.json"
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        DASHBOARD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        temp_path.write_bytes(_dump_json(dashboard_data))
+        temp_path.replace(cache_path)
+        prune_cache_dir(
+            DASHBOARD_CACHE_DIR, "*.json", config.CACHE_MAX_AGE_DAYS,
+            max_entries=config.DASHBOARD_CACHE_MAX_ENTRIES
+        )
+    except Exception as e:
+        logger.warning(f"写入分析结果缓存失败: {e}")
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+class FastJSONResponse(JSONResponse):
+    """优先使用 orjson 序列化的 JSONResponse"""
+    
+    def render(self, content: Any) -> bytes:
+        return _dump_json(content)
+
+
 logger.info("=" * 80)
 logger.info("系统启动中...")
 logger.info("=" * 80)
 
+
 # 创建 FastAPI 应用
 app = FastAPI(
     title="CostMatrix - 企业差旅分析平台",
     description="基于 Excel 数据的差旅成本分析与异常检测 API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 logger.info("FastAPI 应用已创建")
@@ -75,7 +323,10 @@ async def health_check():
 
 
 @app.post("/api/analyze")
-async def analyze_travel_data(file: UploadFile = File(...)) -> Dict:
+async def analyze_travel_data(
+    file: UploadFile = File(...),
+    x_no_cache: Optional[str] = Header(None)
+) -> Dict:
     """
     分析差旅数据
     
@@ -103,48 +354,56 @@ async def analyze_travel_data(file: UploadFile = File(...)) -> Dict:
             detail="只支持 .xlsx 格式的 Excel 文件"
         )
     
-    temp_file = None
-    temp_file_path = None
+    source = None
     
     try:
-        # 保存上传文件到临时目录
-        logger.debug(f"[{request_id}] 开始保存上传文件到临时目录")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        logger.info(f"[{request_id}] 文件已保存到: {temp_file_path}, 大小: {len(content)} bytes")
+        # 小文件读入内存直接交给 DataLoader 解析，大文件分块写入临时文件；同时计算内容摘要
+        logger.debug("[%s] 开始读取上传文件", request_id)
+        source, file_digest = await run_in_threadpool(_receive_upload, file)
+        logger.info(f"[{request_id}] 文件{_describe_upload(source)}")
         
-        # 加载数据
-        logger.debug(f"[{request_id}] 开始加载Excel数据")
-        load_start = time.time()
-        loader = DataLoader(temp_file_path)
-        data_sheets = loader.load_all_sheets()
-        load_duration = (time.time() - load_start) * 1000
-        logger.info(f"[{request_id}] 数据加载完成，耗时: {load_duration:.2f}ms")
-        log_performance(logger, f"[{request_id}] 数据加载", load_duration)
-        
-        # 记录加载的数据统计
-        logger.info(f"[{request_id}] 考勤数据行数: {len(data_sheets['attendance'])}")
-        logger.info(f"[{request_id}] 机票数据行数: {len(data_sheets['flight'])}")
-        logger.info(f"[{request_id}] 酒店数据行数: {len(data_sheets['hotel'])}")
-        logger.info(f"[{request_id}] 火车票数据行数: {len(data_sheets['train'])}")
-        
-        # 执行分析
-        logger.debug(f"[{request_id}] 开始执行数据分析")
-        analysis_start = time.time()
-        analyzer = TravelAnalyzer(
-            attendance_df=data_sheets['attendance'],
-            flight_df=data_sheets['flight'],
-            hotel_df=data_sheets['hotel'],
-            train_df=data_sheets['train']
-        )
+        no_cache = _is_no_cache(x_no_cache)
+        dashboard_data = None if no_cache else _get_cached_analysis(file_digest)
+        if dashboard_data is not None:
+            logger.info(f"[{request_id}] 命中分析缓存，跳过数据加载与分析")
+        else:
+            # 加载数据
+            logger.debug("[%s] 开始加载Excel数据", request_id)
+            load_start = time.time()
+            loader = DataLoader(source, cache_key=None if no_cache else file_digest)
+            data_sheets = await run_in_threadpool(loader.load_all_sheets)
+            load_duration = (time.time() - load_start) * 1000
+            logger.info(f"[{request_id}] 数据加载完成，耗时: {load_duration:.2f}ms")
+            log_performance(logger, f"[{request_id}] 数据加载", load_duration)
+        
+            # 记录加载的数据统计
+            logger.info(
+                "[%s] 数据行数: 考勤=%d, 机票=%d, 酒店=%d, 火车票=%d",
+                request_id,
+                len(data_sheets['attendance']),
+                len(data_sheets['flight']),
+                len(data_sheets['hotel']),
+                len(data_sheets['train'])
+            )
+        
+            # 执行分析
+            logger.debug("[%s] 开始执行数据分析", request_id)
+            analysis_start = time.time()
+            analyzer = await run_in_threadpool(
+                TravelAnalyzer,
+                attendance_df=data_sheets['attendance'],
+                flight_df=data_sheets['flight'],
+                hotel_df=data_sheets['hotel'],
+                train_df=data_sheets['train']
+            )
         
-        # 生成 Dashboard 数据
-        dashboard_data = analyzer.generate_dashboard_data()
-        analysis_duration = (time.time() - analysis_start) * 1000
-        logger.info(f"[{request_id}] 数据分析完成，耗时: {analysis_duration:.2f}ms")
-        log_performance(logger, f"[{request_id}] 数据分析", analysis_duration)
+            # 生成 Dashboard 数据
+            dashboard_data = await run_in_threadpool(analyzer.generate_dashboard_data)
+            analysis_duration = (time.time() - analysis_start) * 1000
+            logger.info(f"[{request_id}] 数据分析完成，耗时: {analysis_duration:.2f}ms")
+            log_performance(logger, f"[{request_id}] 数据分析", analysis_duration)
+            
+            _store_cached_analysis(file_digest, dashboard_data)
         
         # 记录分析结果摘要
         kpi = dashboard_data.get('kpi', {})
@@ -157,7 +416,7 @@ async def analyze_travel_data(file: UploadFile = File(...)) -> Dict:
         total_duration = (time.time() - start_time) * 1000
         request_logger.log_request_success(request_id, total_duration, "数据分析成功")
         
-        return JSONResponse(
+        return FastJSONResponse(
             content={
                 "success": True,
                 "data": dashboard_data,
@@ -182,16 +441,14 @@ async def analyze_travel_data(file: UploadFile = File(...)) -> Dict:
     
     finally:
         # 清理临时文件
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.debug(f"[{request_id}] 临时文件已清理: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"[{request_id}] 清理临时文件失败: {str(e)}")
+        _remove_spooled_upload(request_id, source)
 
 
 @app.post("/api/export")
-async def export_with_analysis(file: UploadFile = File(...)):
+async def export_with_analysis(
+    file: UploadFile = File(...),
+    x_no_cache: Optional[str] = Header(None)
+):
     """
     导出带分析结果的 Excel 文件
     
@@ -219,48 +476,54 @@ async def export_with_analysis(file: UploadFile = File(...)):
             detail="只支持 .xlsx 格式的 Excel 文件"
         )
     
-    temp_file = None
-    temp_file_path = None
+    source = None
     
     try:
-        # 保存上传文件到临时目录
-        logger.debug(f"[{request_id}] 开始保存上传文件到临时目录")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        logger.info(f"[{request_id}] 文件已保存到: {temp_file_path}")
+        # 小文件直接读入内存，数据加载与导出都从内存读取；大文件分块写入临时文件
+        logger.debug("[%s] 开始读取上传文件", request_id)
+        source, file_digest = await run_in_threadpool(_receive_upload, file)
+        logger.info(f"[{request_id}] 文件{_describe_upload(source)}")
         
-        # 加载数据
-        logger.debug(f"[{request_id}] 开始加载Excel数据")
-        load_start = time.time()
-        loader = DataLoader(temp_file_path)
-        data_sheets = loader.load_all_sheets()
-        load_duration = (time.time() - load_start) * 1000
-        logger.info(f"[{request_id}] 数据加载完成，耗时: {load_duration:.2f}ms")
-        
-        # 执行分析
-        logger.debug(f"[{request_id}] 开始执行数据分析")
-        analysis_start = time.time()
-        analyzer = TravelAnalyzer(
-            attendance_df=data_sheets['attendance'],
-            flight_df=data_sheets['flight'],
-            hotel_df=data_sheets['hotel'],
-            train_df=data_sheets['train']
-        )
+        # 按上传文件内容摘要查找 /api/analyze 缓存的分析结果，命中时跳过数据加载与分析
+        no_cache = _is_no_cache(x_no_cache)
+        dashboard_data = None if no_cache else _get_cached_analysis(file_digest)
+        if dashboard_data is not None:
+            logger.info(f"[{request_id}] 命中分析缓存，跳过数据加载与分析")
+        else:
+            # 加载数据
+            logger.debug("[%s] 开始加载Excel数据", request_id)
+            load_start = time.time()
+            loader = DataLoader(source, cache_key=None if no_cache else file_digest)
+            data_sheets = await run_in_threadpool(loader.load_all_sheets)
+            load_duration = (time.time() - load_start) * 1000
+            logger.info(f"[{request_id}] 数据加载完成，耗时: {load_duration:.2f}ms")
+        
+            # 执行分析
+            logger.debug("[%s] 开始执行数据分析", request_id)
+            analysis_start = time.time()
+            analyzer = await run_in_threadpool(
+                TravelAnalyzer,
+                attendance_df=data_sheets['attendance'],
+                flight_df=data_sheets['flight'],
+                hotel_df=data_sheets['hotel'],
+                train_df=data_sheets['train']
+            )
+        
+            # 生成分析数据
+            dashboard_data = await run_in_threadpool(analyzer.generate_dashboard_data)
+            analysis_duration = (time.time() - analysis_start) * 1000
+            logger.info(f"[{request_id}] 数据分析完成，耗时: {analysis_duration:.2f}ms")
+            
+            _store_cached_analysis(file_digest, dashboard_data)
         
-        # 生成分析数据
-        dashboard_data = analyzer.generate_dashboard_data()
         anomalies = dashboard_data.get('anomalies', [])
-        analysis_duration = (time.time() - analysis_start) * 1000
-        logger.info(f"[{request_id}] 数据分析完成，耗时: {analysis_duration:.2f}ms, "
-                   f"发现异常数: {len(anomalies)}")
+        logger.info(f"[{request_id}] 发现异常数: {len(anomalies)}")
         
         # 导出 Excel
-        logger.debug(f"[{request_id}] 开始生成Excel导出文件")
+        logger.debug("[%s] 开始生成Excel导出文件", request_id)
         export_start = time.time()
-        exporter = ExcelExporter(temp_file_path)
-        output_stream = exporter.export_with_analysis(dashboard_data, anomalies)
+        exporter = ExcelExporter(source)
+        output_stream = await run_in_threadpool(exporter.export_with_analysis, dashboard_data, anomalies)
         export_duration = (time.time() - export_start) * 1000
         logger.info(f"[{request_id}] Excel导出完成，耗时: {export_duration:.2f}ms")
         log_performance(logger, f"[{request_id}] Excel导出", export_duration)
@@ -276,10 +539,11 @@ async def export_with_analysis(file: UploadFile = File(...)):
         
         # 返回文件流
         return StreamingResponse(
-            output_stream,
+            _iter_buffer(output_stream),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
-                "Content-Disposition": f"attachment; filename={output_filename}"
+                "Content-Disposition": f"attachment; filename={output_filename}",
+                "Content-Length": str(output_stream.getbuffer().nbytes)
             }
         )
     
@@ -298,12 +562,7 @@ async def export_with_analysis(file: UploadFile = File(...)):
     
     finally:
         # 清理临时文件
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.debug(f"[{request_id}] 临时文件已清理: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"[{request_id}] 清理临时文件失败: {str(e)}")
+        _remove_spooled_upload(request_id, source)
 
 
 @app.post("/api/export-ppt")
@@ -336,20 +595,20 @@ async def export_ppt(request: Request):
 
     try:
         # 解析请求体
-        logger.debug(f"[{request_id}] 开始解析请求体")
-        body = await request.json()
+        logger.debug("[%s] 开始解析请求体", request_id)
+        body = _load_json(await request.body())
         dashboard_data = body.get('dashboard_data', {})
         charts = body.get('charts', [])
 
         logger.info(f"[{request_id}] 接收到 {len(charts)} 个前端图表（将优先使用数据驱动的内置图表）")
 
         # 创建 PPT 导出器
-        logger.debug(f"[{request_id}] 开始创建 PPT")
+        logger.debug("[%s] 开始创建 PPT", request_id)
         ppt_start = time.time()
         exporter = PPTExporter()
 
         # 1. 创建 KPI 指标页
-        logger.debug(f"[{request_id}] 创建 KPI 指标页")
+        logger.debug("[%s] 创建 KPI 指标页", request_id)
         kpi_data = {
             'total_cost': dashboard_data.get('kpi', {}).get('total_cost', 0),
             'total_orders': dashboard_data.get('kpi', {}).get('total_orders', 0),
@@ -362,27 +621,27 @@ async def export_ppt(request: Request):
         # 2. 创建数据驱动的图表页
         dept_stats = dashboard_data.get('department_metrics', [])
         if dept_stats:
-            logger.debug(f"[{request_id}] 创建部门成本分布图表")
+            logger.debug("[%s] 创建部门成本分布图表", request_id)
             exporter.create_department_cost_chart(dept_stats)
 
         projects = dashboard_data.get('top_projects', [])
         if projects:
-            logger.debug(f"[{request_id}] 创建项目成本排名图表，共 {len(projects)} 条")
+            logger.debug("[%s] 创建项目成本排名图表，共 %d 条", request_id, len(projects))
             exporter.create_project_cost_chart(projects)
 
         over_stats = dashboard_data.get('over_standard_breakdown', {})
         if over_stats or kpi_data.get('total_orders'):
-            logger.debug(f"[{request_id}] 创建超标订单占比图表")
+            logger.debug("[%s] 创建超标订单占比图表", request_id)
             exporter.create_over_standard_chart(over_stats, kpi_data.get('total_orders', 0))
 
         booking_behavior = dashboard_data.get('booking_behavior', {})
         if booking_behavior:
-            logger.debug(f"[{request_id}] 创建预订行为占比图表")
+            logger.debug("[%s] 创建预订行为占比图表", request_id)
             exporter.create_booking_behavior_chart(booking_behavior)
 
         # 3. 如果有前端截图图表，作为补充附加到 PPT（兼容旧流程）
         for i, chart in enumerate(charts):
-            logger.debug(f"[{request_id}] 附加前端图表页 {i+1}/{len(charts)}: {chart.get('title', '')}")
+            logger.debug("[%s] 附加前端图表页 %d/%d: %s", request_id, i + 1, len(charts), chart.get('title', ''))
             exporter.create_chart_slide(
                 title=chart.get('title', ''),
                 chart_image_base64=chart.get('image', '')
@@ -390,7 +649,7 @@ async def export_ppt(request: Request):
 
         # 4. 创建部门统计表格页
         if dept_stats:
-            logger.debug(f"[{request_id}] 创建部门统计表格页，共 {len(dept_stats)} 行")
+            logger.debug("[%s] 创建部门统计表格页，共 %d 行", request_id, len(dept_stats))
             headers = ['部门', '成本(元)', '总工时', '涉及成本人员', '饱和度(%)']
             rows = [
                 [
@@ -405,7 +664,7 @@ async def export_ppt(request: Request):
             exporter.create_table_slide('部门工时成本概览', headers, rows)
 
         if projects:
-            logger.debug(f"[{request_id}] 创建项目成本表格页，共 {len(projects)} 行")
+            logger.debug("[%s] 创建项目成本表格页，共 %d 行", request_id, len(projects))
             headers = ['项目代码', '项目名称', '总成本(元)', '机票成本', '酒店成本', '火车票成本']
             rows = [
                 [
@@ -423,7 +682,7 @@ async def export_ppt(request: Request):
         # 5. 创建异常记录表格页（限制前50条，避免PPT过大）
         anomalies = dashboard_data.get('anomalies', [])[:50]
         if anomalies:
-            logger.debug(f"[{request_id}] 创建异常记录表格页，共 {len(anomalies)} 行")
+            logger.debug("[%s] 创建异常记录表格页，共 %d 行", request_id, len(anomalies))
             headers = ['异常类型', '姓名', '日期', '部门', '详细说明']
             rows = [
                 [
@@ -438,7 +697,7 @@ async def export_ppt(request: Request):
             exporter.create_table_slide('异常记录详情 (前50条)', headers, rows)
 
         # 导出为字节流
-        logger.debug(f"[{request_id}] 导出 PPT 到字节流")
+        logger.debug("[%s] 导出 PPT 到字节流", request_id)
         output_stream = exporter.export_to_bytes()
 
         ppt_duration = (time.time() - ppt_start) * 1000
@@ -457,10 +716,11 @@ async def export_ppt(request: Request):
 
         # 返回文件流
         return StreamingResponse(
-            output_stream,
+            _iter_buffer(output_stream),
             media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
             headers={
-                "Content-Disposition": f"attachment; filename={output_filename}"
+                "Content-Disposition": f"attachment; filename={output_filename}",
+                "Content-Length": str(output_stream.getbuffer().nbytes)
             }
         )
 
@@ -479,7 +739,10 @@ async def export_ppt(request: Request):
 
 
 @app.post("/api/preview")
-async def preview_data(file: UploadFile = File(...)) -> Dict:
+async def preview_data(
+    file: UploadFile = File(...),
+    x_no_cache: Optional[str] = Header(None)
+) -> Dict:
     """
     预览 Excel 数据结构
     
@@ -506,22 +769,18 @@ async def preview_data(file: UploadFile = File(...)) -> Dict:
             detail="只支持 .xlsx 格式的 Excel 文件"
         )
     
-    temp_file = None
-    temp_file_path = None
+    source = None
     
     try:
-        # 保存上传文件
-        logger.debug(f"[{request_id}] 开始保存上传文件")
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        logger.info(f"[{request_id}] 文件已保存到: {temp_file_path}")
+        # 小文件读入内存直接交给 DataLoader 解析，大文件分块写入临时文件
+        logger.debug("[%s] 开始读取上传文件", request_id)
+        source, file_digest = await run_in_threadpool(_receive_upload, file)
+        logger.info(f"[{request_id}] 文件{_describe_upload(source)}")
         
         # 加载数据
-        logger.debug(f"[{request_id}] 开始加载Excel数据")
-        loader = DataLoader(temp_file_path)
-        data_sheets = loader.load_all_sheets()
+        logger.debug("[%s] 开始加载Excel数据", request_id)
+        loader = DataLoader(source, cache_key=None if _is_no_cache(x_no_cache) else file_digest)
+        data_sheets = await run_in_threadpool(loader.load_all_sheets)
         
         # 构建预览数据
         preview = {}
@@ -531,13 +790,13 @@ async def preview_data(file: UploadFile = File(...)) -> Dict:
                 "row_count": len(df),
                 "sample_data": df.head(3).to_dict('records') if not df.empty else []
             }
-            logger.debug(f"[{request_id}] Sheet '{sheet_name}': {len(df)} rows, {len(df.columns)} columns")
+            logger.debug("[%s] Sheet '%s': %d rows, %d columns", request_id, sheet_name, len(df), len(df.columns))
         
         # 记录请求成功
         total_duration = (time.time() - start_time) * 1000
         request_logger.log_request_success(request_id, total_duration, "数据预览成功")
         
-        return JSONResponse(
+        return FastJSONResponse(
             content={
                 "success": True,
                 "data": preview,
@@ -560,28 +819,42 @@ async def preview_data(file: UploadFile = File(...)) -> Dict:
         )
     
     finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.debug(f"[{request_id}] 临时文件已清理: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"[{request_id}] 清理临时文件失败: {str(e)}")
+        # 清理临时文件
+        _remove_spooled_upload(request_id, source)
 
 
 if __name__ == "__main__":
     import uvicorn
     
+    # ENV=prod 时以多进程方式运行（与热重载互斥）；uvloop/httptools 已安装时由 uvicorn 自动选用
+    is_prod = os.environ.get("ENV") == "prod"
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    
     logger.info("=" * 80)
     logger.info("准备启动 Uvicorn 服务器")
     logger.info("监听地址: 0.0.0.0:8000")
-    logger.info("热重载: 已启用")
+    if is_prod:
+        logger.info(f"生产模式: {workers} 个工作进程")
+    else:
+        logger.info("热重载: 已启用")
     logger.info("=" * 80)
     
     # 启动服务器
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,  # 开发模式启用热重载
-        log_level="info"
-    )
+    if is_prod:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=workers,
+            loop="auto",
+            http="auto",
+            log_level="warning"
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=True,  # 开发模式启用热重载
+            log_level="info"
+        )